@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class CommonConfig(AppConfig):
+    name = 'common'
+
+    def ready(self):
+        # Connects the signal receivers that keep the cached token lookups fresh.
+        from common import authentication  # noqa: F401
@@ -0,0 +1,36 @@
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+TOKEN_CACHE_TIMEOUT = 60 * 5
+
+
+def token_cache_key(key):
+    return 'token-user:{}'.format(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    # TokenAuthentication with the token -> user lookup served from the tiered cache.
+
+    def authenticate_credentials(self, key):
+        cache = caches['tiered']
+        token = cache.get(token_cache_key(key))
+        if token is None:
+            user, token = super(CachedTokenAuthentication, self).authenticate_credentials(key)
+            cache.set(token_cache_key(key), token, timeout=TOKEN_CACHE_TIMEOUT)
+        return token.user, token
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    keys = [token_cache_key(key) for key in Token.objects.filter(user=instance).values_list('key', flat=True)]
+    if keys:
+        caches['tiered'].delete_many(keys)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    caches['tiered'].delete(token_cache_key(instance.key))
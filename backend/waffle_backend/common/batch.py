@@ -0,0 +1,138 @@
+import io
+import json
+import logging
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+BATCH_PATH = '/api/v1/batch/'
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+SAFE_METHODS = ('GET',)
+# Headers of the batch request passed on to every sub-request; the others are set per sub-request.
+SHARED_HEADERS = ('HTTP_HOST', 'HTTP_USER_AGENT', 'HTTP_X_FORWARDED_FOR', 'HTTP_ACCEPT_LANGUAGE')
+# Headers a sub-request may set itself; the others (e.g. X-Forwarded-For) would change who the request is from.
+ITEM_HEADERS = ('accept', 'accept-language', 'idempotency-key', 'x-queue-ticket')
+
+
+class BatchError(Exception):
+    pass
+
+
+class RolledBack(Exception):
+    pass
+
+
+def parse_batch(data):
+    """Validate the body of POST /api/v1/batch/ and return its sub-requests as (method, path, body, headers)."""
+    items = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not 0 < len(items) <= settings.BATCH_MAX_REQUESTS:
+        raise BatchError("'requests' must list 1 to {} requests.".format(settings.BATCH_MAX_REQUESTS))
+    parsed = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise BatchError("Every request must be an object with 'method' and 'path'.")
+        method = str(item.get('method', 'GET')).upper()
+        path = item.get('path')
+        headers = item.get('headers') or {}
+        if method not in BATCH_METHODS:
+            raise BatchError("'method' must be one of {}.".format(', '.join(BATCH_METHODS)))
+        if not isinstance(path, str) or not path.startswith(settings.API_PATH_PREFIX) or \
+                urlsplit(path).path == BATCH_PATH:
+            raise BatchError("'path' must be an API path other than the batch endpoint.")
+        if not isinstance(headers, dict) or not all(isinstance(value, str) for value in headers.values()):
+            raise BatchError("'headers' must map header names to strings.")
+        if any(name.lower() not in ITEM_HEADERS for name in headers):
+            raise BatchError("'headers' may only set {}.".format(', '.join(ITEM_HEADERS)))
+        parsed.append((method, path, item.get('body'), headers))
+    return parsed
+
+
+def _sub_request(request, method, path, body, headers, deferred):
+    url = urlsplit(path)
+    content = json.dumps(body, cls=JSONEncoder).encode() if body is not None else b''
+    environ = {key: value for key, value in request.META.items()
+               if not key.startswith('HTTP_') or key in SHARED_HEADERS}
+    environ.update(('HTTP_' + name.upper().replace('-', '_'), value) for name, value in headers.items())
+    environ.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': url.path,
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(content)),
+        'wsgi.input': io.BytesIO(content),
+        'wsgi.url_scheme': request.scheme,
+    })
+    sub_request = WSGIRequest(environ)
+    # DRF authenticates sub-requests as the batch's user, whose profiles are loaded once by the caller.
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    # Responses to store for Idempotency-Key retries, only once the batch is committed (see common.idempotency).
+    sub_request.deferred_idempotency = deferred
+    return sub_request
+
+
+def _dispatch(request, method, path, body, headers, deferred=None):
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return status.HTTP_404_NOT_FOUND, {'error': "Not found."}
+    try:
+        sub_request = _sub_request(request, method, path, body, headers, deferred)
+        response = match.func(sub_request, *match.args, **match.kwargs)
+    except Exception:
+        logger.exception("Batch sub-request %s %s failed.", method, path)
+        return status.HTTP_500_INTERNAL_SERVER_ERROR, {'error': "Internal server error."}
+    if hasattr(response, 'data'):
+        return response.status_code, response.data
+    # Not a DRF response (e.g. a stream): only its status is reported.
+    return response.status_code, None
+
+
+def run_batch(request, requests, atomic=False):
+    """Run the sub-requests in order as the user of `request` and return their (status, body) and whether
+    they were rolled back.
+
+    Identical GETs are run once unless a write comes between them. With `atomic`, the sub-requests run in a
+    single transaction which is rolled back at the first one failing; the rest are not run and answered with
+    424 Failed Dependency, and the responses of its Idempotency-Key requests are only stored once it commits.
+    """
+    results = []
+    seen = {}
+    deferred = [] if atomic else None
+
+    def run_all():
+        for method, path, body, headers in requests:
+            key = (method, path, json.dumps(body, sort_keys=True, cls=JSONEncoder), tuple(sorted(headers.items())))
+            if method in SAFE_METHODS and key in seen:
+                results.append(seen[key])
+                continue
+            result = _dispatch(request, method, path, body, headers, deferred)
+            if method in SAFE_METHODS:
+                seen[key] = result
+            else:
+                # Reads after a write may see its changes.
+                seen.clear()
+            results.append(result)
+            if atomic and result[0] >= 400:
+                raise RolledBack()
+
+    if not atomic:
+        run_all()
+        return results, False
+    try:
+        with transaction.atomic():
+            run_all()
+    except RolledBack:
+        results.extend([(status.HTTP_424_FAILED_DEPENDENCY, None)] * (len(requests) - len(results)))
+        return results, True
+    for store in deferred:
+        store()
+    return results, False
@@ -0,0 +1,487 @@
+import logging
+import math
+import pickle
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django_redis.cache import RedisCache
+from django_redis.exceptions import ConnectionInterrupted
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+# How long a subscriber waits for a message before waiting again; see listen().
+LISTEN_TIMEOUT = 5
+
+
+class LocalLRU:
+    # Bounded, TTL-limited store of pickled values, one per process.
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return MISSING
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout=None):
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def add(self, key, value, timeout=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] >= time.monotonic():
+                return False
+        self.set(key, value, timeout)
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CircuitBreaker:
+    """Stops calling a failing backend for `reset_timeout` seconds after `failure_threshold` failures in a row.
+
+    Once the timeout is over a single trial call is let through (half-open): success closes the circuit,
+    failure opens it again. `stats` counts calls, failures, short-circuited calls and state changes.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+    TRANSITION_STATS = {CLOSED: 'closed', OPEN: 'opened', HALF_OPEN: 'half_opened'}
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=10):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.stats = {'calls': 0, 'failures': 0, 'short_circuited': 0, 'opened': 0, 'half_opened': 0, 'closed': 0}
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.state != self.CLOSED
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._transition(self.HALF_OPEN)
+                self.stats['calls'] += 1
+                return True
+            if self.state != self.CLOSED:
+                self.stats['short_circuited'] += 1
+                return False
+            self.stats['calls'] += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self._transition(self.CLOSED)
+                return True
+        return False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.stats['failures'] += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self._transition(self.OPEN)
+
+    def _transition(self, state):
+        logger.warning("Circuit breaker '%s' is %s.", self.name, state)
+        self.state = state
+        self.stats[self.TRANSITION_STATS[state]] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, state=self.state, consecutive_failures=self.failures)
+
+
+# Django creates cache backends per thread (per request context under ASGI); breakers, fallback stores and local
+# tiers are shared by name within the process.
+CIRCUIT_BREAKERS = {}
+FALLBACK_STORES = {}
+LOCAL_TIERS = {}
+_registry_lock = threading.Lock()
+
+
+def _shared(registry, name, factory):
+    with _registry_lock:
+        if name not in registry:
+            registry[name] = factory()
+        return registry[name]
+
+
+def is_degraded(cache):
+    # True when `cache` is serving from its in-process fallback because Redis is unavailable.
+    breaker = getattr(cache, 'breaker', None)
+    return breaker is not None and breaker.is_open
+
+
+class ResilientRedisCache(RedisCache):
+    """django_redis cache that keeps working, slower and per-process, while Redis is unavailable.
+
+    Connection errors and timeouts (keep SOCKET_TIMEOUT short) trip a CircuitBreaker; while it is open every
+    call goes to an in-process LocalLRU instead of waiting on the network. Deletes made meanwhile are replayed
+    on Redis once it answers again, so invalidations are not lost. Extra OPTIONS: CIRCUIT_NAME,
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, FALLBACK_MAX_ENTRIES and FALLBACK_TIMEOUT.
+    """
+    MAX_PENDING_DELETES = 10000
+
+    def __init__(self, server, params):
+        params = dict(params)
+        options = dict(params.get('OPTIONS', {}))
+        name = options.pop('CIRCUIT_NAME', None) or str(server)
+        failure_threshold = options.pop('CIRCUIT_FAILURE_THRESHOLD', 5)
+        reset_timeout = options.pop('CIRCUIT_RESET_TIMEOUT', 10)
+        max_entries = options.pop('FALLBACK_MAX_ENTRIES', 1000)
+        timeout = options.pop('FALLBACK_TIMEOUT', 60)
+        self.breaker = _shared(CIRCUIT_BREAKERS, name, lambda: CircuitBreaker(name, failure_threshold, reset_timeout))
+        self._fallback, self._pending_deletes = _shared(FALLBACK_STORES, name,
+                                                        lambda: (LocalLRU(max_entries, timeout), set()))
+        params['OPTIONS'] = options
+        super(ResilientRedisCache, self).__init__(server, params)
+
+    def _call(self, method, fallback, *args, **kwargs):
+        if self.breaker.allow():
+            try:
+                result = getattr(super(ResilientRedisCache, self), method)(*args, **kwargs)
+            except (ConnectionInterrupted, RedisError, OSError):
+                logger.warning("Cache '%s' is unavailable, using the in-process fallback.", self.breaker.name,
+                               exc_info=True)
+                self.breaker.record_failure()
+            except Exception:
+                # Redis answered, the call itself is wrong.
+                self.breaker.record_success()
+                raise
+            else:
+                if self.breaker.record_success():
+                    self._replay_deletes()
+                return result
+        return fallback()
+
+    def _replay_deletes(self):
+        pending = set(self._pending_deletes)
+        self._pending_deletes.difference_update(pending)
+        self._fallback.clear()
+        if pending:
+            try:
+                self.client.get_client(write=True).delete(*pending)
+            except (ConnectionInterrupted, RedisError, OSError):
+                logger.warning("Could not replay %d cache deletes.", len(pending), exc_info=True)
+
+    def _fallback_delete(self, *keys):
+        for key in keys:
+            self._fallback.delete(key)
+            if len(self._pending_deletes) < self.MAX_PENDING_DELETES:
+                self._pending_deletes.add(key)
+
+    def _fallback_get(self, key, default=None, version=None):
+        value = self._fallback.get(self.make_key(key, version=version))
+        return default if value is MISSING else value
+
+    def _fallback_set(self, key, value, timeout, version=None):
+        self._fallback.set(self.make_key(key, version=version), value, self.get_backend_timeout(timeout))
+        return True
+
+    def _fallback_incr(self, key, delta, version=None):
+        value = self._fallback_get(key, MISSING, version=version)
+        if value is MISSING:
+            raise ValueError("Key '%s' not found" % key)
+        self._fallback_set(key, value + delta, DEFAULT_TIMEOUT, version=version)
+        return value + delta
+
+    def get(self, key, default=None, version=None, client=None):
+        return self._call('get', lambda: self._fallback_get(key, default, version),
+                          key, default=default, version=version, client=client)
+
+    def get_many(self, keys, version=None, client=None):
+        def fallback():
+            found = {key: self._fallback_get(key, MISSING, version) for key in keys}
+            return {key: value for key, value in found.items() if value is not MISSING}
+        return self._call('get_many', fallback, keys, version=version, client=client)
+
+    def has_key(self, key, version=None, client=None):
+        return self._call('has_key', lambda: self._fallback_get(key, MISSING, version) is not MISSING,
+                          key, version=version, client=client)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None, nx=False, xx=False):
+        return self._call('set', lambda: self._fallback_set(key, value, timeout, version),
+                          key, value, timeout=timeout, version=version, client=client, nx=nx, xx=xx)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        def fallback():
+            return self._fallback.add(self.make_key(key, version=version), value, self.get_backend_timeout(timeout))
+        return self._call('add', fallback, key, value, timeout=timeout, version=version, client=client)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        def fallback():
+            for key, value in data.items():
+                self._fallback_set(key, value, timeout, version)
+            return []
+        return self._call('set_many', fallback, data, timeout=timeout, version=version, client=client)
+
+    def delete(self, key, version=None, prefix=None, client=None):
+        return self._call('delete', lambda: self._fallback_delete(self.make_key(key, version=version)),
+                          key, version=version, prefix=prefix, client=client)
+
+    def delete_many(self, keys, version=None, client=None):
+        return self._call('delete_many', lambda: self._fallback_delete(*[self.make_key(key, version=version)
+                                                                         for key in keys]),
+                          keys, version=version, client=client)
+
+    def incr(self, key, delta=1, version=None, client=None):
+        return self._call('incr', lambda: self._fallback_incr(key, delta, version),
+                          key, delta=delta, version=version, client=client)
+
+    def decr(self, key, delta=1, version=None, client=None):
+        return self._call('decr', lambda: self._fallback_incr(key, -delta, version),
+                          key, delta=delta, version=version, client=client)
+
+    def clear(self):
+        return self._call('clear', self._fallback.clear)
+
+
+def listen(pubsub):
+    """Messages of a subscribed `pubsub`, like pubsub.listen().
+
+    listen() reads with the client's socket timeout, which is kept short for cache calls: on a quiet channel it
+    times out and the subscriber would have to resubscribe, missing what is published meanwhile.
+    """
+    while True:
+        message = pubsub.get_message(timeout=LISTEN_TIMEOUT)
+        if message is not None:
+            yield message
+
+
+class LocalTier:
+    """In-process LRU of a TieredRedisCache and the thread that drops its keys invalidated by other workers.
+
+    One per cache name and process, whatever the number of backend instances Django creates.
+    """
+
+    def __init__(self, name, max_entries, timeout, channel):
+        self.name = name
+        self.lru = LocalLRU(max_entries, timeout)
+        self.channel = channel
+        # Messages of this process were already applied by the writer.
+        self.instance_id = uuid.uuid4().hex
+        self.listener = None
+        self._lock = threading.Lock()
+
+    def ensure_listener(self, client):
+        if self.listener is None:
+            with self._lock:
+                if self.listener is None:
+                    self.listener = threading.Thread(target=self._listen, args=(client,),
+                                                     name='cache-invalidation-{}'.format(self.name), daemon=True)
+                    self.listener.start()
+
+    def _listen(self, client):
+        while True:
+            try:
+                pubsub = client.get_client(write=False).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Local copies may have missed invalidations while we were not subscribed.
+                self.lru.clear()
+                for message in listen(pubsub):
+                    origin, _, key = message['data'].decode().partition(':')
+                    if origin == self.instance_id:
+                        continue
+                    if key == '*':
+                        self.lru.clear()
+                    else:
+                        self.lru.delete(key)
+            except Exception:
+                logger.warning("Lost the cache invalidation channel, reconnecting.", exc_info=True)
+                self.lru.clear()
+                time.sleep(1)
+
+
+class TieredRedisCache(ResilientRedisCache):
+    """django_redis cache fronted by an in-process LRU.
+
+    Hits on the LRU skip the network round-trip. Every write through this backend is published on a Redis
+    channel and all workers drop their local copy of the key; LOCAL_TIMEOUT bounds the staleness if a message
+    is missed (e.g. while the subscription reconnects). The LRU and the subscription are shared within the
+    process by CIRCUIT_NAME, so backends created per thread or per ASGI request all use the same ones. Extra
+    OPTIONS: LOCAL_MAX_ENTRIES, LOCAL_TIMEOUT and INVALIDATION_CHANNEL.
+    """
+
+    def __init__(self, server, params):
+        params = dict(params)
+        options = dict(params.get('OPTIONS', {}))
+        max_entries = options.pop('LOCAL_MAX_ENTRIES', 1000)
+        timeout = options.pop('LOCAL_TIMEOUT', 5)
+        channel = options.pop('INVALIDATION_CHANNEL', 'cache-invalidation')
+        params['OPTIONS'] = options
+        super(TieredRedisCache, self).__init__(server, params)
+        name = self.breaker.name
+        self._tier = _shared(LOCAL_TIERS, name, lambda: LocalTier(name, max_entries, timeout, channel))
+        self._local = self._tier.lru
+
+    def _ensure_listener(self):
+        self._tier.ensure_listener(self.client)
+
+    def _invalidate(self, *keys):
+        for key in keys:
+            if key == '*':
+                self._local.clear()
+            else:
+                self._local.delete(key)
+        if is_degraded(self):
+            return
+        try:
+            client = self.client.get_client(write=True)
+            for key in keys:
+                client.publish(self._tier.channel, '{}:{}'.format(self._tier.instance_id, key))
+        except Exception:
+            logger.warning("Could not publish cache invalidation.", exc_info=True)
+
+    def get(self, key, default=None, version=None, client=None):
+        self._ensure_listener()
+        local_key = self.make_key(key, version=version)
+        value = self._local.get(local_key)
+        if value is MISSING:
+            value = super(TieredRedisCache, self).get(key, default=MISSING, version=version, client=client)
+            if value is MISSING:
+                return default
+            self._local.set(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None, client=None):
+        self._ensure_listener()
+        found = {}
+        missing = []
+        for key in keys:
+            value = self._local.get(self.make_key(key, version=version))
+            if value is MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            fetched = super(TieredRedisCache, self).get_many(missing, version=version, client=client)
+            for key, value in fetched.items():
+                self._local.set(self.make_key(key, version=version), value)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None, nx=False, xx=False):
+        result = super(TieredRedisCache, self).set(key, value, timeout=timeout, version=version, client=client,
+                                                   nx=nx, xx=xx)
+        self._invalidate(self.make_key(key, version=version))
+        return result
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        result = super(TieredRedisCache, self).add(key, value, timeout=timeout, version=version, client=client)
+        if result:
+            self._invalidate(self.make_key(key, version=version))
+        return result
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        result = super(TieredRedisCache, self).set_many(data, timeout=timeout, version=version, client=client)
+        self._invalidate(*[self.make_key(key, version=version) for key in data])
+        return result
+
+    def delete(self, key, version=None, prefix=None, client=None):
+        result = super(TieredRedisCache, self).delete(key, version=version, prefix=prefix, client=client)
+        self._invalidate(self.make_key(key, version=version))
+        return result
+
+    def delete_many(self, keys, version=None, client=None):
+        result = super(TieredRedisCache, self).delete_many(keys, version=version, client=client)
+        self._invalidate(*[self.make_key(key, version=version) for key in keys])
+        return result
+
+    def incr(self, key, delta=1, version=None, client=None):
+        result = super(TieredRedisCache, self).incr(key, delta=delta, version=version, client=client)
+        self._invalidate(self.make_key(key, version=version))
+        return result
+
+    def decr(self, key, delta=1, version=None, client=None):
+        result = super(TieredRedisCache, self).decr(key, delta=delta, version=version, client=client)
+        self._invalidate(self.make_key(key, version=version))
+        return result
+
+    def clear(self):
+        result = super(TieredRedisCache, self).clear()
+        self._invalidate('*')
+        return result
+
+
+def get_or_recompute(cache, key, compute, timeout, stale_timeout=None, version=None, beta=1.0, lock_timeout=10):
+    """Return the cached value of `key`, rebuilding it with `compute()` in at most one worker at a time.
+
+    The value is stored together with its expiry and the time `compute()` took. Readers start the rebuild
+    early with a probability that grows as the expiry approaches (beta > 1 favours earlier rebuilds), and an
+    expired value is still served for `stale_timeout` seconds while the worker holding the lock rebuilds it.
+    Only when nothing is cached at all do the other workers wait briefly for the rebuilt value.
+    """
+    stale_timeout = timeout if stale_timeout is None else stale_timeout
+    lock_key = '{}:rebuild-lock'.format(key)
+    entry = cache.get(key, version=version)
+    if entry is not None:
+        value, expires_at, delta = entry
+        if time.time() - delta * beta * math.log(1 - random.random()) < expires_at:
+            return value
+        if not cache.add(lock_key, 1, timeout=lock_timeout, version=version):
+            return value
+    elif not cache.add(lock_key, 1, timeout=lock_timeout, version=version):
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key, version=version)
+            if entry is not None:
+                return entry[0]
+        # The rebuilding worker is stuck or gone, build it ourselves.
+
+    try:
+        started = time.time()
+        value = compute()
+        delta = time.time() - started
+        cache.set(key, (value, time.time() + timeout, delta), timeout=timeout + stale_timeout, version=version)
+    finally:
+        cache.delete(lock_key, version=version)
+    return value
+
+
+def expire(cache, key, stale_timeout, version=None):
+    """Mark the value of `key` cached by get_or_recompute as expired, without dropping it.
+
+    The next reader rebuilds it while the others keep being served the previous value for up to
+    `stale_timeout` seconds, instead of all of them waiting for the rebuild.
+    """
+    entry = cache.get(key, version=version)
+    if entry is not None:
+        value, _, delta = entry
+        cache.set(key, (value, 0, delta), timeout=stale_timeout, version=version)
@@ -0,0 +1,128 @@
+import functools
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from common.cache import is_degraded
+from common.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _scope(request, key):
+    user_id = request.user.id if request.user.is_authenticated else None
+    raw = '{}:{}:{}:{}'.format(user_id, request.method, request.path, key)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _load(scope):
+    # A degraded cache only remembers the keys seen by this process, the database is shared by all of them.
+    if not is_degraded(cache):
+        try:
+            stored = cache.get('idempotency:{}'.format(scope))
+            if stored is not None:
+                return stored
+        except Exception:
+            logger.warning("Idempotency cache is unavailable, falling back to the database.", exc_info=True)
+
+    since = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    row = IdempotencyKey.objects.filter(key=scope, created_at__gte=since).first()
+    if row is None:
+        return None
+    return {'fingerprint': row.fingerprint, 'status_code': row.status_code, 'data': row.data}
+
+
+def _store(scope, stored):
+    if not is_degraded(cache):
+        try:
+            cache.set('idempotency:{}'.format(scope), stored, timeout=settings.IDEMPOTENCY_KEY_TTL)
+            return
+        except Exception:
+            logger.warning("Idempotency cache is unavailable, falling back to the database.", exc_info=True)
+
+    IdempotencyKey.objects.filter(
+        key=scope, created_at__lt=timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    ).delete()
+    try:
+        IdempotencyKey.objects.create(key=scope, **stored)
+    except IntegrityError:
+        pass
+
+
+def _save(request, scope, stored):
+    # In an atomic batch the response only stands if the whole batch is committed, the batch stores it then.
+    deferred = getattr(request, 'deferred_idempotency', None)
+    if deferred is not None:
+        deferred.append(lambda: _store(scope, stored))
+    else:
+        _store(scope, stored)
+
+
+def _acquire(scope):
+    try:
+        return cache.add('idempotency-lock:{}'.format(scope), 1, timeout=30)
+    except Exception:
+        return True
+
+
+def _release(scope):
+    try:
+        cache.delete('idempotency-lock:{}'.format(scope))
+    except Exception:
+        pass
+
+
+def idempotent(view_func):
+    """Replay the first successful response of a request sent with an 'Idempotency-Key' header.
+
+    Retries with the same key (per user, method and path) get the stored response back without
+    running the view again; reusing a key with another payload is rejected.
+    """
+    @functools.wraps(view_func)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_HEADER)
+        if not key or request.method in SAFE_METHODS:
+            return view_func(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({'error': "Idempotency-Key must be at most 255 characters."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        scope = _scope(request, key)
+        fingerprint = hashlib.sha256(request.body).hexdigest()
+        stored = _load(scope)
+        if stored is None:
+            if not _acquire(scope):
+                return Response({'error': "A request with this Idempotency-Key is in progress."},
+                                status=status.HTTP_409_CONFLICT)
+            try:
+                response = view_func(self, request, *args, **kwargs)
+                # Refusals (e.g. 409, 429 from the waiting room) may succeed later, retries run the view again.
+                if status.is_success(response.status_code) and getattr(response, 'data', None) is not None:
+                    _save(request, scope, {
+                        'fingerprint': fingerprint,
+                        'status_code': response.status_code,
+                        'data': json.dumps(response.data, cls=JSONEncoder),
+                    })
+                return response
+            finally:
+                _release(scope)
+
+        if stored['fingerprint'] != fingerprint:
+            return Response({'error': "Idempotency-Key was already used for a different request."},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        response = Response(json.loads(stored['data']), status=stored['status_code'])
+        response['Idempotent-Replayed'] = 'true'
+        return response
+    return wrapper
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.contrib.auth import middleware as auth
+from django.contrib.messages import middleware as messages
+from django.contrib.sessions import middleware as sessions
+from django.middleware import csrf
+
+
+def is_token_only(request):
+    return settings.AUTH_TOKEN_ONLY and request.path_info.startswith(settings.API_PATH_PREFIX)
+
+
+class TokenOnlyAPIMixin:
+    """Leaves API requests alone when they are authenticated with tokens only (settings.AUTH_TOKEN_ONLY).
+
+    The admin and any other non-API route keep the full session/CSRF/messages stack.
+    """
+
+    def __call__(self, request):
+        if is_token_only(request):
+            return self.get_response(request)
+        return super(TokenOnlyAPIMixin, self).__call__(request)
+
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if is_token_only(request) or not hasattr(super(TokenOnlyAPIMixin, self), 'process_view'):
+            return None
+        return super(TokenOnlyAPIMixin, self).process_view(request, callback, callback_args, callback_kwargs)
+
+
+class SessionMiddleware(TokenOnlyAPIMixin, sessions.SessionMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(TokenOnlyAPIMixin, csrf.CsrfViewMiddleware):
+    pass
+
+
+class AuthenticationMiddleware(TokenOnlyAPIMixin, auth.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(TokenOnlyAPIMixin, messages.MessageMiddleware):
+    pass
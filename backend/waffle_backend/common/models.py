@@ -0,0 +1,9 @@
+from django.db import models
+
+
+class IdempotencyKey(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    data = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+class AddIndexOnline(migrations.AddIndex):
+    """AddIndex that does not block writes to large tables while the index is built.
+
+    On MySQL (InnoDB) the index is created in place with LOCK=NONE, so enrollments keep going during
+    the migration; other databases fall back to a regular CREATE INDEX.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'mysql':
+            return super(AddIndexOnline, self).database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            sql = self.index.create_sql(model, schema_editor)
+            schema_editor.execute('{} ALGORITHM=INPLACE LOCK=NONE'.format(sql), params=None)
+
+    def describe(self):
+        return 'Create index %s on field(s) %s of model %s without locking' % (
+            self.index.name,
+            ', '.join(self.index.fields),
+            self.model_name,
+        )
@@ -0,0 +1,395 @@
+from unittest import mock
+import json
+import threading
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from common.authentication import token_cache_key
+from common.cache import MISSING, CircuitBreaker, LocalLRU, ResilientRedisCache, expire, get_or_recompute
+from common.models import IdempotencyKey
+from seminar.models import Seminar, UserSeminar
+from seminar.tests import clear_schedules
+
+
+class IdempotencyKeyTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        # instructor1
+        self.client.post(
+            '/api/v1/user/',
+            json.dumps({
+                "username": "instructor1",
+                "password": "1234",
+                "first_name": "yeonghyeon",
+                "last_name": "Ko",
+                "email": "newstellar@snu.ac.kr",
+                "role": "instructor",
+                "company": "orangenongjang",
+                "year": 1
+            }),
+            content_type='application/json'
+        )
+        self.instructor1_token = 'Token ' + Token.objects.get(user__username='instructor1').key
+        self.seminar = {
+            "name": "Bayesian",
+            "time": "14:30",
+            "online": True,
+            "count": 3,
+            "capacity": 2
+        }
+
+    def post_seminar(self, key, seminar=None):
+        return self.client.post(
+            '/api/v1/seminar/',
+            json.dumps(seminar or self.seminar),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.instructor1_token,
+            HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_is_replayed(self):
+        key = str(uuid.uuid4())
+        first = self.post_seminar(key)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        retry = self.post_seminar(key)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Seminar.objects.count(), 1)
+
+        # The same key with another payload is rejected.
+        response = self.post_seminar(key, dict(self.seminar, name="Data Mining"))
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        # Without the key the view runs again.
+        response = self.post_seminar('')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_database_fallback(self):
+        key = str(uuid.uuid4())
+        with mock.patch('common.idempotency.cache') as cache:
+            cache.get.side_effect = ConnectionError
+            cache.set.side_effect = ConnectionError
+            cache.add.side_effect = ConnectionError
+            first = self.post_seminar(key)
+            self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+            retry = self.post_seminar(key)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Seminar.objects.count(), 1)
+
+
+@override_settings(THROTTLE_TOKEN_BUCKETS={'login': {'ip': '2/min'}})
+class TokenBucketThrottleTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        # A fresh client address per test so that buckets of earlier runs don't interfere.
+        self.ip = '10.{}.{}.{}'.format(*uuid.uuid4().bytes[:3])
+
+    def login(self):
+        return self.client.put(
+            '/api/v1/user/login/',
+            json.dumps({
+                "username": "participant1",
+                "password": "1234"
+            }),
+            content_type='application/json',
+            REMOTE_ADDR=self.ip
+        )
+
+    def test_login_is_throttled_per_ip(self):
+        response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response['X-RateLimit-Limit'], '2')
+        self.assertEqual(response['X-RateLimit-Remaining'], '1')
+
+        response = self.login()
+        self.assertEqual(response['X-RateLimit-Remaining'], '0')
+
+        response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+        # Other clients have their own bucket.
+        self.ip = '10.255.255.255'
+        response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_forwarded_for_is_ignored(self):
+        # A client can't get a fresh bucket by changing X-Forwarded-For on every request.
+        for i in range(3):
+            response = self.client.put(
+                '/api/v1/user/login/',
+                json.dumps({
+                    "username": "participant1",
+                    "password": "1234"
+                }),
+                content_type='application/json',
+                REMOTE_ADDR=self.ip,
+                HTTP_X_FORWARDED_FOR='192.0.2.{}'.format(i)
+            )
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class LocalLRUTestCase(SimpleTestCase):
+
+    def test_eviction_and_expiry(self):
+        lru = LocalLRU(max_entries=2, timeout=60)
+        lru.set('a', [1])
+        lru.set('b', [2])
+        lru.get('a')
+        lru.set('c', [3])
+        self.assertEqual(lru.get('a'), [1])
+        self.assertIs(lru.get('b'), MISSING)
+
+        # Callers get their own copy.
+        lru.get('a').append(2)
+        self.assertEqual(lru.get('a'), [1])
+
+        with mock.patch('common.cache.time.monotonic', return_value=10 ** 9):
+            self.assertIs(lru.get('c'), MISSING)
+
+
+class GetOrRecomputeTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = caches['default']
+        self.key = 'recompute-{}'.format(uuid.uuid4().hex)
+        self.calls = []
+
+    def compute(self):
+        self.calls.append(1)
+        return len(self.calls)
+
+    def test_expired_value_is_served_while_rebuilding(self):
+        self.assertEqual(get_or_recompute(self.cache, self.key, self.compute, timeout=60), 1)
+        self.assertEqual(get_or_recompute(self.cache, self.key, self.compute, timeout=60), 1)
+        self.assertEqual(len(self.calls), 1)
+
+        # Another worker holds the rebuild lock: the expired value is served.
+        self.cache.set(self.key, (1, 0, 0.1))
+        self.cache.add('{}:rebuild-lock'.format(self.key), 1)
+        self.assertEqual(get_or_recompute(self.cache, self.key, self.compute, timeout=60), 1)
+        self.assertEqual(len(self.calls), 1)
+
+        self.cache.delete('{}:rebuild-lock'.format(self.key))
+        self.assertEqual(get_or_recompute(self.cache, self.key, self.compute, timeout=60), 2)
+        self.assertIsNone(self.cache.get('{}:rebuild-lock'.format(self.key)))
+
+    def test_expire_keeps_the_stale_value(self):
+        self.assertEqual(get_or_recompute(self.cache, self.key, self.compute, timeout=60), 1)
+        expire(self.cache, self.key, stale_timeout=60)
+        self.cache.add('{}:rebuild-lock'.format(self.key), 1)
+        self.assertEqual(get_or_recompute(self.cache, self.key, self.compute, timeout=60), 1)
+
+        self.cache.delete('{}:rebuild-lock'.format(self.key))
+        self.assertEqual(get_or_recompute(self.cache, self.key, self.compute, timeout=60), 2)
+        expire(self.cache, 'nothing-{}'.format(self.key), stale_timeout=60)
+        self.assertIsNone(self.cache.get('nothing-{}'.format(self.key)))
+
+
+class ResilientRedisCacheTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.name = 'unreachable-{}'.format(uuid.uuid4().hex)
+        # Nothing listens on port 1: every call fails right away.
+        self.cache = ResilientRedisCache('redis://127.0.0.1:1/0', {'OPTIONS': {
+            'SOCKET_CONNECT_TIMEOUT': 0.1,
+            'CIRCUIT_NAME': self.name,
+            'CIRCUIT_FAILURE_THRESHOLD': 2,
+            'CIRCUIT_RESET_TIMEOUT': 60,
+        }})
+
+    def test_circuit_opens_and_falls_back(self):
+        self.assertIsNone(self.cache.get('a'))
+        self.assertTrue(self.cache.set('a', [1]))
+        self.assertEqual(self.cache.breaker.state, CircuitBreaker.OPEN)
+
+        # No more network calls while the circuit is open, the in-process store answers.
+        self.assertEqual(self.cache.get('a'), [1])
+        self.assertTrue(self.cache.add('lock', 1))
+        self.assertFalse(self.cache.add('lock', 1))
+        self.assertEqual(self.cache.incr('lock'), 2)
+        self.cache.delete('a')
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.breaker.stats['failures'], 2)
+        self.assertGreater(self.cache.breaker.stats['short_circuited'], 0)
+
+        response = Client().get('/health/')
+        self.assertEqual(response.json()['status'], 'degraded')
+        self.assertEqual(response.json()['caches'][self.name]['state'], CircuitBreaker.OPEN)
+
+    def test_half_open_trial(self):
+        breaker = CircuitBreaker('trial', failure_threshold=1, reset_timeout=10)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        with mock.patch('common.cache.time.monotonic', return_value=time.monotonic() + 10):
+            self.assertTrue(breaker.allow())
+            self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+            # Only one trial call at a time.
+            self.assertFalse(breaker.allow())
+        self.assertTrue(breaker.record_success())
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+
+class TieredRedisCacheTestCase(SimpleTestCase):
+
+    def test_local_tier_is_shared(self):
+        # Django builds a backend per thread or ASGI request context; they share the LRU and one listener.
+        backends = [caches['tiered']]
+        thread = threading.Thread(target=lambda: backends.append(caches['tiered']))
+        thread.start()
+        thread.join()
+        self.assertIsNot(backends[0], backends[1])
+        self.assertIs(backends[0]._tier, backends[1]._tier)
+
+        key = 'tiered-{}'.format(uuid.uuid4().hex)
+        backends[0].set(key, [1])
+        for backend in backends:
+            self.assertEqual(backend.get(key), [1])
+        listeners = [thread for thread in threading.enumerate() if thread.name == 'cache-invalidation-tiered']
+        self.assertEqual(len(listeners), 1)
+
+    def test_listener_outlasts_quiet_channel(self):
+        cache = caches['tiered']
+        cache.get('tiered-{}'.format(uuid.uuid4().hex))
+        with mock.patch('common.cache.logger') as logger:
+            # Longer than the socket timeout, with nothing published.
+            time.sleep(0.5)
+        logger.warning.assert_not_called()
+
+
+class CachedTokenAuthenticationTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        response = self.client.post(
+            '/api/v1/user/',
+            json.dumps({
+                "username": "participant1",
+                "password": "1234",
+                "email": "newstellar@snu.ac.kr",
+                "role": "participant"
+            }),
+            content_type='application/json'
+        )
+        self.key = response.json()["token"]
+
+    def test_token_lookup_is_cached(self):
+        response = self.client.get('/api/v1/user/me/', HTTP_AUTHORIZATION='Token ' + self.key)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(caches['tiered'].get(token_cache_key(self.key)).user.username, 'participant1')
+
+        # Changes of the user drop the cached lookup.
+        User.objects.get(username='participant1').save()
+        self.assertIsNone(caches['tiered'].get(token_cache_key(self.key)))
+
+        self.client.get('/api/v1/user/me/', HTTP_AUTHORIZATION='Token ' + self.key)
+        Token.objects.filter(key=self.key).delete()
+        response = self.client.get('/api/v1/user/me/', HTTP_AUTHORIZATION='Token ' + self.key)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class BatchTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        clear_schedules()
+        self.tokens = {}
+        for username, role in (('participant1', 'participant'), ('instructor1', 'instructor')):
+            self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": username,
+                    "password": "1234",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": role
+                }),
+                content_type='application/json'
+            )
+            self.tokens[username] = 'Token ' + Token.objects.get(user__username=username).key
+        self.client.post(
+            '/api/v1/seminar/',
+            json.dumps({
+                "name": "Bayesian",
+                "time": "14:30",
+                "count": 3,
+                "capacity": 10
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.tokens['instructor1']
+        )
+        self.seminar_id = Seminar.objects.last().id
+
+    def batch(self, requests, **kwargs):
+        return self.client.post(
+            '/api/v1/batch/',
+            json.dumps(dict(kwargs, requests=requests)),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.tokens['participant1']
+        )
+
+    def test_batch(self):
+        seminar_path = '/api/v1/seminar/{}/'.format(self.seminar_id)
+        response = self.batch([
+            {"method": "GET", "path": "/api/v1/user/me/"},
+            {"method": "GET", "path": seminar_path},
+            {"method": "GET", "path": "/api/v1/user/me/"},
+            {"method": "POST", "path": seminar_path + "user/", "body": {"role": "participant"}},
+            {"method": "GET", "path": "/api/v1/user/me/"},
+            {"method": "GET", "path": "/api/v1/nothing/"},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        responses = response.json()["responses"]
+        self.assertEqual([item["status"] for item in responses], [200, 200, 200, 201, 200, 404])
+        self.assertEqual(responses[0]["body"]["username"], "participant1")
+        self.assertEqual(responses[1]["body"]["id"], self.seminar_id)
+        # The read after the enrollment is run again and sees it.
+        self.assertEqual(responses[2], responses[0])
+        self.assertEqual(len(responses[4]["body"]["participant"]["seminars"]), 1)
+
+        self.assertEqual(self.batch([]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.batch([{"path": "/api/v1/batch/"}]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.batch([{"method": "PATCH", "path": "/api/v1/user/me/"}]).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_atomic_batch(self):
+        user_path = '/api/v1/seminar/{}/user/'.format(self.seminar_id)
+        response = self.batch([
+            {"method": "POST", "path": user_path, "body": {"role": "participant"}},
+            {"method": "POST", "path": user_path, "body": {"role": "participant"}},
+            {"method": "GET", "path": "/api/v1/user/me/"},
+        ], atomic=True)
+        self.assertTrue(response.json()["rolled_back"])
+        self.assertEqual([item["status"] for item in response.json()["responses"]], [201, 400, 424])
+        self.assertFalse(UserSeminar.objects.filter(seminar_id=self.seminar_id, role=UserSeminar.PARTICIPANT).exists())
+
+        # Nothing rolled back is replayed to a retry with the same Idempotency-Key.
+        enroll = {"method": "POST", "path": user_path, "body": {"role": "participant"},
+                  "headers": {"Idempotency-Key": str(uuid.uuid4())}}
+        response = self.batch([enroll, {"method": "GET", "path": "/api/v1/nothing/"}], atomic=True)
+        self.assertEqual([item["status"] for item in response.json()["responses"]], [201, 404])
+        response = self.batch([enroll], atomic=True)
+        self.assertFalse(response.json()["rolled_back"])
+        self.assertEqual(response.json()["responses"][0]["status"], status.HTTP_201_CREATED)
+        self.assertTrue(UserSeminar.objects.filter(seminar_id=self.seminar_id, role=UserSeminar.PARTICIPANT).exists())
+        # Once committed it is.
+        response = self.batch([enroll], atomic=True)
+        self.assertEqual(response.json()["responses"][0]["status"], status.HTTP_201_CREATED)
+        self.assertEqual(UserSeminar.objects.filter(seminar_id=self.seminar_id, role=UserSeminar.PARTICIPANT).count(), 1)
+
+    def test_headers_are_restricted(self):
+        response = self.batch([{"method": "GET", "path": "/api/v1/user/me/",
+                                "headers": {"X-Forwarded-For": "192.0.2.1"}}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
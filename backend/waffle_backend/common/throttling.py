@@ -0,0 +1,156 @@
+import hashlib
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from rest_framework.throttling import BaseThrottle
+
+from common.cache import is_degraded
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+# KEYS[1]: bucket, ARGV: capacity, refill rate (tokens/sec), now (sec). Returns {allowed, tokens left}.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HMSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+_script = None
+
+
+def parse_rate(rate):
+    # '30/min' -> bucket of 30 tokens refilled at 0.5 token/sec
+    num, period = rate.split('/')
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period.strip().lower()]
+
+
+def take_token(key, capacity, rate):
+    global _script
+    now = time.time()
+    if is_degraded(cache):
+        return True, capacity
+    try:
+        client = get_redis_connection('default')
+    except NotImplementedError:
+        # Not a Redis cache (e.g. local development): same bucket without atomicity.
+        tokens, ts = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + max(0, now - ts) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        cache.set(key, (tokens, now), timeout=math.ceil(capacity / rate) + 1)
+        return allowed, tokens
+
+    try:
+        if _script is None:
+            _script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        allowed, tokens = _script(keys=[key], args=[capacity, rate, now], client=client)
+    except Exception:
+        logger.warning("Throttle store is unavailable, letting the request through.", exc_info=True)
+        if getattr(cache, 'breaker', None) is not None:
+            cache.breaker.record_failure()
+        return True, capacity
+    return bool(allowed), float(tokens)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Token bucket shared by all workers through Redis.
+
+    The view maps its actions to scopes with `throttle_scopes`, or to a scope per method for actions answering
+    several, and settings.THROTTLE_TOKEN_BUCKETS maps each scope to a rate per kind of bucket, e.g.
+    {'enroll': {'user': '20/min', 'ip': '120/min'}}.
+    """
+    kind = None
+    # Buckets that don't need request.user are checked before authentication hits the database.
+    before_authentication = True
+
+    def get_ident(self, request):
+        raise NotImplementedError('.get_ident() must be overridden')
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        checked = getattr(request, '_token_buckets', None)
+        if checked is None:
+            checked = request._token_buckets = {}
+        if self.kind in checked:
+            return True
+
+        scope = getattr(view, 'throttle_scopes', {}).get(getattr(view, 'action', None))
+        if isinstance(scope, dict):
+            scope = scope.get(request.method)
+        rate = settings.THROTTLE_TOKEN_BUCKETS.get(scope, {}).get(self.kind)
+        ident = self.get_ident(request) if rate else None
+        if ident is None:
+            return True
+
+        capacity, refill = parse_rate(rate)
+        allowed, tokens = take_token('throttle:{}:{}:{}'.format(scope, self.kind, ident), capacity, refill)
+        checked[self.kind] = (capacity, int(tokens))
+        if not allowed:
+            self.wait_seconds = (1 - tokens) / refill
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    kind = 'ip'
+
+    def get_ident(self, request):
+        return super(TokenBucketThrottle, self).get_ident(request)
+
+
+class TokenTokenBucketThrottle(TokenBucketThrottle):
+    kind = 'token'
+
+    def get_ident(self, request):
+        auth = request.META.get('HTTP_AUTHORIZATION')
+        return hashlib.sha1(auth.encode()).hexdigest() if auth else None
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    kind = 'user'
+    before_authentication = False
+
+    def get_ident(self, request):
+        return request.user.pk if request.user and request.user.is_authenticated else None
+
+
+class TokenBucketThrottleMixin:
+    throttle_classes = (IPTokenBucketThrottle, TokenTokenBucketThrottle, UserTokenBucketThrottle)
+    throttle_scopes = {}
+
+    def initial(self, request, *args, **kwargs):
+        for throttle in self.get_throttles():
+            if getattr(throttle, 'before_authentication', False) and not throttle.allow_request(request, self):
+                self.throttled(request, throttle.wait())
+        super(TokenBucketThrottleMixin, self).initial(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super(TokenBucketThrottleMixin, self).finalize_response(request, response, *args, **kwargs)
+        buckets = getattr(request, '_token_buckets', None)
+        if buckets:
+            limit, remaining = min(buckets.values(), key=lambda bucket: bucket[1])
+            response['X-RateLimit-Limit'] = limit
+            response['X-RateLimit-Remaining'] = max(remaining, 0)
+        return response
@@ -0,0 +1,26 @@
+from django.contrib.auth.models import User
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from common.batch import BatchError, parse_batch, run_batch
+
+
+class BatchView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    # POST /api/v1/batch/
+    def post(self, request):
+        try:
+            requests = parse_batch(request.data)
+        except BatchError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Loaded once with the profiles the views look at, for all of the sub-requests.
+        request.user = User.objects.select_related('participant', 'instructor').get(pk=request.user.pk)
+        results, rolled_back = run_batch(request, requests, atomic=request.data.get('atomic') is True)
+        return Response({
+            'rolled_back': rolled_back,
+            'responses': [{'status': status_code, 'body': body} for status_code, body in results],
+        })
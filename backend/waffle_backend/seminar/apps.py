@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class SeminarConfig(AppConfig):
     name = 'seminar'
+
+    def ready(self):
+        # Connects the signal receivers that keep the cached bootstrap payloads and the change log fresh.
+        from seminar import bootstrap, sync  # noqa: F401
@@ -0,0 +1,81 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rest_framework import serializers
+
+from common.cache import get_or_recompute
+from seminar.models import ArchivedUserSeminar, Seminar, UserSeminar
+from seminar.serializers import PrefetchedSeminarSerializer, with_list_fields
+from user.models import InstructorProfile, ParticipantProfile
+from user.serializers import SeminarsSerializer, UserSerializer
+
+# Seminars of GET /api/v1/bootstrap/, the first ones of GET /api/v1/seminar/.
+BOOTSTRAP_SEMINARS = 20
+SEMINAR_PAGE_CACHE_KEY = 'seminars:first-page'
+SEMINAR_PAGE_CACHE_TIMEOUT = 10
+# The user part is dropped whenever the user, their profiles or memberships change; the timeout bounds the
+# staleness left by a rebuild racing with such a change.
+BOOTSTRAP_CACHE_TIMEOUT = 60 * 10
+
+
+def bootstrap_cache_key(user_id):
+    return 'bootstrap:{}'.format(user_id)
+
+
+class MembershipSerializer(SeminarsSerializer):
+    role = serializers.CharField()
+
+
+def user_payload(user_id, context):
+    # The user with their profiles and every membership, live or archived, in five queries.
+    user = User.objects.select_related('participant', 'instructor__charge').get(pk=user_id)
+    memberships = list(UserSeminar.objects.filter(user=user).select_related('seminar'))
+    memberships += ArchivedUserSeminar.objects.filter(user=user).select_related('seminar')
+    memberships.sort(key=lambda membership: membership.created_at)
+    return {
+        'user': UserSerializer(user, context=context).data,
+        'memberships': MembershipSerializer(memberships, many=True, context=context).data,
+    }
+
+
+def seminar_page(context):
+    # Latest seminars with their instructors and participant counts in two queries.
+    seminars = with_list_fields(Seminar.objects.order_by('-created_at'))[:BOOTSTRAP_SEMINARS]
+    return PrefetchedSeminarSerializer(seminars, many=True, context=context).data
+
+
+def bootstrap(request):
+    """Everything the frontend shows on its first paint: the user, their memberships and the latest seminars.
+
+    The user part is cached per user and the seminars are shared by everyone, so a warm call makes no query.
+    """
+    context = {'request': request}
+    key = bootstrap_cache_key(request.user.id)
+    payload = cache.get(key)
+    if payload is None:
+        payload = user_payload(request.user.id, context)
+        cache.set(key, payload, timeout=BOOTSTRAP_CACHE_TIMEOUT)
+    seminars = get_or_recompute(caches['tiered'], SEMINAR_PAGE_CACHE_KEY, lambda: seminar_page(context),
+                                timeout=SEMINAR_PAGE_CACHE_TIMEOUT)
+    return dict(payload, seminars=seminars)
+
+
+def bootstrap_changed(*user_ids):
+    # Dropped again after the commit in case a concurrent request rebuilt one from the rows of before the change.
+    keys = [bootstrap_cache_key(user_id) for user_id in user_ids]
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+@receiver(post_save, sender=User)
+def reset_user_bootstrap(sender, instance, **kwargs):
+    bootstrap_changed(instance.id)
+
+
+@receiver(post_save, sender=ParticipantProfile)
+@receiver(post_save, sender=InstructorProfile)
+def reset_profile_bootstrap(sender, instance, **kwargs):
+    bootstrap_changed(instance.user_id)
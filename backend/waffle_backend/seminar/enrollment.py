@@ -0,0 +1,292 @@
+import secrets
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+
+from seminar.events import memberships_changed, seminars_changed
+from seminar.models import ArchivedUserSeminar, EnrollmentRequest, Seminar, SeminarApplication, UserSeminar, Waitlist
+from seminar.schedule import occupied, occupied_many, seminar_mask
+from user.models import InstructorProfile, ParticipantProfile
+
+
+class EnrollmentError(Exception):
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super(EnrollmentError, self).__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def active_participant_count(seminar):
+    return UserSeminar.objects.filter(seminar=seminar, role=UserSeminar.PARTICIPANT, is_active=True).count()
+
+
+def _check_participant(user, seminar, user_seminar, schedule=None):
+    try:
+        participant = user.participant
+    except ParticipantProfile.DoesNotExist:
+        raise EnrollmentError("The instructor should get 'participant' role first.", status.HTTP_403_FORBIDDEN)
+    try:
+        if user.instructor.charge_id == seminar.id:
+            raise EnrollmentError("You're the instructor of this seminar.", status.HTTP_403_FORBIDDEN)
+    except InstructorProfile.DoesNotExist:
+        pass
+
+    if user_seminar is not None:
+        if not user_seminar.is_active:
+            raise EnrollmentError("The user who've dropped cannot enroll in the same seminar")
+        raise EnrollmentError("You've been already included in the seminar.")
+
+    if not participant.accepted:
+        raise EnrollmentError("Your request cannot be accepted.", status.HTTP_403_FORBIDDEN)
+
+    check_schedule(user, seminar, schedule)
+
+
+def check_schedule(user, seminar, schedule=None):
+    # `schedule` is the bitmap of the user's occupied minutes if the caller already has it.
+    schedule = occupied(user.id) if schedule is None else schedule
+    if schedule & seminar_mask(seminar.time):
+        raise EnrollmentError("The seminar conflicts with the schedule of another seminar of yours.")
+
+
+def check_participant(user, seminar):
+    # Same rules as POST /api/v1/seminar/{seminar_id}/user/ except for the capacity.
+    user_seminar = user.seminars.filter(seminar=seminar).first() or \
+        user.archived_seminars.filter(seminar=seminar).first()
+    _check_participant(user, seminar, user_seminar)
+
+
+def waitlist_position(entry):
+    return Waitlist.objects.filter(seminar_id=entry.seminar_id, id__lte=entry.id).count()
+
+
+def join_waitlist(user, seminar):
+    check_participant(user, seminar)
+    entry, created = Waitlist.objects.get_or_create(user=user, seminar=seminar)
+    return entry
+
+
+def promote_waitlist(seminar):
+    """Move users from the head of the waitlist into the free seats of the seminar.
+
+    Must run inside the transaction that freed the seats; the seminar row is locked so that
+    concurrent drops promote distinct users.
+    """
+    seminar = Seminar.objects.select_for_update().get(pk=seminar.pk)
+    free_seats = seminar.capacity - active_participant_count(seminar)
+    promoted = []
+    while free_seats > 0:
+        entry = Waitlist.objects.select_for_update().filter(seminar=seminar).select_related('user').first()
+        if entry is None:
+            break
+        entry.delete()
+        lock_participants([entry.user_id])
+        try:
+            check_participant(entry.user, seminar)
+        except EnrollmentError:
+            # The user is no longer eligible (e.g. enrolled by an instructor meanwhile), skip to the next one.
+            continue
+        UserSeminar.objects.create(user=entry.user, seminar=seminar, role=UserSeminar.PARTICIPANT)
+        memberships_changed(entry.user.id)
+        promoted.append(entry.user)
+        free_seats -= 1
+    return promoted
+
+
+BULK_QUERY_SIZE = 1000
+
+
+def lock_participants(user_ids):
+    """Lock the participant profiles of the users until the end of the transaction.
+
+    Enrollments of a user in different seminars lock different seminar rows: taken before the user's schedule
+    is checked, this lock makes them check it and insert their membership one after the other. Profiles are
+    locked in user id order so that concurrent bulk enrollments can't deadlock.
+    """
+    user_ids = sorted(user_ids)
+    for i in range(0, len(user_ids), BULK_QUERY_SIZE):
+        list(ParticipantProfile.objects.select_for_update().filter(user_id__in=user_ids[i:i + BULK_QUERY_SIZE])
+             .order_by('user_id').values_list('id', flat=True))
+
+
+def _enroll_users(seminar, users):
+    """Enroll the users, in order, as participants of the seminar locked by the caller.
+
+    `users` need their participant and instructor profiles selected; None stands for an unknown user.
+    Candidates are checked a chunk at a time, with a fixed number of queries per chunk, until the free seats
+    are taken: the rest are turned away without being checked. The new rows are written with one bulk_create.
+    Returns the EnrollmentError of each user, None if enrolled.
+    """
+    free_seats = seminar.capacity - active_participant_count(seminar)
+    if free_seats > 0:
+        lock_participants({user.id for user in users if user is not None})
+    mask = seminar_mask(seminar.time)
+    user_seminars = {}
+    schedules = {}
+    rows = []
+    errors = []
+    for start in range(0, len(users), BULK_QUERY_SIZE):
+        chunk = users[start:start + BULK_QUERY_SIZE]
+        # Users repeated from a previous chunk keep what it found, and the rows it added.
+        user_ids = [user.id for user in chunk if user is not None and user.id not in schedules]
+        if free_seats > 0 and user_ids:
+            # Archived (dropped) enrollments count as memberships too, live rows take precedence.
+            for model in (ArchivedUserSeminar, UserSeminar):
+                user_seminars.update(
+                    (user_seminar.user_id, user_seminar)
+                    for user_seminar in model.objects.filter(seminar=seminar, user_id__in=user_ids)
+                )
+            schedules.update(occupied_many(user_ids))
+        for user in chunk:
+            try:
+                if user is None:
+                    raise EnrollmentError("The user does not exist.", status.HTTP_404_NOT_FOUND)
+                if free_seats <= 0:
+                    raise EnrollmentError("The seminar is beyond capacity.")
+                _check_participant(user, seminar, user_seminars.get(user.id), schedules[user.id])
+            except EnrollmentError as e:
+                errors.append(e)
+                continue
+            user_seminars[user.id] = UserSeminar(user=user, seminar=seminar, role=UserSeminar.PARTICIPANT)
+            rows.append(user_seminars[user.id])
+            schedules[user.id] |= mask
+            errors.append(None)
+            free_seats -= 1
+    UserSeminar.objects.bulk_create(rows, batch_size=BULK_QUERY_SIZE)
+    if rows:
+        seminars_changed(seminar.id)
+        memberships_changed(*[row.user_id for row in rows])
+    return errors
+
+
+def bulk_enroll(seminar, usernames):
+    """Enroll the given users as participants of the seminar in a single transaction.
+
+    Returns one outcome per distinct username, in order.
+    """
+    usernames = list(dict.fromkeys(username.strip() for username in usernames if username and username.strip()))
+    users = {}
+    with transaction.atomic():
+        seminar = Seminar.objects.select_for_update().get(pk=seminar.pk)
+        for i in range(0, len(usernames), BULK_QUERY_SIZE):
+            chunk = User.objects.filter(username__in=usernames[i:i + BULK_QUERY_SIZE])
+            users.update((user.username, user) for user in chunk.select_related('participant', 'instructor'))
+        errors = _enroll_users(seminar, [users.get(username) for username in usernames])
+
+    return [
+        {'username': username, 'status': 'failed', 'error': error.message} if error else
+        {'username': username, 'status': 'enrolled'}
+        for username, error in zip(usernames, errors)
+    ]
+
+
+def enqueue_enrollment(user, seminar):
+    """Queue the participant enrollment of the user, or return the request already pending.
+
+    Only the checks that need no lock are made here; the rest is left to process_enrollment_requests.
+    """
+    try:
+        user.participant
+    except ParticipantProfile.DoesNotExist:
+        raise EnrollmentError("The instructor should get 'participant' role first.", status.HTTP_403_FORBIDDEN)
+    pending = EnrollmentRequest.objects.filter(user=user, seminar=seminar, status=EnrollmentRequest.PENDING).first()
+    return pending or EnrollmentRequest.objects.create(user=user, seminar=seminar)
+
+
+def enrollment_request_position(enrollment_request):
+    # Number of requests the worker will process before this one, itself included.
+    if enrollment_request.status != EnrollmentRequest.PENDING:
+        return None
+    return EnrollmentRequest.objects.filter(status=EnrollmentRequest.PENDING, id__lte=enrollment_request.id).count()
+
+
+def process_enrollment_requests(batch_size):
+    """Apply the oldest pending enrollment requests in one transaction. Returns how many were processed.
+
+    Requests locked by another worker are skipped, and seminars are locked in id order so that
+    concurrent workers can't deadlock; within a seminar requests are applied in arrival order.
+    """
+    with transaction.atomic():
+        requests = list(
+            EnrollmentRequest.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(status=EnrollmentRequest.PENDING)
+            .select_related('user__participant', 'user__instructor')
+            .order_by('id')[:batch_size]
+        )
+        by_seminar = {}
+        for enrollment_request in requests:
+            by_seminar.setdefault(enrollment_request.seminar_id, []).append(enrollment_request)
+
+        now = timezone.now()
+        for seminar_id in sorted(by_seminar):
+            seminar = Seminar.objects.select_for_update().get(pk=seminar_id)
+            seminar_requests = by_seminar[seminar_id]
+            errors = _enroll_users(seminar, [enrollment_request.user for enrollment_request in seminar_requests])
+            for enrollment_request, error in zip(seminar_requests, errors):
+                enrollment_request.status = EnrollmentRequest.FAILED if error else EnrollmentRequest.ENROLLED
+                enrollment_request.error = error.message if error else ''
+                enrollment_request.processed_at = now
+        EnrollmentRequest.objects.bulk_update(requests, ['status', 'error', 'processed_at'])
+    return len(requests)
+
+
+def check_lottery(seminar, now=None):
+    # Seats of a lottery seminar can't be taken directly until its lottery has been drawn.
+    if seminar.application_deadline is None or seminar.lottery_seed is not None:
+        return
+    if (now or timezone.now()) < seminar.application_deadline:
+        raise EnrollmentError("Seats of this seminar are assigned by lottery, apply before {}.".format(
+            seminar.application_deadline.isoformat()), status.HTTP_403_FORBIDDEN)
+    raise EnrollmentError("The lottery of this seminar hasn't been drawn yet.", status.HTTP_403_FORBIDDEN)
+
+
+def apply_to_lottery(user, seminar):
+    """Record the user's application to the seminar's lottery; a single insert, checked when drawing."""
+    if seminar.application_deadline is None or timezone.now() >= seminar.application_deadline:
+        raise EnrollmentError("This seminar doesn't take applications.", status.HTTP_403_FORBIDDEN)
+    try:
+        user.participant
+    except ParticipantProfile.DoesNotExist:
+        raise EnrollmentError("The instructor should get 'participant' role first.", status.HTTP_403_FORBIDDEN)
+    application, created = SeminarApplication.objects.get_or_create(user=user, seminar=seminar)
+    return application
+
+
+def lottery_order(count, seed):
+    # Seeded permutation of range(count): the same seed and applications always draw the same winners.
+    return np.random.default_rng(seed).permutation(count)
+
+
+def draw_lottery(seminar, seed=None):
+    """Assign the seats of the seminar to its applicants in a seeded random order, in one transaction.
+
+    Applicants are enrolled in drawn order with the checks of _enroll_users until the seminar is full;
+    applications are marked won or lost and the seed is recorded on the seminar. Returns the winners' ids.
+    """
+    seed = secrets.randbits(63) if seed is None else seed
+    with transaction.atomic():
+        seminar = Seminar.objects.select_for_update().get(pk=seminar.pk)
+        if seminar.lottery_seed is not None:
+            raise EnrollmentError("The lottery of this seminar has already been drawn.")
+
+        applicants = np.fromiter(
+            SeminarApplication.objects.filter(seminar=seminar).order_by('id').values_list('user_id', flat=True),
+            dtype=np.int64,
+        )
+        drawn = applicants[lottery_order(len(applicants), seed)].tolist()
+        users = {}
+        for i in range(0, len(drawn), BULK_QUERY_SIZE):
+            users.update(User.objects.select_related('participant', 'instructor').in_bulk(drawn[i:i + BULK_QUERY_SIZE]))
+        errors = _enroll_users(seminar, [users.get(user_id) for user_id in drawn])
+        winners = [user_id for user_id, error in zip(drawn, errors) if error is None]
+
+        SeminarApplication.objects.filter(seminar=seminar).update(status=SeminarApplication.LOST)
+        for i in range(0, len(winners), BULK_QUERY_SIZE):
+            SeminarApplication.objects.filter(seminar=seminar, user_id__in=winners[i:i + BULK_QUERY_SIZE]) \
+                .update(status=SeminarApplication.WON)
+        seminar.lottery_seed = seed
+        seminar.save(update_fields=['lottery_seed'])
+    return winners
@@ -0,0 +1,39 @@
+from django.core.cache import caches
+from django.db import transaction
+
+from common.cache import expire
+from seminar.bootstrap import SEMINAR_PAGE_CACHE_KEY, SEMINAR_PAGE_CACHE_TIMEOUT, bootstrap_changed
+from seminar.schedule import schedules_changed
+from seminar.seats import update_seats
+from seminar.streams import publish_seats
+from seminar.sync import log_changes
+
+SEMINAR_LIST_CACHE_KEY = 'seminars'
+# Cache versions of the list ordered by -created_at (default) and by created_at (?order=earliest)
+SEMINAR_LIST_LATEST, SEMINAR_LIST_EARLIEST = 1, 2
+SEMINAR_LIST_TIMEOUTS = {SEMINAR_LIST_LATEST: 10, SEMINAR_LIST_EARLIEST: 600}
+
+
+def _seminars_changed(seminar_ids):
+    # The lists are rebuilt by the next reader while the others are still served the previous ones.
+    cache = caches['tiered']
+    for version, timeout in SEMINAR_LIST_TIMEOUTS.items():
+        expire(cache, SEMINAR_LIST_CACHE_KEY, timeout, version=version)
+    expire(cache, SEMINAR_PAGE_CACHE_KEY, SEMINAR_PAGE_CACHE_TIMEOUT)
+    publish_seats(update_seats(seminar_ids))
+
+
+def seminars_changed(*seminar_ids):
+    """Called whenever seminars or their memberships change; runs once the transaction commits.
+
+    The change log is written right away, so that it commits with the changes.
+    """
+    seminar_ids = set(seminar_ids)
+    log_changes(seminar_ids)
+    transaction.on_commit(lambda: _seminars_changed(seminar_ids))
+
+
+def memberships_changed(*user_ids):
+    # Called whenever memberships of the users change; drops their cached schedules and bootstrap payloads.
+    schedules_changed(*user_ids)
+    bootstrap_changed(*user_ids)
@@ -0,0 +1,59 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from seminar.models import ArchivedUserSeminar, UserSeminar
+
+
+def archive_batch(cutoff, batch_size):
+    # Every batch commits on its own, so an interrupted run simply resumes from the rows left in UserSeminar.
+    with transaction.atomic():
+        user_seminars = list(
+            UserSeminar.objects.select_for_update()
+            .filter(is_active=False, dropped_at__lt=cutoff)
+            .order_by('id')[:batch_size]
+        )
+        if not user_seminars:
+            return 0
+        ArchivedUserSeminar.objects.bulk_create([
+            ArchivedUserSeminar(
+                user_seminar_id=user_seminar.id,
+                user_id=user_seminar.user_id,
+                seminar_id=user_seminar.seminar_id,
+                role=user_seminar.role,
+                is_active=False,
+                created_at=user_seminar.created_at,
+                updated_at=user_seminar.updated_at,
+                dropped_at=user_seminar.dropped_at,
+            ) for user_seminar in user_seminars
+        ], ignore_conflicts=True)
+        UserSeminar.objects.filter(id__in=[user_seminar.id for user_seminar in user_seminars]).delete()
+    return len(user_seminars)
+
+
+class Command(BaseCommand):
+    help = "Move enrollments dropped long ago from UserSeminar into ArchivedUserSeminar."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.SEMINAR_ARCHIVE_AFTER_DAYS,
+                            help="Archive rows dropped more than this many days ago.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0,
+                            help="Seconds to pause between batches to spare the database.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        total = 0
+        while True:
+            archived = archive_batch(cutoff, options['batch_size'])
+            if not archived:
+                break
+            total += archived
+            self.stdout.write("Archived {} enrollments.".format(total))
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write("Done: {} enrollments dropped before {} archived.".format(total, cutoff.isoformat()))
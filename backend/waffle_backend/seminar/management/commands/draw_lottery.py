@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from seminar.enrollment import EnrollmentError, draw_lottery
+from seminar.models import Seminar
+
+
+class Command(BaseCommand):
+    help = "Assign the seats of seminars whose application deadline has passed by seeded lottery."
+
+    def add_arguments(self, parser):
+        parser.add_argument('seminar_ids', nargs='*', type=int,
+                            help="Seminars to draw; by default every closed lottery not drawn yet.")
+        parser.add_argument('--seed', type=int, help="Seed of the draw, to replay a lottery.")
+
+    def handle(self, *args, **options):
+        seminars = Seminar.objects.filter(application_deadline__lte=timezone.now(), lottery_seed__isnull=True)
+        if options['seminar_ids']:
+            seminars = seminars.filter(id__in=options['seminar_ids'])
+        for seminar in seminars.order_by('id'):
+            try:
+                winners = draw_lottery(seminar, seed=options['seed'])
+            except EnrollmentError as e:
+                raise CommandError(e.message)
+            seminar.refresh_from_db()
+            self.stdout.write("Seminar {}: {} seats assigned (seed {}).".format(
+                seminar.id, len(winners), seminar.lottery_seed))
@@ -0,0 +1,43 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from seminar.enrollment import bulk_enroll
+from seminar.models import Seminar
+
+
+def read_usernames(csv_file, column):
+    # The roster is either a plain list of usernames or a CSV file with a header containing `column`.
+    with open(csv_file, encoding='UTF8', newline='') as f:
+        rows = [row for row in csv.reader(f) if row]
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    if column in header:
+        index = header.index(column)
+        return [row[index] for row in rows[1:] if len(row) > index]
+    return [row[0] for row in rows]
+
+
+class Command(BaseCommand):
+    help = "Enroll the participants listed in a CSV roster into a seminar."
+
+    def add_arguments(self, parser):
+        parser.add_argument('seminar_id', type=int)
+        parser.add_argument('csv_file')
+        parser.add_argument('--column', default='username', help="Header of the username column.")
+
+    def handle(self, *args, **options):
+        try:
+            seminar = Seminar.objects.get(pk=options['seminar_id'])
+        except Seminar.DoesNotExist:
+            raise CommandError("Seminar {} does not exist.".format(options['seminar_id']))
+
+        results = bulk_enroll(seminar, read_usernames(options['csv_file'], options['column'].lower()))
+        enrolled = 0
+        for result in results:
+            if result['status'] == 'enrolled':
+                enrolled += 1
+            else:
+                self.stderr.write("{}: {}".format(result['username'], result['error']))
+        self.stdout.write("Enrolled {} of {} users in '{}'.".format(enrolled, len(results), seminar.name))
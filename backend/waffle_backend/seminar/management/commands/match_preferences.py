@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from seminar.matching import run_matching
+
+
+class Command(BaseCommand):
+    help = "Assign seats to all submitted seminar preferences at once, against the capacity of every seminar."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, help="Seed of the students' priority order, to replay a matching.")
+
+    def handle(self, *args, **options):
+        seed, assigned = run_matching(seed=options['seed'])
+        self.stdout.write("{} seats assigned (seed {}).".format(assigned, seed))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from seminar.enrollment import process_enrollment_requests
+
+
+class Command(BaseCommand):
+    help = "Apply the enrollments queued while SEMINAR_ASYNC_ENROLLMENT is on, in arrival order."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help="Requests applied per transaction.")
+        parser.add_argument('--sleep', type=float, default=0.2,
+                            help="Seconds to wait before polling again when the queue is empty.")
+        parser.add_argument('--once', action='store_true',
+                            help="Stop once the queue is empty instead of polling.")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = process_enrollment_requests(options['batch_size'])
+            total += processed
+            if processed:
+                self.stdout.write("Processed {} enrollment requests.".format(total))
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['sleep'])
+        self.stdout.write("Done: {} enrollment requests processed.".format(total))
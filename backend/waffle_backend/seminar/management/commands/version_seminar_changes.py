@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from seminar.sync import prune_changes, version_changes
+
+
+class Command(BaseCommand):
+    help = ("Version the seminar changes whose commit hook didn't run, and delete the changes superseded by a later "
+            "one of the same seminar.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Superseded changes deleted per statement.")
+        parser.add_argument('--sleep', type=float, default=60,
+                            help="Seconds to wait between runs.")
+        parser.add_argument('--once', action='store_true',
+                            help="Run once instead of periodically.")
+
+    def handle(self, *args, **options):
+        while True:
+            version = version_changes()
+            pruned = prune_changes(options['batch_size'])
+            self.stdout.write("Changes versioned up to {}, {} superseded changes deleted.".format(version, pruned))
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
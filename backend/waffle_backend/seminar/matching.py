@@ -0,0 +1,193 @@
+import secrets
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from seminar.enrollment import BULK_QUERY_SIZE, lock_participants, lottery_order
+from seminar.events import memberships_changed, seminars_changed
+from seminar.models import ArchivedUserSeminar, Preference, PreferenceList, Seminar, UserSeminar
+from seminar.schedule import MINUTES_PER_DAY, occupied_many, seminar_mask
+from user.models import InstructorProfile, ParticipantProfile
+
+# Seminars a participant can rank.
+MAX_PREFERENCES = 10
+
+NOT_PROPOSED, HELD, REJECTED = 0, 1, 2
+
+
+def match(choices, wanted, capacity, priority, allowed=None, overlaps=None):
+    """Student-proposing deferred acceptance with a single priority order shared by all seminars.
+
+    choices: (students, ranks) seminar indices in preference order, -1 for empty ranks.
+    wanted: seats each student wants; capacity: free seats per seminar; priority: lower wins.
+    allowed: optional (students, ranks) mask of the choices a student may get.
+    overlaps: optional (students, ranks, ranks) mask of the choices a student can't hold together.
+    Every round each student proposes to as many of their next choices as they still need, skipping those
+    overlapping a choice held or proposed to, and each seminar keeps the best proposals up to its capacity,
+    so all students are resolved against all capacities at once with array operations. Returns the
+    (students, ranks) mask of matched choices.
+    """
+    students, ranks = choices.shape
+    state = np.where(choices >= 0, NOT_PROPOSED, REJECTED).astype(np.int8)
+    if allowed is not None:
+        state[~allowed] = REJECTED
+    if overlaps is None:
+        overlaps = np.zeros((students, ranks, ranks), dtype=bool)
+    rows = np.repeat(np.arange(students), ranks).reshape(students, ranks)
+    while True:
+        taken = state == HELD
+        need = wanted - taken.sum(axis=1)
+        proposing = np.zeros_like(taken)
+        # Choices overlapping a held one wait: they are proposed to if it is rejected.
+        for rank in range(ranks):
+            proposing[:, rank] = (state[:, rank] == NOT_PROPOSED) & (need > 0) & \
+                ~(overlaps[:, rank] & taken).any(axis=1)
+            taken[:, rank] |= proposing[:, rank]
+            need -= proposing[:, rank]
+        if not proposing.any():
+            break
+        state[proposing] = HELD
+
+        # Seminars keep their best held proposals and reject the rest.
+        held = state == HELD
+        student, seminar = rows[held], choices[held]
+        order = np.lexsort((priority[student], seminar))
+        seminar_sorted = seminar[order]
+        group_start = np.searchsorted(seminar_sorted, seminar_sorted, side='left')
+        rejected = np.empty_like(order, dtype=bool)
+        rejected[order] = np.arange(len(order)) - group_start >= capacity[seminar_sorted]
+        held_rows, held_ranks = np.nonzero(held)
+        state[held_rows[rejected], held_ranks[rejected]] = REJECTED
+    return state == HELD
+
+
+def run_matching(seed=None):
+    """Assign seats to every preference list not matched yet and write the memberships in one transaction.
+
+    Students are prioritized by a seeded random order; choices a student can't take (not an accepted
+    participant, instructor of the seminar, already a member) are skipped. Returns the seed and the
+    number of seats assigned.
+    """
+    seed = secrets.randbits(63) if seed is None else seed
+    with transaction.atomic():
+        lists = dict(PreferenceList.objects.select_for_update().filter(matched_at__isnull=True)
+                     .values_list('user_id', 'wanted'))
+        rows = np.array(list(
+            Preference.objects.filter(preference_list__matched_at__isnull=True)
+            .values_list('preference_list__user_id', 'seminar_id', 'rank')
+        ), dtype=np.int64).reshape(-1, 3)
+        if not len(rows):
+            return seed, 0
+
+        user_ids, student = np.unique(rows[:, 0], return_inverse=True)
+        seminar_ids, seminar = np.unique(rows[:, 1], return_inverse=True)
+        # Position of each choice in its student's list, whatever the rank values.
+        order = np.lexsort((rows[:, 2], student))
+        first = np.searchsorted(student[order], student[order], side='left')
+        position = np.empty_like(order)
+        position[order] = np.arange(len(order)) - first
+        choices = np.full((len(user_ids), position.max() + 1), -1, dtype=np.int64)
+        choices[student, position] = seminar
+
+        seminars = list(Seminar.objects.select_for_update().filter(id__in=seminar_ids.tolist()).order_by('id')
+                        .values_list('id', 'capacity', 'time'))
+        taken = dict(UserSeminar.objects.filter(
+            seminar_id__in=seminar_ids.tolist(), role=UserSeminar.PARTICIPANT, is_active=True
+        ).order_by().values_list('seminar_id').annotate(Count('id')))
+        capacity = np.array([max(0, seats - taken.get(seminar_id, 0)) for seminar_id, seats, _ in seminars],
+                            dtype=np.int64)
+
+        # Students enrolling directly meanwhile wait for the matching, so that their schedules are checked against it.
+        lock_participants(user_ids.tolist())
+        minutes = _minute_bytes([seminar_mask(time) for _, _, time in seminars])
+        allowed = _allowed(user_ids, seminar_ids, choices, minutes)
+        wanted = np.array([lists[user_id] for user_id in user_ids.tolist()], dtype=np.int64)
+        priority = np.empty(len(user_ids), dtype=np.int64)
+        priority[lottery_order(len(user_ids), seed)] = np.arange(len(user_ids))
+        matched = match(choices, wanted, capacity, priority, allowed, _overlaps(choices, _overlap_matrix(minutes)))
+
+        matched_students, matched_ranks = np.nonzero(matched)
+        pairs = list(zip(user_ids[matched_students].tolist(),
+                         seminar_ids[choices[matched_students, matched_ranks]].tolist()))
+        UserSeminar.objects.bulk_create([
+            UserSeminar(user_id=user_id, seminar_id=seminar_id, role=UserSeminar.PARTICIPANT)
+            for user_id, seminar_id in pairs
+        ], batch_size=BULK_QUERY_SIZE)
+        by_seminar = {}
+        for user_id, seminar_id in pairs:
+            by_seminar.setdefault(seminar_id, []).append(user_id)
+        for seminar_id, users in by_seminar.items():
+            for i in range(0, len(users), BULK_QUERY_SIZE):
+                Preference.objects.filter(
+                    seminar_id=seminar_id, preference_list__user_id__in=users[i:i + BULK_QUERY_SIZE]
+                ).update(matched=True)
+        now = timezone.now()
+        users = list(lists)
+        for i in range(0, len(users), BULK_QUERY_SIZE):
+            PreferenceList.objects.filter(user_id__in=users[i:i + BULK_QUERY_SIZE]).update(matched_at=now)
+        if by_seminar:
+            seminars_changed(*by_seminar)
+            memberships_changed(*{user_id for user_id, _ in pairs})
+    return seed, len(pairs)
+
+
+def _allowed(user_ids, seminar_ids, choices, minutes):
+    """Mask of the choices each student may be matched to, checked with a few queries for all of them.
+
+    Choices overlapping the seminars a student already has are left out; see _overlaps for those matched
+    together in this run. minutes: the _minute_bytes of the seminars.
+    """
+    students, seminars = len(user_ids), len(seminar_ids)
+    blocked = []
+    users = user_ids.tolist()
+    for i in range(0, students, BULK_QUERY_SIZE):
+        chunk = users[i:i + BULK_QUERY_SIZE]
+        for model in (UserSeminar, ArchivedUserSeminar):
+            blocked += model.objects.filter(user_id__in=chunk, seminar_id__in=seminar_ids.tolist()) \
+                .values_list('user_id', 'seminar_id')
+        blocked += InstructorProfile.objects.filter(user_id__in=chunk, charge_id__in=seminar_ids.tolist()) \
+            .values_list('user_id', 'charge_id')
+    participants = []
+    for i in range(0, students, BULK_QUERY_SIZE):
+        participants += ParticipantProfile.objects.filter(user_id__in=users[i:i + BULK_QUERY_SIZE], accepted=True) \
+            .values_list('user_id', flat=True)
+
+    allowed = np.isin(user_ids, participants)[:, None] & (choices >= 0)
+    if blocked:
+        blocked = np.array(blocked, dtype=np.int64)
+        codes = np.searchsorted(user_ids, blocked[:, 0]) * seminars + np.searchsorted(seminar_ids, blocked[:, 1])
+        student_codes = np.arange(students)[:, None] * seminars + np.where(choices >= 0, choices, 0)
+        allowed &= ~np.isin(student_codes, codes)
+
+    # Each student's schedule against the minutes of each of their choices, a chunk of students at a time.
+    for i in range(0, students, BULK_QUERY_SIZE):
+        schedules = occupied_many(users[i:i + BULK_QUERY_SIZE])
+        rows = np.searchsorted(user_ids, list(schedules))
+        chosen = minutes[np.where(choices[rows] >= 0, choices[rows], 0)]
+        allowed[rows] &= ~(_minute_bytes(schedules.values())[:, None, :] & chosen).any(axis=2)
+    return allowed
+
+
+def _minute_bytes(bitmaps):
+    # Bitmaps of the minutes of the day (see seminar_mask) as rows of bytes, for numpy's bitwise operators.
+    size = (MINUTES_PER_DAY + 7) // 8
+    data = b''.join(bitmap.to_bytes(size, 'little') for bitmap in bitmaps)
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, size)
+
+
+def _overlap_matrix(minutes):
+    # (seminars, seminars) mask of the seminars whose sessions share a minute.
+    taken = np.unpackbits(minutes, axis=1).astype(np.float32)
+    return taken @ taken.T > 0
+
+
+def _overlaps(choices, overlap):
+    # Pairs of a student's choices whose sessions overlap, so that match() assigns at most one of them.
+    students, ranks = choices.shape
+    valid = choices >= 0
+    seminar = np.where(valid, choices, 0)
+    overlaps = overlap[seminar[:, :, None], seminar[:, None, :]] & valid[:, :, None] & valid[:, None, :]
+    overlaps[:, np.arange(ranks), np.arange(ranks)] = False
+    return overlaps
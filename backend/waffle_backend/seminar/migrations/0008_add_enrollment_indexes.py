@@ -0,0 +1,29 @@
+# Generated by Django 3.1.12 on 2026-10-19 12:57
+
+from django.db import migrations, models
+
+from common.operations import AddIndexOnline
+
+
+class Migration(migrations.Migration):
+    # The indexes are built online one by one instead of inside a single long transaction.
+    atomic = False
+
+    dependencies = [
+        ('seminar', '0007_add_waitlist'),
+    ]
+
+    operations = [
+        AddIndexOnline(
+            model_name='seminar',
+            index=models.Index(fields=['created_at'], name='seminar_created_at_idx'),
+        ),
+        AddIndexOnline(
+            model_name='userseminar',
+            index=models.Index(fields=['seminar', 'role', 'is_active'], name='userseminar_seminar_role_idx'),
+        ),
+        AddIndexOnline(
+            model_name='userseminar',
+            index=models.Index(fields=['user', 'role', 'seminar'], name='userseminar_user_role_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.1.12 on 2026-10-19 12:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('seminar', '0008_add_enrollment_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedUserSeminar',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_seminar_id', models.PositiveIntegerField(unique=True)),
+                ('role', models.CharField(choices=[('participant', 'participant'), ('participant', 'instructor')], max_length=50)),
+                ('is_active', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('dropped_at', models.DateTimeField(null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('seminar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_users', to='seminar.seminar')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_seminars', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archiveduserseminar',
+            index=models.Index(fields=['user', 'seminar'], name='archivedus_user_seminar_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.1.12 on 2026-10-19 13:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('seminar', '0009_add_archived_user_seminar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnrollmentRequest',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('enrolled', 'enrolled'), ('failed', 'failed')], default='pending', max_length=20)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(null=True)),
+                ('seminar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollment_requests', to='seminar.seminar')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollment_requests', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='enrollmentrequest',
+            index=models.Index(fields=['status', 'id'], name='enrollmentrequest_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollmentrequest',
+            index=models.Index(fields=['user', 'seminar', 'status'], name='enrollmentrequest_user_idx'),
+        ),
+    ]
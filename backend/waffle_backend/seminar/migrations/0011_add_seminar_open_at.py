@@ -0,0 +1,18 @@
+# Generated by Django 3.1.12 on 2026-10-19 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seminar', '0010_add_enrollment_request'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seminar',
+            name='open_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
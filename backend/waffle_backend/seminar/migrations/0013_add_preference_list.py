@@ -0,0 +1,42 @@
+# Generated by Django 3.1.12 on 2026-10-19 13:17
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('seminar', '0012_add_seminar_lottery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PreferenceList',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wanted', models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)])),
+                ('matched_at', models.DateTimeField(db_index=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='preference_list', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Preference',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('matched', models.BooleanField(default=False)),
+                ('preference_list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='preferences', to='seminar.preferencelist')),
+                ('seminar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='preferences', to='seminar.seminar')),
+            ],
+            options={
+                'ordering': ('rank',),
+                'unique_together': {('preference_list', 'seminar')},
+            },
+        ),
+    ]
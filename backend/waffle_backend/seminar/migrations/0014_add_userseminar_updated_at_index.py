@@ -0,0 +1,20 @@
+# Generated by Django 3.1.12 on 2026-10-19 13:40
+
+from django.db import migrations, models
+
+from common.operations import AddIndexOnline
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('seminar', '0013_add_preference_list'),
+    ]
+
+    operations = [
+        AddIndexOnline(
+            model_name='userseminar',
+            index=models.Index(fields=['updated_at'], name='userseminar_updated_at_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.1.12 on 2026-10-19 14:05
+
+from django.db import migrations, models
+
+
+def log_existing_seminars(apps, schema_editor):
+    # Seminars created before the change log are synced as changed once, with the first version.
+    Seminar = apps.get_model('seminar', 'Seminar')
+    SeminarChange = apps.get_model('seminar', 'SeminarChange')
+    SeminarChangeCounter = apps.get_model('seminar', 'SeminarChangeCounter')
+    seminar_ids = list(Seminar.objects.values_list('id', flat=True))
+    SeminarChange.objects.bulk_create(
+        [SeminarChange(seminar_id=seminar_id, version=1) for seminar_id in seminar_ids],
+        batch_size=1000,
+    )
+    SeminarChangeCounter.objects.create(pk=1, value=1 if seminar_ids else 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seminar', '0014_add_userseminar_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeminarChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seminar_id', models.PositiveIntegerField(db_index=True)),
+                ('deleted', models.BooleanField(default=False)),
+                ('version', models.BigIntegerField(db_index=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SeminarChangeCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(log_existing_seminars, migrations.RunPython.noop),
+    ]
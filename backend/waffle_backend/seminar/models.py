@@ -9,9 +9,21 @@ class Seminar(models.Model):
     count = models.PositiveSmallIntegerField(validators=[MinValueValidator(1)])
     time = models.TimeField('%H:%M')
     online = models.BooleanField(default=True)
+    # Participants can enroll from then on, through the waiting room at first (see seminar.waiting_room).
+    open_at = models.DateTimeField(null=True, blank=True)
+    # Lottery mode: participants apply until the deadline, then `manage.py draw_lottery` assigns the seats and
+    # records its seed.
+    application_deadline = models.DateTimeField(null=True, blank=True)
+    lottery_seed = models.BigIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # GET /api/v1/seminar/ orders by created_at in both directions.
+            models.Index(fields=['created_at'], name='seminar_created_at_idx'),
+        ]
+
 
 class UserSeminar(models.Model):
     PARTICIPANT = 'participant'
@@ -36,3 +48,127 @@ class UserSeminar(models.Model):
         unique_together = (
             ('user', 'seminar'),
         )
+        indexes = [
+            # Participant/instructor counts and listings of a seminar.
+            models.Index(fields=['seminar', 'role', 'is_active'], name='userseminar_seminar_role_idx'),
+            # Membership checks of a user, e.g. user.seminars.filter(role=..., seminar=...).
+            models.Index(fields=['user', 'role', 'seminar'], name='userseminar_user_role_idx'),
+            # Memberships changed since the last refresh of seminar.recommendation.
+            models.Index(fields=['updated_at'], name='userseminar_updated_at_idx'),
+        ]
+
+
+class ArchivedUserSeminar(models.Model):
+    # Dropped UserSeminar rows moved out of the hot table by `manage.py archive_enrollments`.
+    user_seminar_id = models.PositiveIntegerField(unique=True)
+    user = models.ForeignKey(User, related_name='archived_seminars', on_delete=models.CASCADE)
+    seminar = models.ForeignKey(Seminar, related_name='archived_users', on_delete=models.CASCADE)
+    role = models.CharField(max_length=50, choices=UserSeminar.ROLE_CHOICES)
+    is_active = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    dropped_at = models.DateTimeField(null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'seminar'], name='archivedus_user_seminar_idx'),
+        ]
+
+
+class Waitlist(models.Model):
+    user = models.ForeignKey(User, related_name='waitlists', on_delete=models.CASCADE)
+    seminar = models.ForeignKey(Seminar, related_name='waitlist', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('id',)
+        unique_together = (
+            ('user', 'seminar'),
+        )
+
+
+class EnrollmentRequest(models.Model):
+    # Participant enrollment queued by POST /api/v1/seminar/{seminar_id}/user/ when SEMINAR_ASYNC_ENROLLMENT is on.
+    PENDING = 'pending'
+    ENROLLED = 'enrolled'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (PENDING, PENDING),
+        (ENROLLED, ENROLLED),
+        (FAILED, FAILED),
+    )
+
+    user = models.ForeignKey(User, related_name='enrollment_requests', on_delete=models.CASCADE)
+    seminar = models.ForeignKey(Seminar, related_name='enrollment_requests', on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            # The worker takes pending requests in arrival order.
+            models.Index(fields=['status', 'id'], name='enrollmentrequest_status_idx'),
+            models.Index(fields=['user', 'seminar', 'status'], name='enrollmentrequest_user_idx'),
+        ]
+
+
+class SeminarApplication(models.Model):
+    # Application to the lottery of a seminar (Seminar.application_deadline).
+    APPLIED = 'applied'
+    WON = 'won'
+    LOST = 'lost'
+
+    STATUS_CHOICES = (
+        (APPLIED, APPLIED),
+        (WON, WON),
+        (LOST, LOST),
+    )
+
+    user = models.ForeignKey(User, related_name='seminar_applications', on_delete=models.CASCADE)
+    seminar = models.ForeignKey(Seminar, related_name='applications', on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=APPLIED)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = (
+            ('user', 'seminar'),
+        )
+
+
+class PreferenceList(models.Model):
+    # Ranked seminars a participant wants `wanted` of, assigned by `manage.py match_preferences`.
+    user = models.OneToOneField(User, related_name='preference_list', on_delete=models.CASCADE)
+    wanted = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)])
+    matched_at = models.DateTimeField(null=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class Preference(models.Model):
+    preference_list = models.ForeignKey(PreferenceList, related_name='preferences', on_delete=models.CASCADE)
+    seminar = models.ForeignKey(Seminar, related_name='preferences', on_delete=models.CASCADE)
+    rank = models.PositiveSmallIntegerField()
+    matched = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ('rank',)
+        unique_together = (
+            ('preference_list', 'seminar'),
+        )
+
+
+class SeminarChange(models.Model):
+    # Append-only change log read by GET /api/v1/seminar/?since={sync_token}; superseded rows are pruned by
+    # version_seminar_changes. Not a foreign key, so that deleted seminars keep their tombstone. `version` is null
+    # until the change is committed and given a version by seminar.sync.
+    seminar_id = models.PositiveIntegerField(db_index=True)
+    deleted = models.BooleanField(default=False)
+    version = models.BigIntegerField(null=True, db_index=True)
+
+
+class SeminarChangeCounter(models.Model):
+    # Single row holding the last version given to a SeminarChange.
+    value = models.BigIntegerField(default=0)
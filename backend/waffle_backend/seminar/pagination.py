@@ -0,0 +1,10 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class ParticipantCursorPagination(CursorPagination):
+    # Keyset pages of a seminar's UserSeminar rows in id order: every page costs the same, however deep.
+    ordering = 'id'
+    page_size = settings.SEMINAR_PARTICIPANTS_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.SEMINAR_PARTICIPANTS_MAX_PAGE_SIZE
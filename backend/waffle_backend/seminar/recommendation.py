@@ -0,0 +1,203 @@
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from seminar.enrollment import BULK_QUERY_SIZE
+from seminar.models import UserSeminar
+from survey.models import SurveyResult
+
+# Weights of the score: closeness of the python/rdb/programming levels to the participants' average, and the
+# shares of participants with the same major and grade. Scores are between 0 and 1.
+LEVEL_WEIGHT, MAJOR_WEIGHT, GRADE_WEIGHT = 0.6, 0.3, 0.1
+LEVEL_FIELDS = ('python', 'rdb', 'programming')
+# Distance between the lowest and the highest levels in every field.
+MAX_LEVEL_DISTANCE = np.sqrt(len(LEVEL_FIELDS)) * 4
+# Memberships changed shortly before a refresh may only be committed after it, they are read again next time.
+SYNC_OVERLAP = timedelta(minutes=1)
+# Seminars per GET /api/v1/seminar/recommendations/?limit=...
+RECOMMENDATIONS_MAX_LIMIT = 50
+
+
+class _Profiles:
+    # One version of the profiles. Refreshes work on a copy and replace it whole, so that readers never see one
+    # half updated.
+
+    def __init__(self):
+        self.rows = {}
+        self.seminar_ids = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.levels = np.empty((0, len(LEVEL_FIELDS)))
+        self.categories = np.empty((0, 0), dtype=np.int64)
+        self.columns = {}
+        self.users = {}
+        self.last_survey_id = 0
+
+    def copy(self):
+        profiles = _Profiles()
+        profiles.rows, profiles.columns, profiles.users = dict(self.rows), dict(self.columns), dict(self.users)
+        profiles.seminar_ids, profiles.counts = self.seminar_ids.copy(), self.counts.copy()
+        profiles.levels, profiles.categories = self.levels.copy(), self.categories.copy()
+        profiles.last_survey_id = self.last_survey_id
+        return profiles
+
+    def _column(self, kind, value):
+        value = value.strip().lower()
+        if not value:
+            return -1
+        if (kind, value) not in self.columns:
+            self.columns[kind, value] = len(self.columns)
+            self.categories = np.pad(self.categories, ((0, 0), (0, 1)))
+        return self.columns[kind, value]
+
+    def _row(self, seminar_id):
+        if seminar_id not in self.rows:
+            self.rows[seminar_id] = len(self.rows)
+            self.seminar_ids = np.append(self.seminar_ids, seminar_id)
+            self.counts = np.append(self.counts, 0)
+            self.levels = np.vstack([self.levels, np.zeros(len(LEVEL_FIELDS))])
+            self.categories = np.vstack([self.categories, np.zeros(len(self.columns), dtype=np.int64)])
+        return self.rows[seminar_id]
+
+    def load_surveys(self):
+        # Surveys are only ever added, so the ones after the last id seen are all that changed. Returns their users.
+        surveys = SurveyResult.objects.filter(id__gt=self.last_survey_id, user__isnull=False).order_by('id') \
+            .values_list('id', 'user_id', *LEVEL_FIELDS, 'major', 'grade')
+        users = set()
+        for survey_id, user_id, python, rdb, programming, major, grade in surveys.iterator():
+            self.users[user_id] = (np.array([python, rdb, programming], dtype=float),
+                                   self._column('major', major), self._column('grade', grade))
+            self.last_survey_id = survey_id
+            users.add(user_id)
+        return users
+
+    def load_all_seminars(self):
+        members = UserSeminar.objects.filter(role=UserSeminar.PARTICIPANT, is_active=True) \
+            .values_list('seminar_id', 'user_id')
+        for seminar_id, user_id in members.iterator():
+            self._add(self._row(seminar_id), user_id)
+
+    def load_seminars(self, seminar_ids):
+        # Rebuild the rows of the seminars from their active participants.
+        for seminar_id in seminar_ids:
+            row = self._row(seminar_id)
+            self.counts[row] = 0
+            self.levels[row] = 0
+            self.categories[row] = 0
+        for i in range(0, len(seminar_ids), BULK_QUERY_SIZE):
+            members = UserSeminar.objects.filter(
+                seminar_id__in=seminar_ids[i:i + BULK_QUERY_SIZE], role=UserSeminar.PARTICIPANT, is_active=True
+            ).values_list('seminar_id', 'user_id')
+            for seminar_id, user_id in members.iterator():
+                self._add(self.rows[seminar_id], user_id)
+
+    def _add(self, row, user_id):
+        profile = self.users.get(user_id)
+        if profile is None:
+            return
+        levels, major, grade = profile
+        self.counts[row] += 1
+        self.levels[row] += levels
+        for column in (major, grade):
+            if column >= 0:
+                self.categories[row, column] += 1
+
+    def recommend(self, user_id, exclude, limit):
+        profile = self.users.get(user_id)
+        if profile is None:
+            return None
+        levels, major, grade = profile
+        candidates = np.flatnonzero((self.counts > 0) & ~np.isin(self.seminar_ids, list(exclude)))
+        counts = self.counts[candidates]
+        distance = np.linalg.norm(self.levels[candidates] / counts[:, None] - levels, axis=1)
+        scores = LEVEL_WEIGHT * (1 - distance / MAX_LEVEL_DISTANCE)
+        for weight, column in ((MAJOR_WEIGHT, major), (GRADE_WEIGHT, grade)):
+            if column >= 0:
+                scores += weight * self.categories[candidates, column] / counts
+        best = np.argsort(-scores, kind='stable')[:limit]
+        return list(zip(self.seminar_ids[candidates[best]].tolist(), scores[best].tolist()))
+
+
+class SeminarProfiles:
+    """Experience profiles of the seminars' active participants, held in NumPy matrices in each process.
+
+    Every row sums the survey levels of a seminar's participants and counts their majors and grades, from the
+    latest survey of each user. Every SEMINAR_RECOMMENDATION_REFRESH seconds only the rows of seminars whose
+    memberships changed since the last refresh, or whose participants answered a new survey, are rebuilt;
+    everything is reloaded every SEMINAR_RECOMMENDATION_REBUILD seconds. One thread refreshes at a time while
+    the others keep reading the previous profiles; only the very first load is waited for.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self._profiles = None
+        self._synced_at = None
+        self._refreshed_at = self._rebuilt_at = None
+
+    def _due(self, now):
+        if self._rebuilt_at is None or now - self._rebuilt_at >= settings.SEMINAR_RECOMMENDATION_REBUILD:
+            return 'rebuild'
+        if now - self._refreshed_at >= settings.SEMINAR_RECOMMENDATION_REFRESH:
+            return 'refresh'
+        return None
+
+    def refresh(self):
+        if self._due(time.monotonic()) is None:
+            return
+        if not self._lock.acquire(blocking=self._profiles is None):
+            # Another thread is refreshing them.
+            return
+        try:
+            now = time.monotonic()
+            due = self._due(now)
+            if due == 'rebuild':
+                synced_at = timezone.now()
+                profiles = _Profiles()
+                profiles.load_surveys()
+                profiles.load_all_seminars()
+                self._rebuilt_at = now
+            elif due == 'refresh':
+                synced_at = timezone.now()
+                profiles = self._profiles.copy()
+                changed = set(UserSeminar.objects.filter(updated_at__gt=self._synced_at - SYNC_OVERLAP)
+                              .values_list('seminar_id', flat=True).distinct())
+                users = list(profiles.load_surveys())
+                for i in range(0, len(users), BULK_QUERY_SIZE):
+                    changed.update(UserSeminar.objects.filter(
+                        user_id__in=users[i:i + BULK_QUERY_SIZE], role=UserSeminar.PARTICIPANT, is_active=True
+                    ).values_list('seminar_id', flat=True))
+                profiles.load_seminars(sorted(changed))
+            else:
+                return
+            self._profiles, self._synced_at, self._refreshed_at = profiles, synced_at, now
+        finally:
+            self._lock.release()
+
+    def recommend(self, user_id, exclude=(), limit=10):
+        """Seminars ranked by how close their participants' experience is to the user's, best first.
+
+        Returns (seminar_id, score) pairs, or None if the user hasn't answered the survey. Seminars in
+        `exclude` and those without surveyed participants are left out.
+        """
+        self.refresh()
+        return self._profiles.recommend(user_id, exclude, limit)
+
+
+profiles = SeminarProfiles()
+
+
+def recommend(user, limit=10):
+    # Seminars the user is or was a member of (dropped ones can't be taken again) are not recommended.
+    exclude = set(user.seminars.values_list('seminar_id', flat=True))
+    exclude.update(user.archived_seminars.values_list('seminar_id', flat=True))
+    return profiles.recommend(user.id, exclude, limit)
@@ -0,0 +1,60 @@
+import csv
+from datetime import datetime
+
+from seminar.models import UserSeminar
+
+# Rows read per query; the export holds no more than this many at once, whatever the seminar's size.
+ROSTER_CHUNK_SIZE = 1000
+ROSTER_COLUMNS = (
+    ('user_id', 'user_id'),
+    ('username', 'user__username'),
+    ('email', 'user__email'),
+    ('first_name', 'user__first_name'),
+    ('last_name', 'user__last_name'),
+    ('university', 'user__participant__university'),
+    ('role', 'role'),
+    ('joined_at', 'created_at'),
+    ('is_active', 'is_active'),
+    ('dropped_at', 'dropped_at'),
+)
+
+
+class Echo:
+    # File-like object handing each line written by csv.writer back to the caller.
+
+    def write(self, value):
+        return value
+
+
+def roster_rows(seminar_id):
+    """The seminar's UserSeminar rows joined with their users and universities, in id order.
+
+    Read in keyset chunks (id > last id seen) rather than through a single cursor, since the MySQL driver
+    buffers a whole result set on the client.
+    """
+    last_id = 0
+    while True:
+        chunk = list(UserSeminar.objects.filter(seminar_id=seminar_id, id__gt=last_id).order_by('id')
+                     .values_list('id', *[lookup for column, lookup in ROSTER_COLUMNS])[:ROSTER_CHUNK_SIZE])
+        for row in chunk:
+            yield row[1:]
+        if len(chunk) < ROSTER_CHUNK_SIZE:
+            return
+        last_id = chunk[-1][0]
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def stream_roster_csv(seminar_id):
+    # The byte order mark goes out before any query, and lets Excel read the file as UTF-8.
+    yield '\ufeff'
+    writer = csv.writer(Echo())
+    yield writer.writerow([column for column, lookup in ROSTER_COLUMNS])
+    for row in roster_rows(seminar_id):
+        yield writer.writerow([_cell(value) for value in row])
@@ -0,0 +1,61 @@
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from seminar.models import UserSeminar
+
+MINUTES_PER_DAY = 24 * 60
+# A user's schedule is dropped from the cache whenever their memberships change; the timeout bounds the
+# staleness left by a rebuild racing with such a change.
+SCHEDULE_CACHE_TIMEOUT = 60 * 60
+
+
+def schedule_cache_key(user_id):
+    return 'schedule:{}'.format(user_id)
+
+
+def seminar_mask(seminar_time):
+    """Bitmap of the minutes of the day taken by a seminar starting at `seminar_time` (bit 0 is 00:00).
+
+    Sessions last SEMINAR_SESSION_MINUTES and wrap around midnight.
+    """
+    if isinstance(seminar_time, str):
+        seminar_time = datetime.time.fromisoformat(seminar_time)
+    start = seminar_time.hour * 60 + seminar_time.minute
+    mask = ((1 << settings.SEMINAR_SESSION_MINUTES) - 1) << start
+    return (mask | mask >> MINUTES_PER_DAY) & ((1 << MINUTES_PER_DAY) - 1)
+
+
+def occupied_many(user_ids):
+    """Bitmaps of the minutes taken by the active seminars of each user, from the cache.
+
+    Misses are rebuilt with a single query over the active memberships of those users only.
+    """
+    keys = {user_id: schedule_cache_key(user_id) for user_id in user_ids}
+    cached = cache.get_many(keys.values())
+    schedules = {user_id: cached[key] for user_id, key in keys.items() if key in cached}
+    missing = [user_id for user_id in keys if user_id not in schedules]
+    if missing:
+        rebuilt = dict.fromkeys(missing, 0)
+        for user_id, seminar_time in UserSeminar.objects.filter(user_id__in=missing, is_active=True) \
+                .values_list('user_id', 'seminar__time'):
+            rebuilt[user_id] |= seminar_mask(seminar_time)
+        cache.set_many({keys[user_id]: schedule for user_id, schedule in rebuilt.items()},
+                       timeout=SCHEDULE_CACHE_TIMEOUT)
+        schedules.update(rebuilt)
+    return schedules
+
+
+def occupied(user_id):
+    return occupied_many([user_id])[user_id]
+
+
+def schedules_changed(*user_ids):
+    # Called whenever memberships of the users change; their bitmaps are rebuilt on next use. Dropped again
+    # after the commit in case a concurrent request rebuilt one from the rows of before the change.
+    keys = [schedule_cache_key(user_id) for user_id in user_ids]
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
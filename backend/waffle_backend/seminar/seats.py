@@ -0,0 +1,40 @@
+from django.core.cache import caches
+from django.db.models import Count, Q
+
+from seminar.models import Seminar, UserSeminar
+
+# Kept up to date by seminar.events on every change, the timeout only bounds drift from missed updates.
+SEATS_CACHE_TIMEOUT = 60 * 60
+# Seminars per GET /api/v1/seminar/seats/?ids=...
+SEATS_MAX_IDS = 100
+
+
+def seats_cache_key(seminar_id):
+    return 'seats:{}'.format(seminar_id)
+
+
+def seats(seminar_ids):
+    # Capacity and active participant count of the seminars, from the database.
+    return list(Seminar.objects.filter(id__in=seminar_ids).values('id', 'capacity').annotate(participant_count=Count(
+        'users', filter=Q(users__role=UserSeminar.PARTICIPANT, users__is_active=True)
+    )).order_by())
+
+
+def update_seats(seminar_ids):
+    payload = seats(seminar_ids)
+    caches['tiered'].set_many({seats_cache_key(item['id']): item for item in payload}, timeout=SEATS_CACHE_TIMEOUT)
+    return payload
+
+
+def get_seats(seminar_ids):
+    """Seats of the given seminars in order, from the counters in the cache; misses are read from the database.
+
+    Unknown seminars are left out.
+    """
+    keys = {seminar_id: seats_cache_key(seminar_id) for seminar_id in seminar_ids}
+    cached = caches['tiered'].get_many(keys.values())
+    found = {seminar_id: cached[key] for seminar_id, key in keys.items() if key in cached}
+    missing = [seminar_id for seminar_id in keys if seminar_id not in found]
+    if missing:
+        found.update((item['id'], item) for item in update_seats(missing))
+    return [found[seminar_id] for seminar_id in keys if seminar_id in found]
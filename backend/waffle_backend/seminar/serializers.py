@@ -1,6 +1,8 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import transaction
+from django.db.models import Count, Prefetch, Q
 
 from seminar.models import Seminar, UserSeminar
 from user.models import InstructorProfile
@@ -20,10 +22,23 @@ class SeminarSerializer(serializers.ModelSerializer):
             'count',
             'time',
             'online',
+            'open_at',
+            'application_deadline',
             'instructors',
             'participants',
         )
 
+    def get_fields(self):
+        # With ?participants=count only the number of active participants is sent, whatever the seminar's size;
+        # the list itself is paginated by GET /api/v1/seminar/{seminar_id}/participants/.
+        fields = super(SeminarSerializer, self).get_fields()
+        request = self.context.get('request')
+        mode = request and request.query_params.get('participants') or settings.SEMINAR_DETAIL_PARTICIPANTS
+        if mode == 'count':
+            del fields['participants']
+            fields['participant_count'] = serializers.SerializerMethodField()
+        return fields
+
     @transaction.atomic
     def create(self, validated_data):
         user = self.context['request'].user
@@ -46,6 +61,32 @@ class SeminarSerializer(serializers.ModelSerializer):
         participants = seminar.users.filter(role=UserSeminar.PARTICIPANT)
         return ParticipantsSerializer(participants, context=self.context, many=True).data
 
+    def get_participant_count(self, seminar):
+        return seminar.users.filter(role=UserSeminar.PARTICIPANT, is_active=True).count()
+
+
+class PrefetchedSeminarDetailSerializer(SeminarSerializer):
+    # For seminars with all their UserSeminar rows and users prefetched into `memberships` (see prefetched_seminars).
+
+    def get_instructors(self, seminar):
+        instructors = [membership for membership in seminar.memberships if membership.role == UserSeminar.INSTRUCTOR]
+        return InstructorsSerializer(instructors, context=self.context, many=True).data
+
+    def get_participants(self, seminar):
+        participants = [membership for membership in seminar.memberships
+                        if membership.role == UserSeminar.PARTICIPANT]
+        return ParticipantsSerializer(participants, context=self.context, many=True).data
+
+    def get_participant_count(self, seminar):
+        return sum(1 for membership in seminar.memberships
+                   if membership.role == UserSeminar.PARTICIPANT and membership.is_active)
+
+
+def prefetched_seminars(seminar_ids):
+    return Seminar.objects.filter(id__in=seminar_ids).prefetch_related(Prefetch(
+        'users', queryset=UserSeminar.objects.select_related('user').order_by('id'), to_attr='memberships',
+    ))
+
 
 class SimpleSeminarSerializer(serializers.ModelSerializer):
     instructors = serializers.SerializerMethodField()
@@ -68,6 +109,27 @@ class SimpleSeminarSerializer(serializers.ModelSerializer):
         return seminar.users.filter(role=UserSeminar.PARTICIPANT, is_active=True).count()
 
 
+class PrefetchedSeminarSerializer(SimpleSeminarSerializer):
+    # For seminars annotated with `participant_count` and with their instructor rows prefetched into
+    # `instructor_memberships`, so that a page of them is serialized without a query per seminar.
+
+    def get_instructors(self, seminar):
+        return InstructorsSerializer(seminar.instructor_memberships, context=self.context, many=True).data
+
+    def get_participant_count(self, seminar):
+        return seminar.participant_count
+
+
+def with_list_fields(queryset):
+    # Annotates and prefetches what PrefetchedSeminarSerializer reads, in one more query for the instructors.
+    return queryset.annotate(participant_count=Count(
+        'users', filter=Q(users__role=UserSeminar.PARTICIPANT, users__is_active=True)
+    )).prefetch_related(Prefetch(
+        'users', queryset=UserSeminar.objects.filter(role=UserSeminar.INSTRUCTOR).select_related('user'),
+        to_attr='instructor_memberships',
+    ))
+
+
 class InstructorsSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(source='user.id')
     username = serializers.DateTimeField(source='user.username')
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django_redis import get_redis_connection
+from rest_framework.exceptions import AuthenticationFailed
+
+from common.authentication import CachedTokenAuthentication
+from common.cache import listen
+from seminar.seats import get_seats, seats
+
+logger = logging.getLogger(__name__)
+
+SEATS_CHANNEL = 'seminar-seats'
+SEATS_STREAM_PATH = re.compile(r'^/api/v1/seminar/(?P<seminar_id>\d+)/seats/stream/$')
+# Comment lines keep proxies from closing idle streams; without pub/sub the seats are re-read this often.
+HEARTBEAT_INTERVAL = 15
+
+
+def publish_seats(payload):
+    if not payload:
+        return
+    try:
+        get_redis_connection('default').publish(SEATS_CHANNEL, json.dumps(payload))
+    except NotImplementedError:
+        # Not a Redis cache (e.g. local development): only this process' watchers are notified.
+        broadcaster.dispatch(payload)
+    except Exception:
+        logger.warning("Could not publish seat changes.", exc_info=True)
+
+
+class SeatsBroadcaster:
+    """Fans the seat changes published on SEATS_CHANNEL out to the streams of this process.
+
+    A single Redis subscription is shared by every watcher; each one only keeps the latest
+    seats of its seminar, so slow clients skip intermediate counts instead of piling them up.
+    """
+
+    def __init__(self):
+        self._watchers = {}
+        self._lock = threading.Lock()
+        self._listener = None
+        self.connected = False
+
+    def watch(self, seminar_id):
+        self._ensure_listener()
+        queue = asyncio.Queue(maxsize=1)
+        with self._lock:
+            self._watchers.setdefault(seminar_id, set()).add((asyncio.get_event_loop(), queue))
+        return queue
+
+    def unwatch(self, seminar_id, queue):
+        with self._lock:
+            watchers = self._watchers.get(seminar_id, set())
+            watchers.difference_update([watcher for watcher in watchers if watcher[1] is queue])
+            if not watchers:
+                self._watchers.pop(seminar_id, None)
+
+    def dispatch(self, payload):
+        for item in payload:
+            with self._lock:
+                watchers = list(self._watchers.get(item['id'], ()))
+            for loop, queue in watchers:
+                loop.call_soon_threadsafe(_offer, queue, item)
+
+    def _ensure_listener(self):
+        if self._listener is None:
+            with self._lock:
+                if self._listener is None:
+                    self._listener = threading.Thread(target=self._listen, name='seats-broadcaster', daemon=True)
+                    self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = get_redis_connection('default').pubsub(ignore_subscribe_messages=True)
+            except NotImplementedError:
+                return
+            try:
+                pubsub.subscribe(SEATS_CHANNEL)
+                self.connected = True
+                for message in listen(pubsub):
+                    self.dispatch(json.loads(message['data']))
+            except Exception:
+                logger.warning("Lost the seats channel, reconnecting.", exc_info=True)
+            self.connected = False
+            time.sleep(1)
+
+
+def _offer(queue, item):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(item)
+
+
+broadcaster = SeatsBroadcaster()
+
+
+def _event(item):
+    return 'event: seats\ndata: {}\n\n'.format(json.dumps(item)).encode()
+
+
+def _db(func, *args):
+    # Streams live outside Django's request cycle, which is what closes stale and broken connections: close
+    # them around every call instead, on the one thread that sync_to_async runs them on.
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def _in_thread(func, *args):
+    return await sync_to_async(_db, thread_sensitive=True)(func, *args)
+
+
+async def _respond(send, status, body):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': json.dumps(body).encode()})
+
+
+async def seats_stream(scope, receive, send):
+    """GET /api/v1/seminar/{seminar_id}/seats/stream/?token={token}
+
+    Server-Sent Events stream of the seminar's capacity and participant_count: the current
+    value first, then one 'seats' event per change. EventSource can't send headers, hence the token
+    in the query string.
+    """
+    seminar_id = int(SEATS_STREAM_PATH.match(scope['path']).group('seminar_id'))
+    token = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+    try:
+        if token is None:
+            raise AuthenticationFailed()
+        await _in_thread(CachedTokenAuthentication().authenticate_credentials, token)
+    except AuthenticationFailed:
+        return await _respond(send, 401, {'error': "Invalid token."})
+
+    current = await _in_thread(get_seats, [seminar_id])
+    if not current:
+        return await _respond(send, 404, {'error': "Not found."})
+
+    queue = broadcaster.watch(seminar_id)
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        await send({'type': 'http.response.body', 'body': _event(current[0]), 'more_body': True})
+        while not disconnected.done():
+            update = asyncio.ensure_future(queue.get())
+            await asyncio.wait({update, disconnected}, timeout=HEARTBEAT_INTERVAL,
+                               return_when=asyncio.FIRST_COMPLETED)
+            if update.done():
+                body = _event(update.result())
+            else:
+                update.cancel()
+                if disconnected.done():
+                    break
+                body = b': keepalive\n\n'
+                if not broadcaster.connected:
+                    body = _event((await _in_thread(seats, [seminar_id]) or current)[0])
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        disconnected.cancel()
+        broadcaster.unwatch(seminar_id, queue)
+
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
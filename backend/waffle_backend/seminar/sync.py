@@ -0,0 +1,84 @@
+import logging
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from seminar.models import Seminar, SeminarChange, SeminarChangeCounter
+
+logger = logging.getLogger(__name__)
+
+
+def log_changes(seminar_ids, deleted=False):
+    # Called in the transaction that changes the seminars. The log is only appended to, so that concurrent
+    # enrollments in a seminar don't wait on each other's log row; the rows get a version once it commits.
+    change_ids = [SeminarChange.objects.create(seminar_id=seminar_id, deleted=deleted).id
+                  for seminar_id in set(seminar_ids)]
+    if change_ids:
+        transaction.on_commit(lambda: _version_committed(change_ids))
+
+
+def _version_committed(change_ids):
+    try:
+        version_changes(change_ids)
+    except Exception:
+        # Left without a version until the next run of version_seminar_changes.
+        logger.warning("Could not version seminar changes.", exc_info=True)
+
+
+def version_changes(change_ids=None):
+    """Give the next version to committed changes: those of `change_ids`, or every one still without a version.
+
+    Versions are given out under the counter's lock and commit with the counter, so a reader that sees the
+    counter at some value also sees every change versioned up to it. Without `change_ids`, the changes still locked by a
+    running transaction are skipped; its commit hook versions them.
+    """
+    with transaction.atomic():
+        counter = SeminarChangeCounter.objects.select_for_update().get_or_create(pk=1)[0]
+        pending = SeminarChange.objects.filter(version__isnull=True)
+        if change_ids is None:
+            change_ids = list(pending.select_for_update(skip_locked=True).values_list('id', flat=True))
+        if change_ids and pending.filter(id__in=change_ids).update(version=counter.value + 1):
+            counter.value += 1
+            counter.save(update_fields=['value'])
+    return counter.value
+
+
+def prune_changes(batch_size=1000):
+    """Delete the changes superseded by a later versioned change of the same seminar, and return their number.
+
+    A sync only sends the latest change of each seminar, so the earlier ones are never read again.
+    """
+    superseded = SeminarChange.objects.filter(version__isnull=False).filter(Exists(
+        SeminarChange.objects.filter(seminar_id=OuterRef('seminar_id')).filter(
+            Q(version__gt=OuterRef('version')) | Q(version=OuterRef('version'), id__gt=OuterRef('id'))
+        )
+    ))
+    total = 0
+    while True:
+        change_ids = list(superseded.values_list('id', flat=True)[:batch_size])
+        if not change_ids:
+            return total
+        total += SeminarChange.objects.filter(id__in=change_ids).delete()[0]
+
+
+def changes_since(sync_token):
+    """Ids of the seminars changed and deleted after `sync_token`, and the sync token to send next time.
+
+    Reads the counter and then the change log through its version index, without locking either: every
+    change up to the counter's value has committed with its version.
+    """
+    version = SeminarChangeCounter.objects.filter(pk=1).values_list('value', flat=True).first() or 0
+    rows = (SeminarChange.objects.filter(version__gt=sync_token, version__lte=version)
+            .order_by('version', 'id').values_list('seminar_id', 'deleted'))
+    # The latest change of each seminar wins.
+    latest = dict(rows)
+    changed = [seminar_id for seminar_id, deleted in latest.items() if not deleted]
+    deleted = [seminar_id for seminar_id, deleted in latest.items() if deleted]
+    return changed, deleted, max(sync_token, version)
+
+
+@receiver(post_delete, sender=Seminar)
+def log_deleted_seminar(sender, instance, **kwargs):
+    log_changes([instance.id], deleted=True)
@@ -1,12 +1,45 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+import asyncio
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from asgiref.sync import async_to_sync, sync_to_async
 from django.contrib.auth.models import User
-from django.test import Client, TestCase
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import close_old_connections, connection
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 import json
 
-from seminar.models import Seminar, UserSeminar
+from seminar.bootstrap import SEMINAR_PAGE_CACHE_KEY, bootstrap_cache_key
+from seminar.enrollment import check_schedule, lock_participants, lottery_order
+from seminar.matching import match
+from seminar.models import (
+    ArchivedUserSeminar, EnrollmentRequest, Seminar, SeminarApplication, SeminarChange, UserSeminar,
+)
+from seminar.recommendation import profiles
+from seminar.schedule import occupied_many, schedule_cache_key
+from seminar.seats import update_seats
+from seminar.streams import broadcaster, publish_seats
+from seminar.sync import log_changes, version_changes
+from seminar.views import SeminarViewSet
 from user.models import InstructorProfile, ParticipantProfile
 from user.tests_user import GetUserIdTestCase
+from waffle_backend.asgi import application
+
+
+def clear_schedules():
+    # Redis outlives the test database, whose user ids are reused by later test cases.
+    cache.delete_pattern(schedule_cache_key('*'))
 
 
 class PostSeminarTestCase(TestCase):
@@ -549,6 +582,7 @@ class GetSeminarTestCase(TestCase):
     client = Client()
 
     def setUp(self):
+        clear_schedules()
         # participant1
         self.client.post(
             '/api/v1/user/',
@@ -805,6 +839,7 @@ class PostSeminarIdUserTestCase(TestCase):
     client = Client()
 
     def setUp(self):
+        clear_schedules()
         # participant1
         self.client.post(
             '/api/v1/user/',
@@ -1048,6 +1083,7 @@ class DeleteSeminarIdUserTestCase(TestCase):
     client = Client()
 
     def setUp(self):
+        clear_schedules()
         # participant1
         self.client.post(
             '/api/v1/user/',
@@ -1156,3 +1192,1450 @@ class DeleteSeminarIdUserTestCase(TestCase):
             HTTP_AUTHORIZATION=self.instructor1_token
         )
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class SeminarWaitlistTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        clear_schedules()
+        for username in ('participant1', 'participant2', 'participant3'):
+            self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": username,
+                    "password": "1234",
+                    "first_name": "yeonghyeon",
+                    "last_name": "Ko",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": "participant",
+                    "university": "SNU"
+                }),
+                content_type='application/json'
+            )
+        self.participant1_token = 'Token ' + Token.objects.get(user__username='participant1').key
+        self.participant2_token = 'Token ' + Token.objects.get(user__username='participant2').key
+        self.participant3_token = 'Token ' + Token.objects.get(user__username='participant3').key
+
+        # instructor1
+        self.client.post(
+            '/api/v1/user/',
+            json.dumps({
+                "username": "instructor1",
+                "password": "1234",
+                "first_name": "yeonghyeon",
+                "last_name": "Ko",
+                "email": "newstellar@snu.ac.kr",
+                "role": "instructor",
+                "company": "orangenongjang",
+                "year": 1
+            }),
+            content_type='application/json'
+        )
+        self.instructor1_token = 'Token ' + Token.objects.get(user__username='instructor1').key
+
+        # seminar1 (capacity 1)
+        self.client.post(
+            '/api/v1/seminar/',
+            json.dumps({
+                "name": "Bayesian",
+                "time": "14:30",
+                "online": True,
+                "count": 3,
+                "capacity": 1
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.instructor1_token
+        )
+        self.seminar = Seminar.objects.last()
+
+        response = self.client.post(
+            '/api/v1/seminar/{}/user/'.format(self.seminar.id),
+            json.dumps({
+                "role": "participant"
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.participant1_token
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_waitlist_promotion_on_drop(self):
+        # Without 'waitlist', a full seminar still rejects the request.
+        response = self.client.post(
+            '/api/v1/seminar/{}/user/'.format(self.seminar.id),
+            json.dumps({
+                "role": "participant"
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.participant2_token
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        for position, token in enumerate((self.participant2_token, self.participant3_token), start=1):
+            response = self.client.post(
+                '/api/v1/seminar/{}/user/'.format(self.seminar.id),
+                json.dumps({
+                    "role": "participant",
+                    "waitlist": True
+                }),
+                content_type='application/json',
+                HTTP_AUTHORIZATION=token
+            )
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            self.assertEqual(response.json()["position"], position)
+
+        response = self.client.get(
+            '/api/v1/seminar/{}/waitlist/'.format(self.seminar.id),
+            HTTP_AUTHORIZATION=self.participant3_token
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["position"], 2)
+        self.assertEqual(response.json()["waitlist_count"], 2)
+
+        response = self.client.delete(
+            '/api/v1/seminar/{}/user/'.format(self.seminar.id),
+            HTTP_AUTHORIZATION=self.participant1_token
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        active = self.seminar.users.filter(role=UserSeminar.PARTICIPANT, is_active=True)
+        self.assertListEqual([us.user.username for us in active], ['participant2'])
+        response = self.client.get(
+            '/api/v1/seminar/{}/waitlist/'.format(self.seminar.id),
+            HTTP_AUTHORIZATION=self.participant3_token
+        )
+        self.assertEqual(response.json()["position"], 1)
+
+    def test_leave_waitlist(self):
+        response = self.client.delete(
+            '/api/v1/seminar/{}/waitlist/'.format(self.seminar.id),
+            HTTP_AUTHORIZATION=self.participant2_token
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.post(
+            '/api/v1/seminar/{}/user/'.format(self.seminar.id),
+            json.dumps({
+                "role": "participant",
+                "waitlist": True
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.participant2_token
+        )
+        response = self.client.delete(
+            '/api/v1/seminar/{}/waitlist/'.format(self.seminar.id),
+            HTTP_AUTHORIZATION=self.participant2_token
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.client.delete(
+            '/api/v1/seminar/{}/user/'.format(self.seminar.id),
+            HTTP_AUTHORIZATION=self.participant1_token
+        )
+        self.assertFalse(self.seminar.users.filter(role=UserSeminar.PARTICIPANT, is_active=True).exists())
+
+
+class PostSeminarIdUserBulkTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        clear_schedules()
+        for username in ('participant1', 'participant2', 'participant3'):
+            self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": username,
+                    "password": "1234",
+                    "first_name": "yeonghyeon",
+                    "last_name": "Ko",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": "participant",
+                    "university": "SNU"
+                }),
+                content_type='application/json'
+            )
+        self.participant1_token = 'Token ' + Token.objects.get(user__username='participant1').key
+
+        for username in ('instructor1', 'instructor2'):
+            self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": username,
+                    "password": "1234",
+                    "first_name": "yeonghyeon",
+                    "last_name": "Ko",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": "instructor",
+                    "company": "orangenongjang",
+                    "year": 1
+                }),
+                content_type='application/json'
+            )
+        self.instructor1_token = 'Token ' + Token.objects.get(user__username='instructor1').key
+
+        # seminar1
+        self.client.post(
+            '/api/v1/seminar/',
+            json.dumps({
+                "name": "Bayesian",
+                "time": "14:30",
+                "online": True,
+                "count": 3,
+                "capacity": 2
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.instructor1_token
+        )
+        self.seminar = Seminar.objects.last()
+
+    def test_bulk_enroll(self):
+        response = self.client.post(
+            '/api/v1/seminar/{}/user/bulk/'.format(self.seminar.id),
+            json.dumps({
+                "usernames": ["participant1", "instructor2", "nobody", "participant2", "participant1", "participant3"]
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.instructor1_token
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["enrolled"], 2)
+        self.assertListEqual(
+            [(result["username"], result["status"]) for result in data["results"]],
+            [("participant1", "enrolled"), ("instructor2", "failed"), ("nobody", "failed"),
+             ("participant2", "enrolled"), ("participant3", "failed")]
+        )
+        self.assertEqual(data["results"][4]["error"], "The seminar is beyond capacity.")
+        self.assertEqual(self.seminar.users.filter(role=UserSeminar.PARTICIPANT, is_active=True).count(), 2)
+
+    @mock.patch('seminar.enrollment.BULK_QUERY_SIZE', 1)
+    def test_bulk_enroll_stops_at_capacity(self):
+        with mock.patch('seminar.enrollment.occupied_many', wraps=occupied_many) as schedules:
+            response = self.client.post(
+                '/api/v1/seminar/{}/user/bulk/'.format(self.seminar.id),
+                json.dumps({
+                    "usernames": ["participant1", "participant2", "participant3"]
+                }),
+                content_type='application/json',
+                HTTP_AUTHORIZATION=self.instructor1_token
+            )
+        self.assertEqual(response.json()["enrolled"], 2)
+        self.assertEqual(response.json()["results"][2]["error"], "The seminar is beyond capacity.")
+        # The seats were taken by the first two candidates: the third one isn't checked.
+        participant3 = User.objects.get(username='participant3')
+        self.assertNotIn(mock.call([participant3.id]), schedules.call_args_list)
+        self.assertEqual(schedules.call_count, 2)
+
+    def test_bulk_enroll_forbidden(self):
+        response = self.client.post(
+            '/api/v1/seminar/{}/user/bulk/'.format(self.seminar.id),
+            json.dumps({
+                "usernames": ["participant1"]
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.participant1_token
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.post(
+            '/api/v1/seminar/{}/user/bulk/'.format(self.seminar.id),
+            json.dumps({
+                "usernames": "participant1"
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.instructor1_token
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SeminarQueryPlanTestCase(TestCase):
+
+    def setUp(self):
+        clear_schedules()
+        self.user = User.objects.create(username='participant1')
+        self.seminar = Seminar.objects.create(name='Bayesian', capacity=2, count=3, time='14:30')
+        UserSeminar.objects.create(user=self.user, seminar=self.seminar, role=UserSeminar.PARTICIPANT)
+
+    def assertUsesIndex(self, queryset):
+        if connection.vendor == 'mysql':
+            plan = queryset.explain(format='json')
+
+            def tables(node):
+                if isinstance(node, dict):
+                    if 'table_name' in node:
+                        yield node
+                    for value in node.values():
+                        yield from tables(value)
+                elif isinstance(node, list):
+                    for value in node:
+                        yield from tables(value)
+
+            for table in tables(json.loads(plan)):
+                self.assertNotEqual(table.get('access_type'), 'ALL', msg=plan)
+                self.assertIsNotNone(table.get('key'), msg=plan)
+        else:
+            plan = queryset.explain()
+            self.assertNotIn('TEMP B-TREE', plan)
+            for line in plan.splitlines():
+                if 'SCAN' in line or 'SEARCH' in line:
+                    self.assertIn('INDEX', line, msg=plan)
+
+    def assertSortsByIndex(self, queryset):
+        if connection.vendor == 'mysql':
+            # MySQL weighs an index scan against a filesort for a read of the whole table; either way it must not
+            # go through a temporary table.
+            plan = queryset.explain(format='json')
+            self.assertNotIn('using_temporary_table', plan)
+        else:
+            plan = queryset.explain()
+            self.assertNotIn('TEMP B-TREE', plan)
+            self.assertIn('seminar_created_at_idx', plan)
+
+    def test_seminar_list_sorts_by_index(self):
+        # The queryset of the list endpoint, which has no page: it reads every seminar each time its cached
+        # payload is rebuilt, so the index can only spare it the sort.
+        view = SeminarViewSet(action='list')
+        for ordering in ('-created_at', 'created_at'):
+            self.assertSortsByIndex(view.get_queryset().order_by(ordering))
+
+    def test_enrollment_queries_use_index(self):
+        # capacity checks in enroll_drop and SimpleSeminarSerializer.get_participant_count
+        self.assertUsesIndex(UserSeminar.objects.filter(seminar=self.seminar, role=UserSeminar.PARTICIPANT,
+                                                        is_active=True))
+        # SeminarSerializer.get_instructors / get_participants and the capacity check of update
+        self.assertUsesIndex(self.seminar.users.filter(role=UserSeminar.INSTRUCTOR))
+        self.assertUsesIndex(self.seminar.users.filter(role=UserSeminar.PARTICIPANT))
+        # membership checks in enroll_drop
+        self.assertUsesIndex(self.user.seminars.filter(role=UserSeminar.PARTICIPANT, seminar=self.seminar))
+        # ParticipantProfileSerializer.get_seminars
+        self.assertUsesIndex(UserSeminar.objects.filter(user=self.user))
+
+
+class ArchiveEnrollmentsTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        clear_schedules()
+        for username in ('participant1', 'participant2'):
+            self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": username,
+                    "password": "1234",
+                    "first_name": "yeonghyeon",
+                    "last_name": "Ko",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": "participant",
+                    "university": "SNU"
+                }),
+                content_type='application/json'
+            )
+        self.participant1_token = 'Token ' + Token.objects.get(user__username='participant1').key
+
+        self.seminar = Seminar.objects.create(name='Bayesian', capacity=2, count=3, time='14:30')
+        for user in User.objects.all():
+            UserSeminar.objects.create(user=user, seminar=self.seminar, role=UserSeminar.PARTICIPANT)
+        # participant1 dropped long ago, participant2 yesterday.
+        UserSeminar.objects.filter(user__username='participant1').update(
+            is_active=False, dropped_at=timezone.now() - timedelta(days=365))
+        UserSeminar.objects.filter(user__username='participant2').update(
+            is_active=False, dropped_at=timezone.now() - timedelta(days=1))
+
+    def test_archive_enrollments(self):
+        call_command('archive_enrollments', days=30, batch_size=1, stdout=StringIO())
+        self.assertListEqual(list(UserSeminar.objects.values_list('user__username', flat=True)), ['participant2'])
+        self.assertListEqual(list(ArchivedUserSeminar.objects.values_list('user__username', flat=True)),
+                             ['participant1'])
+
+        # Running it again is a no-op.
+        call_command('archive_enrollments', days=30, stdout=StringIO())
+        self.assertEqual(ArchivedUserSeminar.objects.count(), 1)
+
+        # The history still shows the archived enrollment.
+        response = self.client.get('/api/v1/user/me/', HTTP_AUTHORIZATION=self.participant1_token)
+        seminars = response.json()["participant"]["seminars"]
+        self.assertEqual(len(seminars), 1)
+        self.assertEqual(seminars[0]["id"], self.seminar.id)
+        self.assertFalse(seminars[0]["is_active"])
+        self.assertIsNotNone(seminars[0]["dropped_at"])
+
+        # ...and still forbids enrolling again.
+        response = self.client.post(
+            '/api/v1/seminar/{}/user/'.format(self.seminar.id),
+            json.dumps({
+                "role": "participant"
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.participant1_token
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["error"], "The user who've dropped cannot enroll in the same seminar")
+
+
+class SeatsStreamTestCase(TransactionTestCase):
+    # The streams query the database from a worker thread, on a connection of its own: what the test writes must
+    # be committed for them to see it.
+    client = Client()
+
+    def setUp(self):
+        clear_schedules()
+        patcher = mock.patch('seminar.streams.close_old_connections', wraps=close_old_connections)
+        self.close_old_connections = patcher.start()
+        self.addCleanup(patcher.stop)
+        for username, role in (('participant1', 'participant'), ('instructor1', 'instructor')):
+            self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": username,
+                    "password": "1234",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": role,
+                }),
+                content_type='application/json'
+            )
+        self.participant1_key = Token.objects.get(user__username='participant1').key
+        self.client.post(
+            '/api/v1/seminar/',
+            json.dumps({
+                "name": "Bayesian",
+                "time": "14:30",
+                "count": 3,
+                "capacity": 10
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION='Token ' + Token.objects.get(user__username='instructor1').key
+        )
+        self.seminar = Seminar.objects.last()
+
+    def stream(self, path, query_string, on_event=None):
+        sent = []
+
+        async def run():
+            disconnect = asyncio.Queue()
+
+            async def send(message):
+                sent.append(message)
+                if message['type'] == 'http.response.body' and message.get('more_body'):
+                    if on_event is not None and len(sent) == 2:
+                        await sync_to_async(on_event)()
+                    else:
+                        await disconnect.put({'type': 'http.disconnect'})
+
+            await application({'type': 'http', 'path': path, 'query_string': query_string}, disconnect.get, send)
+
+        async_to_sync(run)()
+        return sent
+
+    def test_seats_stream(self):
+        path = '/api/v1/seminar/{}/seats/stream/'.format(self.seminar.id)
+        self.assertEqual(self.stream(path, b'token=wrong')[0]['status'], status.HTTP_401_UNAUTHORIZED)
+        query_string = 'token={}'.format(self.participant1_key).encode()
+        self.assertEqual(self.stream('/api/v1/seminar/0/seats/stream/', query_string)[0]['status'],
+                         status.HTTP_404_NOT_FOUND)
+
+        def enroll():
+            response = self.client.post(
+                '/api/v1/seminar/{}/user/'.format(self.seminar.id),
+                json.dumps({"role": "participant"}),
+                content_type='application/json',
+                HTTP_AUTHORIZATION='Token ' + self.participant1_key
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            # What the commit hook of the enrollment does.
+            publish_seats(update_seats([self.seminar.id]))
+
+        self.close_old_connections.reset_mock()
+        sent = self.stream(path, query_string, on_event=enroll)
+        self.assertEqual(sent[0]['status'], status.HTTP_200_OK)
+        # Around the authentication and the first read of the seats.
+        self.assertEqual(self.close_old_connections.call_count, 4)
+        self.assertIn((b'content-type', b'text/event-stream'), sent[0]['headers'])
+        events = [json.loads(message['body'].decode().split('data: ')[1]) for message in sent[1:]]
+        self.assertEqual(events, [
+            {'id': self.seminar.id, 'capacity': 10, 'participant_count': 0},
+            {'id': self.seminar.id, 'capacity': 10, 'participant_count': 1},
+        ])
+
+    def test_streams_share_one_subscription(self):
+        path = '/api/v1/seminar/{}/seats/stream/'.format(self.seminar.id)
+        query_string = 'token={}'.format(self.participant1_key).encode()
+        sent = []
+        watchers = []
+
+        async def run():
+            both_open = asyncio.Event()
+
+            async def send(message):
+                sent.append(message)
+                if message.get('more_body') and len([item for item in sent if item.get('more_body')]) == 2:
+                    watchers.append(len(broadcaster._watchers[self.seminar.id]))
+                    both_open.set()
+
+            async def receive():
+                await both_open.wait()
+                return {'type': 'http.disconnect'}
+
+            scope = {'type': 'http', 'path': path, 'query_string': query_string}
+            await asyncio.gather(application(scope, receive, send), application(scope, receive, send))
+
+        async_to_sync(run)()
+        self.assertEqual([message['status'] for message in sent if message['type'] == 'http.response.start'],
+                         [status.HTTP_200_OK, status.HTTP_200_OK])
+        self.assertEqual(watchers, [2])
+        # Both streams went through the tiered cache and the broadcaster: one subscription each, not per stream.
+        for name in ('cache-invalidation-tiered', 'seats-broadcaster'):
+            self.assertEqual(len([thread for thread in threading.enumerate() if thread.name == name]), 1)
+
+    def test_broadcaster_outlasts_quiet_channel(self):
+        broadcaster._ensure_listener()
+        with mock.patch('seminar.streams.logger') as logger:
+            # Longer than the socket timeout, with nothing published.
+            time.sleep(0.5)
+        logger.warning.assert_not_called()
+
+    def test_get_seats(self):
+        token = 'Token ' + self.participant1_key
+        response = self.client.get('/api/v1/seminar/{}/seats/'.format(self.seminar.id), HTTP_AUTHORIZATION=token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'id': self.seminar.id, 'capacity': 10, 'participant_count': 0})
+
+        response = self.client.get('/api/v1/seminar/0/seats/', HTTP_AUTHORIZATION=token)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # Answered from the counters.
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/seminar/seats/?ids={}'.format(self.seminar.id),
+                                       HTTP_AUTHORIZATION=token)
+        self.assertEqual(response.json(), [{'id': self.seminar.id, 'capacity': 10, 'participant_count': 0}])
+
+        response = self.client.get('/api/v1/seminar/seats/?ids=1,x', HTTP_AUTHORIZATION=token)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(SEMINAR_ASYNC_ENROLLMENT=True)
+class AsyncEnrollmentTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        clear_schedules()
+        for username, role in (('participant1', 'participant'), ('participant2', 'participant'),
+                               ('instructor1', 'instructor')):
+            self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": username,
+                    "password": "1234",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": role,
+                }),
+                content_type='application/json'
+            )
+        self.participant1_token = 'Token ' + Token.objects.get(user__username='participant1').key
+        self.participant2_token = 'Token ' + Token.objects.get(user__username='participant2').key
+        self.client.post(
+            '/api/v1/seminar/',
+            json.dumps({
+                "name": "Bayesian",
+                "time": "14:30",
+                "count": 3,
+                "capacity": 1
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION='Token ' + Token.objects.get(user__username='instructor1').key
+        )
+        self.seminar = Seminar.objects.last()
+
+    def enroll(self, token):
+        return self.client.post(
+            '/api/v1/seminar/{}/user/'.format(self.seminar.id),
+            json.dumps({"role": "participant"}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=token
+        )
+
+    def test_enrollment_is_queued_and_applied_in_order(self):
+        response = self.enroll(self.participant1_token)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        ticket1 = response.json()["ticket"]
+        self.assertEqual(response.json()["status"], "pending")
+        self.assertEqual(response.json()["position"], 1)
+        self.assertEqual(self.enroll(self.participant1_token).json()["ticket"], ticket1)
+
+        response = self.enroll(self.participant2_token)
+        ticket2 = response.json()["ticket"]
+        self.assertEqual(response.json()["position"], 2)
+        self.assertFalse(UserSeminar.objects.filter(seminar=self.seminar, role=UserSeminar.PARTICIPANT).exists())
+
+        stdout = StringIO()
+        call_command('process_enrollments', '--once', stdout=stdout)
+        self.assertIn("Done: 2 enrollment requests processed.", stdout.getvalue())
+
+        url = '/api/v1/seminar/{}/user/requests/{}/'
+        response = self.client.get(url.format(self.seminar.id, ticket1), HTTP_AUTHORIZATION=self.participant1_token)
+        self.assertEqual(response.json(), {
+            "ticket": ticket1, "seminar": self.seminar.id, "status": "enrolled", "error": None, "position": None,
+        })
+        response = self.client.get(url.format(self.seminar.id, ticket2), HTTP_AUTHORIZATION=self.participant2_token)
+        self.assertEqual(response.json()["status"], "failed")
+        self.assertEqual(response.json()["error"], "The seminar is beyond capacity.")
+        self.assertTrue(UserSeminar.objects.filter(seminar=self.seminar, user__username='participant1').exists())
+
+        # Tickets are only visible to their owner.
+        response = self.client.get(url.format(self.seminar.id, ticket1), HTTP_AUTHORIZATION=self.participant2_token)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # A later request fails on the membership check, once there is a seat to check it for.
+        Seminar.objects.filter(id=self.seminar.id).update(capacity=2)
+        self.enroll(self.participant1_token)
+        call_command('process_enrollments', '--once', stdout=StringIO())
+        self.assertEqual(EnrollmentRequest.objects.last().error, "You've been already included in the seminar.")
+
+
+@override_settings(SEMINAR_ADMISSION_RATE=0.01, SEMINAR_ADMISSION_BURST=1)
+class WaitingRoomTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        clear_schedules()
+        # Queue places are kept in the cache, by seminar and user id.
+        cache.clear()
+        for username, role in (('participant1', 'participant'), ('participant2', 'participant'),
+                               ('instructor1', 'instructor')):
+            self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": username,
+                    "password": "1234",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": role,
+                }),
+                content_type='application/json'
+            )
+        self.participant1_token = 'Token ' + Token.objects.get(user__username='participant1').key
+        self.participant2_token = 'Token ' + Token.objects.get(user__username='participant2').key
+        self.instructor1_token = 'Token ' + Token.objects.get(user__username='instructor1').key
+        self.client.post(
+            '/api/v1/seminar/',
+            json.dumps({
+                "name": "Bayesian",
+                "time": "14:30",
+                "count": 3,
+                "capacity": 10
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.instructor1_token
+        )
+        self.seminar = Seminar.objects.last()
+
+    def schedule(self, open_at):
+        response = self.client.put(
+            '/api/v1/seminar/{}/'.format(self.seminar.id),
+            json.dumps({"name": "Bayesian", "open_at": open_at.isoformat()}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.instructor1_token
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def enroll(self, token, ticket=None, key=None):
+        headers = {}
+        if ticket:
+            headers['HTTP_X_QUEUE_TICKET'] = ticket
+        if key:
+            headers['HTTP_IDEMPOTENCY_KEY'] = key
+        return self.client.post(
+            '/api/v1/seminar/{}/user/'.format(self.seminar.id),
+            json.dumps({"role": "participant"}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=token,
+            **headers
+        )
+
+    def test_registration_opens_at_scheduled_time(self):
+        self.schedule(timezone.now() + timedelta(hours=1))
+        response = self.enroll(self.participant1_token)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertIn("opens at", response.json()["error"])
+
+        # The queue can be joined before the opening.
+        response = self.client.post('/api/v1/seminar/{}/queue/'.format(self.seminar.id),
+                                    HTTP_AUTHORIZATION=self.participant1_token)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(response.json()["admitted"])
+
+    def test_tickets_are_admitted_in_order(self):
+        self.schedule(timezone.now() - timedelta(seconds=1))
+        url = '/api/v1/seminar/{}/queue/'.format(self.seminar.id)
+        ticket1 = self.client.post(url, HTTP_AUTHORIZATION=self.participant1_token).json()
+        ticket2 = self.client.post(url, HTTP_AUTHORIZATION=self.participant2_token).json()
+        self.assertEqual((ticket1["position"], ticket2["position"]), (1, 2))
+        # Asking again keeps the place.
+        self.assertEqual(self.client.post(url, HTTP_AUTHORIZATION=self.participant1_token).json()["position"], 1)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'ticket': ticket2["ticket"]}, HTTP_AUTHORIZATION=self.participant2_token)
+        self.assertFalse(response.json()["admitted"])
+        self.assertGreater(response.json()["wait_seconds"], 0)
+        response = self.client.get('/api/v1/seminar/x/queue/', {'ticket': ticket2["ticket"]},
+                                   HTTP_AUTHORIZATION=self.participant2_token)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.assertEqual(self.enroll(self.participant1_token).status_code, status.HTTP_403_FORBIDDEN)
+        # Another user's ticket is rejected.
+        self.assertEqual(self.enroll(self.participant2_token, ticket1["ticket"]).status_code,
+                         status.HTTP_403_FORBIDDEN)
+        response = self.enroll(self.participant2_token, ticket2["ticket"])
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+        # Refusals aren't replayed to retries with the same Idempotency-Key, which are admitted once it's their turn.
+        key = str(uuid.uuid4())
+        response = self.enroll(self.participant2_token, ticket2["ticket"], key=key)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        response = self.enroll(self.participant2_token, ticket2["ticket"], key=key)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(self.enroll(self.participant1_token, key=key).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.enroll(self.participant1_token, ticket1["ticket"], key=key).status_code,
+                         status.HTTP_201_CREATED)
+
+
+    @override_settings(THROTTLE_TOKEN_BUCKETS={'enroll': {'user': '2/min'}, 'queue_status': {'user': '100/min'}})
+    def test_polling_keeps_enroll_tokens(self):
+        self.schedule(timezone.now() - timedelta(seconds=1))
+        url = '/api/v1/seminar/{}/queue/'.format(self.seminar.id)
+        ticket = self.client.post(url, HTTP_AUTHORIZATION=self.participant1_token).json()["ticket"]
+        for _ in range(3):
+            response = self.client.get(url, {'ticket': ticket}, HTTP_AUTHORIZATION=self.participant1_token)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.enroll(self.participant1_token, ticket).status_code, status.HTTP_201_CREATED)
+
+
+class SeminarLotteryTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        clear_schedules()
+        self.tokens = {}
+        for username, role in (('participant1', 'participant'), ('participant2', 'participant'),
+                               ('participant3', 'participant'), ('instructor1', 'instructor')):
+            self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": username,
+                    "password": "1234",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": role,
+                }),
+                content_type='application/json'
+            )
+            self.tokens[username] = 'Token ' + Token.objects.get(user__username=username).key
+        self.client.post(
+            '/api/v1/seminar/',
+            json.dumps({
+                "name": "Bayesian",
+                "time": "14:30",
+                "count": 3,
+                "capacity": 2
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.tokens['instructor1']
+        )
+        self.seminar = Seminar.objects.last()
+        response = self.client.put(
+            '/api/v1/seminar/{}/'.format(self.seminar.id),
+            json.dumps({"name": "Bayesian", "application_deadline": (timezone.now() + timedelta(hours=1)).isoformat()}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.tokens['instructor1']
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_seats_are_drawn_by_lottery(self):
+        url = '/api/v1/seminar/{}/application/'.format(self.seminar.id)
+        for username in ('participant1', 'participant2', 'participant3', 'participant1'):
+            response = self.client.post(url, HTTP_AUTHORIZATION=self.tokens[username])
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.json()["status"], "applied")
+        self.assertEqual(SeminarApplication.objects.filter(seminar=self.seminar).count(), 3)
+
+        response = self.client.post(
+            '/api/v1/seminar/{}/user/'.format(self.seminar.id),
+            json.dumps({"role": "participant"}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.tokens['participant1']
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertIn("lottery", response.json()["error"])
+
+        # Nothing is drawn before the deadline.
+        call_command('draw_lottery', stdout=StringIO())
+        self.assertIsNone(Seminar.objects.get(id=self.seminar.id).lottery_seed)
+
+        Seminar.objects.filter(id=self.seminar.id).update(application_deadline=timezone.now())
+        stdout = StringIO()
+        call_command('draw_lottery', '--seed', '7', stdout=stdout)
+        self.assertIn("2 seats assigned (seed 7)", stdout.getvalue())
+
+        applicants = list(SeminarApplication.objects.filter(seminar=self.seminar).order_by('id')
+                          .values_list('user_id', flat=True))
+        expected = [applicants[i] for i in lottery_order(3, 7)[:2]]
+        self.assertEqual(
+            sorted(SeminarApplication.objects.filter(seminar=self.seminar, status=SeminarApplication.WON)
+                   .values_list('user_id', flat=True)),
+            sorted(expected)
+        )
+        self.assertEqual(
+            sorted(UserSeminar.objects.filter(seminar=self.seminar, role=UserSeminar.PARTICIPANT)
+                   .values_list('user_id', flat=True)),
+            sorted(expected)
+        )
+        loser = User.objects.get(id=(set(applicants) - set(expected)).pop())
+        response = self.client.get(url, HTTP_AUTHORIZATION='Token ' + Token.objects.get(user=loser).key)
+        self.assertEqual(response.json()["status"], "lost")
+        response = self.client.delete(url, HTTP_AUTHORIZATION='Token ' + Token.objects.get(user=loser).key)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SeminarPreferenceMatchingTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        clear_schedules()
+        self.tokens = {}
+        for username, role in (('participant1', 'participant'), ('participant2', 'participant'),
+                               ('participant3', 'participant'), ('instructor1', 'instructor'),
+                               ('instructor2', 'instructor')):
+            self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": username,
+                    "password": "1234",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": role,
+                }),
+                content_type='application/json'
+            )
+            self.tokens[username] = 'Token ' + Token.objects.get(user__username=username).key
+        self.seminars = []
+        for instructor, capacity in (('instructor1', 1), ('instructor2', 2)):
+            self.client.post(
+                '/api/v1/seminar/',
+                json.dumps({
+                    "name": "Bayesian",
+                    "time": "14:30",
+                    "count": 3,
+                    "capacity": capacity
+                }),
+                content_type='application/json',
+                HTTP_AUTHORIZATION=self.tokens[instructor]
+            )
+            self.seminars.append(Seminar.objects.last().id)
+
+    def submit(self, username, seminars, wanted=1):
+        return self.client.put(
+            '/api/v1/seminar/preferences/',
+            json.dumps({"seminars": seminars, "wanted": wanted}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.tokens[username]
+        )
+
+    def test_match(self):
+        # Student 0 has the best priority: it takes seminar 0, student 1 falls back to seminar 1.
+        choices = np.array([[0, 1], [0, 1], [1, -1]])
+        matched = match(choices, np.array([1, 1, 1]), np.array([1, 1]), np.array([0, 1, 2]))
+        self.assertEqual(matched.tolist(), [[True, False], [False, True], [False, False]])
+
+        # Students wanting two seats keep proposing until they hold two.
+        matched = match(choices, np.array([2, 1, 1]), np.array([1, 2]), np.array([2, 1, 0]))
+        self.assertEqual(matched.tolist(), [[False, True], [True, False], [True, False]])
+
+        # Overlapping choices aren't held together: the next one is taken instead, and the overlapping one only
+        # once the first is rejected.
+        choices = np.array([[0, 1, 2], [1, -1, -1]])
+        overlaps = np.zeros((2, 3, 3), dtype=bool)
+        overlaps[0, 0, 1] = overlaps[0, 1, 0] = True
+        matched = match(choices, np.array([2, 1]), np.array([1, 1, 1]), np.array([0, 1]), overlaps=overlaps)
+        self.assertEqual(matched.tolist(), [[True, False, True], [True, False, False]])
+        matched = match(choices, np.array([2, 1]), np.array([0, 1, 1]), np.array([0, 1]), overlaps=overlaps)
+        self.assertEqual(matched.tolist(), [[False, True, True], [False, False, False]])
+
+    def test_preferences_are_matched(self):
+        first, second = self.seminars
+        self.assertEqual(self.submit('participant1', [first, first]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.submit('participant1', [first], wanted=2).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.submit('participant1', [first, 0]).status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.submit('participant1', [first, second], wanted=2)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([seminar["rank"] for seminar in response.json()["seminars"]], [1, 2])
+        self.submit('participant2', [first, second])
+        self.submit('participant3', [second])
+
+        stdout = StringIO()
+        call_command('match_preferences', '--seed', '3', stdout=stdout)
+        self.assertIn("(seed 3)", stdout.getvalue())
+
+        self.assertEqual(UserSeminar.objects.filter(seminar_id=first, role=UserSeminar.PARTICIPANT).count(), 1)
+        self.assertEqual(UserSeminar.objects.filter(seminar_id=second, role=UserSeminar.PARTICIPANT).count(), 2)
+        for username in ('participant1', 'participant2', 'participant3'):
+            response = self.client.get('/api/v1/seminar/preferences/', HTTP_AUTHORIZATION=self.tokens[username])
+            self.assertIsNotNone(response.json()["matched_at"])
+            matched = {seminar["id"] for seminar in response.json()["seminars"] if seminar["matched"]}
+            self.assertLessEqual(len(matched), response.json()["wanted"])
+            self.assertEqual(matched, set(UserSeminar.objects.filter(user__username=username)
+                                          .values_list('seminar_id', flat=True)))
+
+        # Matched preferences can't be changed.
+        self.assertEqual(self.submit('participant3', [first]).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ScheduleConflictTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        clear_schedules()
+        self.tokens = {}
+        for username, role in (('participant1', 'participant'), ('instructor1', 'instructor'),
+                               ('instructor2', 'instructor'), ('instructor3', 'instructor')):
+            self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": username,
+                    "password": "1234",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": role,
+                }),
+                content_type='application/json'
+            )
+            self.tokens[username] = 'Token ' + Token.objects.get(user__username=username).key
+        self.seminars = []
+        for instructor, time in (('instructor1', "14:30"), ('instructor2', "15:00"), ('instructor3', "15:30")):
+            self.client.post(
+                '/api/v1/seminar/',
+                json.dumps({
+                    "name": "Bayesian",
+                    "time": time,
+                    "count": 3,
+                    "capacity": 10
+                }),
+                content_type='application/json',
+                HTTP_AUTHORIZATION=self.tokens[instructor]
+            )
+            self.seminars.append(Seminar.objects.last().id)
+
+    def enroll(self, seminar_id):
+        return self.client.post(
+            '/api/v1/seminar/{}/user/'.format(seminar_id),
+            json.dumps({"role": "participant"}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.tokens['participant1']
+        )
+
+    def test_overlapping_seminars(self):
+        first, second, third = self.seminars
+        self.assertEqual(self.enroll(first).status_code, status.HTTP_201_CREATED)
+
+        # 15:00 overlaps the 14:30 session.
+        response = self.enroll(second)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["error"], "The seminar conflicts with the schedule of another seminar of yours.")
+        # The schedule is cached: the user's memberships aren't read again.
+        with mock.patch('seminar.schedule.UserSeminar', wraps=UserSeminar) as memberships:
+            self.assertEqual(self.enroll(second).status_code, status.HTTP_400_BAD_REQUEST)
+            memberships.objects.filter.assert_not_called()
+            cache.delete(schedule_cache_key(User.objects.get(username='participant1').id))
+            self.assertEqual(self.enroll(second).status_code, status.HTTP_400_BAD_REQUEST)
+            memberships.objects.filter.assert_called_once()
+        self.assertEqual(self.enroll(third).status_code, status.HTTP_201_CREATED)
+
+        # Dropping frees the slot.
+        response = self.client.delete('/api/v1/seminar/{}/user/'.format(first),
+                                      HTTP_AUTHORIZATION=self.tokens['participant1'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.enroll(third).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.delete('/api/v1/seminar/{}/user/'.format(third),
+                                      HTTP_AUTHORIZATION=self.tokens['participant1'])
+        self.assertEqual(self.enroll(second).status_code, status.HTTP_201_CREATED)
+
+    def test_schedule_checked_under_lock(self):
+        # Enrollments of the user in other seminars wait for this one before checking the schedule.
+        calls = mock.Mock()
+        with mock.patch('seminar.views.lock_participants', wraps=lock_participants) as locked, \
+                mock.patch('seminar.views.check_schedule', wraps=check_schedule) as checked:
+            calls.attach_mock(locked, 'lock_participants')
+            calls.attach_mock(checked, 'check_schedule')
+            self.assertEqual(self.enroll(self.seminars[0]).status_code, status.HTTP_201_CREATED)
+        user = User.objects.get(username='participant1')
+        self.assertEqual([call[0] for call in calls.mock_calls], ['lock_participants', 'check_schedule'])
+        self.assertEqual(calls.mock_calls[0][1], ([user.id],))
+
+
+@override_settings(SEMINAR_RECOMMENDATION_REFRESH=0)
+class SeminarRecommendationTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        clear_schedules()
+        profiles.clear()
+        self.tokens = {}
+        for username, role in (('participant1', 'participant'), ('participant2', 'participant'),
+                               ('participant3', 'participant'), ('participant4', 'participant'),
+                               ('instructor1', 'instructor'), ('instructor2', 'instructor')):
+            self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": username,
+                    "password": "1234",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": role,
+                }),
+                content_type='application/json'
+            )
+            self.tokens[username] = 'Token ' + Token.objects.get(user__username=username).key
+        self.seminars = []
+        for instructor, time in (('instructor1', "10:00"), ('instructor2', "14:00")):
+            self.client.post(
+                '/api/v1/seminar/',
+                json.dumps({
+                    "name": "Bayesian",
+                    "time": time,
+                    "count": 3,
+                    "capacity": 10
+                }),
+                content_type='application/json',
+                HTTP_AUTHORIZATION=self.tokens[instructor]
+            )
+            self.seminars.append(Seminar.objects.last().id)
+        for username, level, major in (('participant1', 5, "Computer Science"), ('participant2', 1, "Biology"),
+                                       ('participant3', 4, "computer science"), ('participant4', 5, "Computer Science")):
+            self.client.post(
+                '/api/v1/survey/',
+                json.dumps({
+                    "python": level,
+                    "rdb": level,
+                    "programming": level,
+                    "major": major,
+                    "os": "macOS"
+                }),
+                content_type='application/json',
+                HTTP_AUTHORIZATION=self.tokens[username]
+            )
+
+    def enroll(self, username, seminar_id):
+        return self.client.post(
+            '/api/v1/seminar/{}/user/'.format(seminar_id),
+            json.dumps({"role": "participant"}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.tokens[username]
+        )
+
+    def recommend(self, username):
+        return self.client.get('/api/v1/seminar/recommendations/', HTTP_AUTHORIZATION=self.tokens[username])
+
+    def test_recommendations(self):
+        first, second = self.seminars
+        self.enroll('participant1', first)
+        self.enroll('participant2', second)
+
+        response = self.recommend('participant3')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([seminar["id"] for seminar in response.json()], [first, second])
+        self.assertGreater(response.json()[0]["score"], response.json()[1]["score"])
+        self.assertEqual(self.recommend('instructor1').status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get('/api/v1/seminar/recommendations/?limit=0',
+                                   HTTP_AUTHORIZATION=self.tokens['participant3'])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Only the changed seminars are rebuilt: participant4 joins the second one, participant1 leaves the first.
+        self.enroll('participant4', second)
+        self.client.delete('/api/v1/seminar/{}/user/'.format(first), HTTP_AUTHORIZATION=self.tokens['participant1'])
+        self.assertEqual([seminar["id"] for seminar in self.recommend('participant3').json()], [second])
+
+        # Seminars of the user are left out, and nothing is read from the surveys until the next refresh.
+        self.enroll('participant3', second)
+        with override_settings(SEMINAR_RECOMMENDATION_REFRESH=60), CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.recommend('participant3').json(), [])
+        self.assertFalse([query for query in queries.captured_queries if 'survey_surveyresult' in query['sql']])
+
+    def test_recommendations_during_refresh(self):
+        first, second = self.seminars
+        self.enroll('participant1', first)
+        self.assertEqual([seminar["id"] for seminar in self.recommend('participant3').json()], [first])
+
+        # While another thread refreshes them, requests are answered from the current profiles without waiting.
+        self.enroll('participant2', second)
+        with profiles._lock, CaptureQueriesContext(connection) as queries:
+            self.assertEqual([seminar["id"] for seminar in self.recommend('participant3').json()], [first])
+        self.assertFalse([query for query in queries.captured_queries if 'survey_surveyresult' in query['sql']])
+        self.assertEqual([seminar["id"] for seminar in self.recommend('participant3').json()], [first, second])
+
+
+class BootstrapTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        clear_schedules()
+        self.tokens = {}
+        for username, role in (('participant1', 'participant'), ('instructor1', 'instructor'),
+                               ('instructor2', 'instructor'), ('instructor3', 'instructor')):
+            self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": username,
+                    "password": "1234",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": role,
+                }),
+                content_type='application/json'
+            )
+            self.tokens[username] = 'Token ' + Token.objects.get(user__username=username).key
+        self.seminars = []
+        self.open_seminar('instructor1')
+
+    def open_seminar(self, instructor):
+        self.client.post(
+            '/api/v1/seminar/',
+            json.dumps({
+                "name": "Bayesian",
+                "time": "14:30",
+                "count": 3,
+                "capacity": 10
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.tokens[instructor]
+        )
+        self.seminars.append(Seminar.objects.last().id)
+
+    def bootstrap(self):
+        return self.client.get('/api/v1/bootstrap/', HTTP_AUTHORIZATION=self.tokens['participant1'])
+
+    def cold_queries(self):
+        cache.delete(bootstrap_cache_key(User.objects.get(username='participant1').id))
+        caches['tiered'].delete(SEMINAR_PAGE_CACHE_KEY)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.bootstrap().status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_bootstrap(self):
+        seminar_id = self.seminars[0]
+        self.client.post(
+            '/api/v1/seminar/{}/user/'.format(seminar_id),
+            json.dumps({"role": "participant"}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.tokens['participant1']
+        )
+
+        data = self.bootstrap().json()
+        self.assertEqual(data["user"]["username"], "participant1")
+        self.assertEqual([seminar["id"] for seminar in data["user"]["participant"]["seminars"]], [seminar_id])
+        self.assertEqual([(membership["id"], membership["role"], membership["is_active"])
+                          for membership in data["memberships"]], [(seminar_id, "participant", True)])
+        self.assertEqual(data["seminars"][0]["id"], seminar_id)
+        self.assertEqual(data["seminars"][0]["participant_count"], 1)
+        self.assertEqual(data["seminars"][0]["instructors"][0]["username"], "instructor1")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.bootstrap().json(), data)
+
+        # The user's memberships are rebuilt after a drop.
+        self.client.delete('/api/v1/seminar/{}/user/'.format(seminar_id),
+                           HTTP_AUTHORIZATION=self.tokens['participant1'])
+        self.assertFalse(self.bootstrap().json()["memberships"][0]["is_active"])
+
+        # The number of queries doesn't grow with the seminars.
+        queries = self.cold_queries()
+        self.open_seminar('instructor2')
+        self.open_seminar('instructor3')
+        self.assertEqual(self.cold_queries(), queries)
+        self.assertEqual(len(self.bootstrap().json()["seminars"]), 3)
+
+
+class GetSeminarMultiTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        clear_schedules()
+        self.tokens = {}
+        for username, role in (('participant1', 'participant'), ('instructor1', 'instructor'),
+                               ('instructor2', 'instructor')):
+            self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": username,
+                    "password": "1234",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": role,
+                }),
+                content_type='application/json'
+            )
+            self.tokens[username] = 'Token ' + Token.objects.get(user__username=username).key
+        self.seminars = []
+        for instructor, time in (('instructor1', "10:00"), ('instructor2', "14:00")):
+            self.client.post(
+                '/api/v1/seminar/',
+                json.dumps({
+                    "name": "Bayesian",
+                    "time": time,
+                    "count": 3,
+                    "capacity": 10
+                }),
+                content_type='application/json',
+                HTTP_AUTHORIZATION=self.tokens[instructor]
+            )
+            self.seminars.append(Seminar.objects.last().id)
+            self.client.post(
+                '/api/v1/seminar/{}/user/'.format(self.seminars[-1]),
+                json.dumps({"role": "participant"}),
+                content_type='application/json',
+                HTTP_AUTHORIZATION=self.tokens['participant1']
+            )
+
+    def get_seminars(self, *ids):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/seminar/?ids={}'.format(','.join(map(str, ids))),
+                                       HTTP_AUTHORIZATION=self.tokens['participant1'])
+        return response, len(queries)
+
+    def test_get_seminars(self):
+        first, second = self.seminars
+        response, queries = self.get_seminars(first, 0, first)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.json()), [str(first), '0'])
+        self.assertIsNone(response.json()['0'])
+
+        # Same answer as GET /api/v1/seminar/{seminar_id}/, with as many queries for two seminars as for one.
+        single = self.client.get('/api/v1/seminar/{}/'.format(first), HTTP_AUTHORIZATION=self.tokens['participant1'])
+        self.assertEqual(response.json()[str(first)], single.json())
+        response, more_queries = self.get_seminars(first, second)
+        self.assertEqual(more_queries, queries)
+        self.assertEqual(response.json()[str(second)]["instructors"][0]["username"], "instructor2")
+
+        response = self.client.get('/api/v1/seminar/?ids=x', HTTP_AUTHORIZATION=self.tokens['participant1'])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SeminarSyncTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        clear_schedules()
+        self.tokens = {}
+        for username, role in (('participant1', 'participant'), ('instructor1', 'instructor'),
+                               ('instructor2', 'instructor')):
+            self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": username,
+                    "password": "1234",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": role,
+                }),
+                content_type='application/json'
+            )
+            self.tokens[username] = 'Token ' + Token.objects.get(user__username=username).key
+        self.seminars = []
+        for instructor in ('instructor1', 'instructor2'):
+            self.client.post(
+                '/api/v1/seminar/',
+                json.dumps({
+                    "name": "Bayesian",
+                    "time": "14:30",
+                    "count": 3,
+                    "capacity": 10
+                }),
+                content_type='application/json',
+                HTTP_AUTHORIZATION=self.tokens[instructor]
+            )
+            self.seminars.append(Seminar.objects.last().id)
+
+    def sync(self, since, versioned=True):
+        if versioned:
+            # What the commit hooks of the changes do.
+            version_changes()
+        return self.client.get('/api/v1/seminar/?since={}'.format(since),
+                               HTTP_AUTHORIZATION=self.tokens['participant1'])
+
+    def test_sync(self):
+        first, second = self.seminars
+        data = self.sync(0).json()
+        self.assertEqual([seminar["id"] for seminar in data["seminars"]], [first, second])
+        self.assertEqual(data["deleted"], [])
+
+        # Nothing changed.
+        self.assertEqual(self.sync(data["sync_token"]).json()["seminars"], [])
+
+        self.client.post(
+            '/api/v1/seminar/{}/user/'.format(first),
+            json.dumps({"role": "participant"}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.tokens['participant1']
+        )
+        data = self.sync(data["sync_token"]).json()
+        self.assertEqual([(seminar["id"], seminar["participant_count"]) for seminar in data["seminars"]], [(first, 1)])
+
+        Seminar.objects.get(id=second).delete()
+        data = self.sync(data["sync_token"]).json()
+        self.assertEqual(data["seminars"], [])
+        self.assertEqual(data["deleted"], [second])
+
+        # A change is sent once its transaction has committed and versioned it, not before.
+        log_changes([first])
+        with CaptureQueriesContext(connection) as queries:
+            pending = self.sync(data["sync_token"], versioned=False).json()
+        self.assertEqual(pending["seminars"], [])
+        self.assertEqual(pending["sync_token"], data["sync_token"])
+        # Reads take no lock.
+        self.assertFalse([query for query in queries.captured_queries if 'FOR UPDATE' in query['sql']])
+        data = self.sync(data["sync_token"]).json()
+        self.assertEqual([seminar["id"] for seminar in data["seminars"]], [first])
+        self.assertEqual(self.sync(data["sync_token"]).json()["seminars"], [])
+
+        self.assertEqual(self.sync('x').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_version_seminar_changes(self):
+        first, second = self.seminars
+        data = self.sync(0).json()
+        log_changes([first])
+        log_changes([first, second])
+        Seminar.objects.get(id=second).delete()
+        self.assertEqual(SeminarChange.objects.filter(version__isnull=True).count(), 4)
+
+        call_command('version_seminar_changes', '--once', stdout=StringIO())
+        # Only the latest change of each seminar is left, versioned.
+        self.assertEqual(sorted(SeminarChange.objects.values_list('seminar_id', 'deleted')),
+                         [(first, False), (second, True)])
+        self.assertFalse(SeminarChange.objects.filter(version__isnull=True).exists())
+        data = self.sync(data["sync_token"]).json()
+        self.assertEqual([seminar["id"] for seminar in data["seminars"]], [first])
+        self.assertEqual(data["deleted"], [second])
+
+
+class SeminarParticipantsTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        clear_schedules()
+        self.tokens = {}
+        for username, role in (('participant1', 'participant'), ('participant2', 'participant'),
+                               ('participant3', 'participant'), ('instructor1', 'instructor')):
+            self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": username,
+                    "password": "1234",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": role,
+                }),
+                content_type='application/json'
+            )
+            self.tokens[username] = 'Token ' + Token.objects.get(user__username=username).key
+        self.client.post(
+            '/api/v1/seminar/',
+            json.dumps({
+                "name": "Bayesian",
+                "time": "14:30",
+                "count": 3,
+                "capacity": 10
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.tokens['instructor1']
+        )
+        self.seminar_id = Seminar.objects.last().id
+
+    def enroll(self, username, query=''):
+        return self.client.post(
+            '/api/v1/seminar/{}/user/{}'.format(self.seminar_id, query),
+            json.dumps({"role": "participant"}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.tokens[username]
+        )
+
+    def participants(self, url):
+        return self.client.get(url, HTTP_AUTHORIZATION=self.tokens['instructor1'])
+
+    def test_participants(self):
+        # Enrollment responses can carry the count only.
+        response = self.enroll('participant1', '?participants=count')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["participant_count"], 1)
+        self.assertNotIn("participants", response.json())
+        self.assertEqual(len(self.enroll('participant2').json()["participants"]), 2)
+        self.enroll('participant3')
+        self.client.delete('/api/v1/seminar/{}/user/'.format(self.seminar_id),
+                           HTTP_AUTHORIZATION=self.tokens['participant2'])
+
+        url = '/api/v1/seminar/{}/participants/'.format(self.seminar_id)
+        page = self.participants(url + '?page_size=2').json()
+        self.assertEqual([participant["username"] for participant in page["results"]], ['participant1', 'participant2'])
+        page = self.participants(page["next"]).json()
+        self.assertEqual([participant["username"] for participant in page["results"]], ['participant3'])
+        self.assertIsNone(page["next"])
+
+        page = self.participants(url + '?is_active=false').json()
+        self.assertEqual([participant["username"] for participant in page["results"]], ['participant2'])
+        self.assertFalse(page["results"][0]["is_active"])
+        self.assertEqual(len(self.participants(url + '?is_active=true').json()["results"]), 2)
+        self.assertEqual(self.participants(url + '?is_active=maybe').status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.participants('/api/v1/seminar/{}/?participants=count'.format(self.seminar_id))
+        self.assertEqual(response.json()["participant_count"], 2)
+
+
+class SeminarRosterTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        clear_schedules()
+        self.tokens = {}
+        for username, role in (('participant1', 'participant'), ('participant2', 'participant'),
+                               ('instructor1', 'instructor')):
+            self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": username,
+                    "password": "1234",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": role,
+                    "university": "SNU"
+                }),
+                content_type='application/json'
+            )
+            self.tokens[username] = 'Token ' + Token.objects.get(user__username=username).key
+        self.client.post(
+            '/api/v1/seminar/',
+            json.dumps({
+                "name": "Bayesian",
+                "time": "14:30",
+                "count": 3,
+                "capacity": 10
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.tokens['instructor1']
+        )
+        self.seminar_id = Seminar.objects.last().id
+        for username in ('participant1', 'participant2'):
+            self.client.post(
+                '/api/v1/seminar/{}/user/'.format(self.seminar_id),
+                json.dumps({"role": "participant"}),
+                content_type='application/json',
+                HTTP_AUTHORIZATION=self.tokens[username]
+            )
+
+    @mock.patch('seminar.roster.ROSTER_CHUNK_SIZE', 1)
+    def test_roster(self):
+        url = '/api/v1/seminar/{}/roster/'.format(self.seminar_id)
+        response = self.client.get(url, HTTP_AUTHORIZATION=self.tokens['instructor1'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(lines[0], 'user_id,username,email,first_name,last_name,university,role,joined_at,'
+                                   'is_active,dropped_at')
+        rows = [line.split(',') for line in lines[1:]]
+        self.assertEqual([(row[1], row[5], row[6]) for row in rows], [
+            ('instructor1', '', 'instructor'), ('participant1', 'SNU', 'participant'),
+            ('participant2', 'SNU', 'participant'),
+        ])
+
+        response = self.client.get(url, HTTP_AUTHORIZATION=self.tokens['participant1'])
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -1,6 +1,6 @@
 from django.urls import include, path
 from rest_framework.routers import SimpleRouter
-from seminar.views import SeminarViewSet
+from seminar.views import BootstrapView, SeminarViewSet
 
 app_name = 'seminar'
 
@@ -9,4 +9,5 @@ router.register('seminar', SeminarViewSet, basename='seminar')
 
 urlpatterns = [
     path('', include((router.urls))),
+    path('bootstrap/', BootstrapView.as_view(), name='bootstrap'),
 ]
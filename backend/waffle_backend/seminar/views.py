@@ -1,22 +1,55 @@
-from django.core.cache import cache
+from django.conf import settings
+from django.core.cache import caches
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from seminar.models import Seminar, UserSeminar
-from seminar.serializers import SeminarSerializer, SimpleSeminarSerializer
+from common.cache import get_or_recompute
+from common.idempotency import idempotent
+from common.throttling import TokenBucketThrottleMixin
+from seminar.bootstrap import bootstrap
+from seminar.enrollment import (
+    EnrollmentError, apply_to_lottery, bulk_enroll, check_lottery, check_schedule, enqueue_enrollment,
+    enrollment_request_position, join_waitlist, lock_participants, promote_waitlist, waitlist_position,
+)
+from seminar.events import (
+    SEMINAR_LIST_CACHE_KEY, SEMINAR_LIST_EARLIEST, SEMINAR_LIST_LATEST, SEMINAR_LIST_TIMEOUTS, memberships_changed,
+    seminars_changed,
+)
+from seminar.matching import MAX_PREFERENCES
+from seminar.models import (
+    EnrollmentRequest, Preference, PreferenceList, Seminar, SeminarApplication, UserSeminar, Waitlist,
+)
+from seminar.pagination import ParticipantCursorPagination
+from seminar.recommendation import RECOMMENDATIONS_MAX_LIMIT, recommend
+from seminar.roster import stream_roster_csv
+from seminar.seats import SEATS_MAX_IDS, get_seats
+from seminar.serializers import (
+    ParticipantsSerializer, PrefetchedSeminarDetailSerializer, PrefetchedSeminarSerializer, SeminarSerializer,
+    SimpleSeminarSerializer, prefetched_seminars, with_list_fields,
+)
+from seminar.sync import changes_since
+from seminar.waiting_room import admit, issue_ticket, ticket_status
 from user.models import InstructorProfile, ParticipantProfile
 
 
-class SeminarViewSet(viewsets.GenericViewSet):
+class SeminarViewSet(TokenBucketThrottleMixin, viewsets.GenericViewSet):
     queryset = Seminar.objects.all()
     serializer_class = SeminarSerializer
     permission_classes = (IsAuthenticated,)
+    throttle_scopes = {
+        'enroll_drop': 'enroll', 'enroll_bulk': 'enroll', 'application': 'enroll',
+        # Polling the waiting room mustn't spend the tokens of the enrollment it waits for.
+        'queue': {'POST': 'enroll', 'GET': 'queue_status'},
+    }
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -24,6 +57,7 @@ class SeminarViewSet(viewsets.GenericViewSet):
         return self.serializer_class
 
     # POST /api/v1/seminar/
+    @idempotent
     def create(self, request):
         user = request.user
         try:
@@ -35,7 +69,8 @@ class SeminarViewSet(viewsets.GenericViewSet):
             if not instructor.charge:
                 serializer = self.get_serializer(data=request.data)
                 serializer.is_valid(raise_exception=True)
-                serializer.save()
+                seminar = serializer.save()
+                seminars_changed(seminar.id)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             else:
                 return Response({"error": "You're in charge of another seminar."}, status=status.HTTP_403_FORBIDDEN)
@@ -44,29 +79,63 @@ class SeminarViewSet(viewsets.GenericViewSet):
 
     # GET /api/v1/seminar/?name={name}&order=earliest
     def list(self, request):
+        if 'ids' in self.request.query_params:
+            return self.multi_get(request)
+        if 'since' in self.request.query_params:
+            return self.sync(request)
         seminar_order = self.request.query_params.get('order')
         seminar_name = self.request.query_params.get('name')
-        queryset = self.get_queryset().order_by('-created_at')
-        if not queryset:
-            Response(status=status.HTTP_404_NOT_FOUND)
-
-        cache_key = 'seminars'
         if seminar_order != 'earliest':
-            seminars = cache.get(cache_key)
-            if seminars is None:
-                cache.set(cache_key, queryset, timeout=10)
-                seminars = cache.get(cache_key)
-            if seminar_name is not None:
-                seminars = seminars.filter(name__icontains=seminar_name)
+            ordering, version = '-created_at', SEMINAR_LIST_LATEST
         else:
-            seminars = cache.get(cache_key, version=2)
-            if seminars is None:
-                queryset = self.get_queryset().order_by('created_at')
-                cache.set(cache_key, queryset, timeout=600, version=2)
-                seminars = cache.get(cache_key, version=2)
-            if seminar_name is not None:
-                seminars = seminars.filter(name__icontains=seminar_name)
-        return Response(self.get_serializer(seminars, many=True).data)
+            ordering, version = 'created_at', SEMINAR_LIST_EARLIEST
+        queryset = self.get_queryset().order_by(ordering)
+
+        if seminar_name:
+            return Response(self.get_serializer(queryset.filter(name__icontains=seminar_name), many=True).data)
+
+        # One worker rebuilds an expired payload while the others keep serving the previous one.
+        seminars = get_or_recompute(
+            caches['tiered'], SEMINAR_LIST_CACHE_KEY,
+            lambda: self.get_serializer(queryset, many=True).data,
+            timeout=SEMINAR_LIST_TIMEOUTS[version], version=version,
+        )
+        return Response(seminars)
+
+    # GET /api/v1/seminar/?ids=1,2,3
+    def multi_get(self, request):
+        ids = request.query_params['ids'].split(',')
+        if not all(seminar_id.strip().isdigit() for seminar_id in ids) or len(ids) > settings.MULTI_GET_MAX_IDS:
+            return Response({'error': "'ids' must be at most {} comma-separated seminar ids.".format(
+                settings.MULTI_GET_MAX_IDS)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Two queries whatever the number of seminars; unknown ids map to null.
+        seminar_ids = list(dict.fromkeys(int(seminar_id) for seminar_id in ids))
+        seminars = {seminar.id: seminar for seminar in prefetched_seminars(seminar_ids)}
+        for seminar in seminars.values():
+            seminar.time = seminar.time.isoformat(timespec='minutes')
+        context = self.get_serializer_context()
+        return Response({
+            str(seminar_id): PrefetchedSeminarDetailSerializer(seminars[seminar_id], context=context).data
+            if seminar_id in seminars else None
+            for seminar_id in seminar_ids
+        })
+
+    # GET /api/v1/seminar/?since={sync_token}
+    def sync(self, request):
+        # since=0 returns every seminar; the response's sync_token is the one to send next time.
+        since = request.query_params['since']
+        if not since.isdigit():
+            return Response({'error': "'since' must be a sync token."}, status=status.HTTP_400_BAD_REQUEST)
+
+        changed, deleted, sync_token = changes_since(int(since))
+        seminars = list(with_list_fields(Seminar.objects.filter(id__in=changed).order_by('id')))
+        found = {seminar.id for seminar in seminars}
+        return Response({
+            'sync_token': str(sync_token),
+            'seminars': PrefetchedSeminarSerializer(seminars, many=True, context=self.get_serializer_context()).data,
+            'deleted': sorted(deleted + [seminar_id for seminar_id in changed if seminar_id not in found]),
+        })
 
     # GET /api/v1/seminar/{seminar_id}/
     def retrieve(self, request, pk=None):
@@ -97,9 +166,25 @@ class SeminarViewSet(viewsets.GenericViewSet):
                             status=status.HTTP_400_BAD_REQUEST)
         seminar.time = request.data.get('time', seminar.time)
         seminar.online = request.data.get('online', seminar.online)
+        for field in ('open_at', 'application_deadline'):
+            if field in request.data:
+                value = request.data.get(field) or None
+                moment = value and parse_datetime(value)
+                if value and moment is None:
+                    return Response({"error": "{} must be an ISO 8601 datetime".format(field)},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                if moment and timezone.is_naive(moment):
+                    moment = timezone.make_aware(moment)
+                setattr(seminar, field, moment)
         seminar.save()
+        promote_waitlist(seminar)
+        seminars_changed(seminar.id)
+        # The members' schedules and cached memberships carry the seminar's time and name.
+        memberships_changed(*seminar.users.values_list('user_id', flat=True),
+                            *seminar.archived_users.values_list('user_id', flat=True))
         return Response(self.get_serializer(seminar).data)
 
+    @idempotent
     @transaction.atomic
     @action(methods=['POST', 'DELETE'], detail=True, url_path='user', url_name='user')
     def enroll_drop(self, request, pk=None):
@@ -125,12 +210,42 @@ class SeminarViewSet(viewsets.GenericViewSet):
                     UserSeminar.objects.get_or_create(user=user, seminar=seminar, role="instructor")
                     user.instructor.charge_id = seminar.id
                     user.instructor.save()
+                    seminars_changed(seminar.id)
+                    memberships_changed(user.id)
+
+                if role == UserSeminar.PARTICIPANT:
+                    ticket = request.META.get('HTTP_X_QUEUE_TICKET') or data.get('ticket')
+                    try:
+                        check_lottery(seminar)
+                        admit(ticket, user, seminar)
+                    except EnrollmentError as e:
+                        response = Response({'error': e.message}, status=e.status_code)
+                        if e.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+                            response['Retry-After'] = ticket_status(ticket, user, seminar.id)['wait_seconds']
+                        return response
+
+                if role == UserSeminar.PARTICIPANT and settings.SEMINAR_ASYNC_ENROLLMENT:
+                    try:
+                        enrollment_request = enqueue_enrollment(user, seminar)
+                    except EnrollmentError as e:
+                        return Response({'error': e.message}, status=e.status_code)
+                    return Response(self._enrollment_request_data(enrollment_request), status=status.HTTP_202_ACCEPTED)
 
                 if role == UserSeminar.PARTICIPANT:
+                    # Locked before the user's profile, in the order of the other enrolling paths, so that they
+                    # can't deadlock.
+                    seminar = Seminar.objects.select_for_update().get(pk=seminar.pk)
                     if seminar.capacity <= UserSeminar.objects.filter(seminar=seminar, role="participant",
                                                                       is_active=True).count():
-                        return Response({'error': "The seminar is beyond capacity."},
-                                        status=status.HTTP_400_BAD_REQUEST)
+                        if str(data.get('waitlist')).lower() != 'true':
+                            return Response({'error': "The seminar is beyond capacity."},
+                                            status=status.HTTP_400_BAD_REQUEST)
+                        try:
+                            entry = join_waitlist(user, seminar)
+                        except EnrollmentError as e:
+                            return Response({'error': e.message}, status=e.status_code)
+                        return Response({'seminar': seminar.id, 'position': waitlist_position(entry)},
+                                        status=status.HTTP_202_ACCEPTED)
                     try:
                         if user.participant:
                             try:
@@ -143,11 +258,20 @@ class SeminarViewSet(viewsets.GenericViewSet):
                         return Response({'error': "The instructor should get 'participant' role first."},
                                         status=status.HTTP_403_FORBIDDEN)
 
-                    if not user.seminars.filter(role=UserSeminar.PARTICIPANT, seminar=seminar).exists():
+                    user_seminar = user.seminars.filter(seminar=seminar).first() or \
+                        user.archived_seminars.filter(seminar=seminar).first()
+                    if user_seminar is None:
+                        lock_participants([user.id])
+                        try:
+                            check_schedule(user, seminar)
+                        except EnrollmentError as e:
+                            return Response({'error': e.message}, status=e.status_code)
                         UserSeminar.objects.create(user=user, seminar=seminar, role="participant")
+                        seminars_changed(seminar.id)
+                        memberships_changed(user.id)
                         participant = ParticipantProfile.objects.get(user=user)
                     else:
-                        if not user.seminars.get(seminar=seminar).is_active:
+                        if not user_seminar.is_active:
                             return Response({'error': "The user who've dropped cannot enroll in the same seminar"},
                                             status=status.HTTP_400_BAD_REQUEST)
 
@@ -175,6 +299,9 @@ class SeminarViewSet(viewsets.GenericViewSet):
                     participant_seminar = user.seminars.filter(seminar=seminar, role=UserSeminar.PARTICIPANT).last()
 
                     if participant_seminar is None:
+                        if user.archived_seminars.filter(seminar=seminar).exists():
+                            return Response({'error': "You've already dropped this seminar."},
+                                            status=status.HTTP_400_BAD_REQUEST)
                         try:
                             if user.instructor.charge_id != seminar.id:
                                 return Response({'error': "You've never enrolled this seminar."},
@@ -190,6 +317,9 @@ class SeminarViewSet(viewsets.GenericViewSet):
                         participant_seminar.is_active = False
                         participant_seminar.dropped_at = timezone.now()
                         participant_seminar.save()
+                        promote_waitlist(seminar)
+                        seminars_changed(seminar.id)
+                        memberships_changed(user.id)
                     else:
                         return Response({'error': "You've already dropped this seminar."},
                                         status=status.HTTP_400_BAD_REQUEST)
@@ -201,3 +331,235 @@ class SeminarViewSet(viewsets.GenericViewSet):
             seminar = self.get_object()
             serializer = self.get_serializer(seminar)
             return Response(serializer.data)
+
+    # GET /api/v1/seminar/{seminar_id}/participants/?is_active=true&page_size=50&cursor={cursor}
+    @action(methods=['GET'], detail=True)
+    def participants(self, request, pk=None):
+        seminar = self.get_object()
+        participants = UserSeminar.objects.filter(seminar=seminar, role=UserSeminar.PARTICIPANT).select_related('user')
+        is_active = request.query_params.get('is_active')
+        if is_active is not None:
+            if is_active.lower() not in ('true', 'false'):
+                return Response({'error': "'is_active' must be 'true' or 'false'."}, status=status.HTTP_400_BAD_REQUEST)
+            participants = participants.filter(is_active=is_active.lower() == 'true')
+
+        paginator = ParticipantCursorPagination()
+        page = paginator.paginate_queryset(participants, request, view=self)
+        return paginator.get_paginated_response(ParticipantsSerializer(page, many=True).data)
+
+    # POST, GET /api/v1/seminar/{seminar_id}/queue/
+    @action(methods=['POST', 'GET'], detail=True)
+    def queue(self, request, pk=None):
+        # GET only decodes the ticket, so polling it costs no database query.
+        if request.method == 'GET':
+            ticket = request.META.get('HTTP_X_QUEUE_TICKET') or request.query_params.get('ticket')
+            if not pk.isdigit():
+                return Response({'error': "Not found."}, status=status.HTTP_404_NOT_FOUND)
+            if not ticket:
+                return Response({'error': "Send the ticket to check."}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                return Response(ticket_status(ticket, request.user, int(pk)))
+            except EnrollmentError as e:
+                return Response({'error': e.message}, status=e.status_code)
+
+        seminar = self.get_object()
+        if seminar.open_at is None:
+            return Response({'error': "This seminar has no scheduled registration."}, status=status.HTTP_400_BAD_REQUEST)
+        ticket = issue_ticket(request.user, seminar)
+        return Response(dict(ticket_status(ticket, request.user, seminar.id), ticket=ticket, open_at=seminar.open_at),
+                        status=status.HTTP_201_CREATED)
+
+    # POST, GET, DELETE /api/v1/seminar/{seminar_id}/application/
+    @action(methods=['POST', 'GET', 'DELETE'], detail=True)
+    def application(self, request, pk=None):
+        seminar = self.get_object()
+        if request.method == 'POST':
+            try:
+                application = apply_to_lottery(request.user, seminar)
+            except EnrollmentError as e:
+                return Response({'error': e.message}, status=e.status_code)
+            return Response({'seminar': seminar.id, 'status': application.status,
+                             'application_deadline': seminar.application_deadline}, status=status.HTTP_201_CREATED)
+
+        application = SeminarApplication.objects.filter(seminar=seminar, user=request.user).first()
+        if application is None:
+            return Response({'error': "You haven't applied to this seminar."}, status=status.HTTP_404_NOT_FOUND)
+        if request.method == 'DELETE':
+            if application.status != SeminarApplication.APPLIED or seminar.lottery_seed is not None:
+                return Response({'error': "The lottery of this seminar has already been drawn."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            application.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response({'seminar': seminar.id, 'status': application.status,
+                         'application_deadline': seminar.application_deadline})
+
+    # PUT, GET, DELETE /api/v1/seminar/preferences/
+    @action(methods=['PUT', 'GET', 'DELETE'], detail=False)
+    def preferences(self, request):
+        preference_list = PreferenceList.objects.filter(user=request.user).first()
+        if request.method == 'GET':
+            if preference_list is None:
+                return Response({'error': "You haven't submitted preferences."}, status=status.HTTP_404_NOT_FOUND)
+            return Response(self._preference_list_data(preference_list))
+
+        if preference_list is not None and preference_list.matched_at is not None:
+            return Response({'error': "Your preferences have already been matched."}, status=status.HTTP_400_BAD_REQUEST)
+        if request.method == 'DELETE':
+            if preference_list is None:
+                return Response({'error': "You haven't submitted preferences."}, status=status.HTTP_404_NOT_FOUND)
+            preference_list.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        if not hasattr(request.user, 'participant'):
+            return Response({'error': "The instructor should get 'participant' role first."},
+                            status=status.HTTP_403_FORBIDDEN)
+        seminar_ids = request.data.get('seminars')
+        if not isinstance(seminar_ids, list) or not 0 < len(seminar_ids) <= MAX_PREFERENCES or \
+                not all(isinstance(seminar_id, int) for seminar_id in seminar_ids) or \
+                len(set(seminar_ids)) != len(seminar_ids):
+            return Response({'error': "'seminars' must list 1 to {} distinct seminar ids.".format(MAX_PREFERENCES)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if Seminar.objects.filter(id__in=seminar_ids).count() != len(seminar_ids):
+            return Response({'error': "Some of the seminars don't exist."}, status=status.HTTP_404_NOT_FOUND)
+        wanted = request.data.get('wanted', 1)
+        if not isinstance(wanted, int) or not 0 < wanted <= len(seminar_ids):
+            return Response({'error': "'wanted' must be between 1 and the number of seminars."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            preference_list, created = PreferenceList.objects.update_or_create(
+                user=request.user, defaults={'wanted': wanted}
+            )
+            preference_list.preferences.all().delete()
+            Preference.objects.bulk_create([
+                Preference(preference_list=preference_list, seminar_id=seminar_id, rank=rank)
+                for rank, seminar_id in enumerate(seminar_ids, 1)
+            ])
+        return Response(self._preference_list_data(preference_list))
+
+    @staticmethod
+    def _preference_list_data(preference_list):
+        return {
+            'wanted': preference_list.wanted,
+            'matched_at': preference_list.matched_at,
+            'seminars': [
+                {'id': preference.seminar_id, 'rank': preference.rank, 'matched': preference.matched}
+                for preference in preference_list.preferences.all()
+            ],
+        }
+
+    # GET /api/v1/seminar/{seminar_id}/user/requests/{ticket}/
+    @action(methods=['GET'], detail=True, url_path=r'user/requests/(?P<ticket>\d+)', url_name='user-request')
+    def enrollment_request(self, request, pk=None, ticket=None):
+        enrollment_request = EnrollmentRequest.objects.filter(id=ticket, seminar_id=pk, user=request.user).first()
+        if enrollment_request is None:
+            return Response({'error': "There is no such enrollment request."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self._enrollment_request_data(enrollment_request))
+
+    @staticmethod
+    def _enrollment_request_data(enrollment_request):
+        return {
+            'ticket': enrollment_request.id,
+            'seminar': enrollment_request.seminar_id,
+            'status': enrollment_request.status,
+            'error': enrollment_request.error or None,
+            'position': enrollment_request_position(enrollment_request),
+        }
+
+    # POST /api/v1/seminar/{seminar_id}/user/bulk/
+    @action(methods=['POST'], detail=True, url_path='user/bulk', url_name='user-bulk')
+    def enroll_bulk(self, request, pk=None):
+        seminar = self.get_object()
+        if not (request.user.is_staff or InstructorProfile.objects.filter(user=request.user, charge=seminar).exists()):
+            return Response({'error': "Only instructor of seminar can enroll participants in bulk."},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        usernames = request.data.get('usernames')
+        if not isinstance(usernames, list) or not all(isinstance(username, str) for username in usernames):
+            return Response({'error': "'usernames' must be a list of usernames."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results = bulk_enroll(seminar, usernames)
+        return Response({
+            'seminar': seminar.id,
+            'enrolled': sum(1 for result in results if result['status'] == 'enrolled'),
+            'results': results,
+        })
+
+    # GET /api/v1/seminar/{seminar_id}/roster/
+    @action(methods=['GET'], detail=True)
+    def roster(self, request, pk=None):
+        seminar = self.get_object()
+        if not (request.user.is_staff or InstructorProfile.objects.filter(user=request.user, charge=seminar).exists()):
+            return Response({'error': "Only instructor of seminar can export its roster."},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        response = StreamingHttpResponse(stream_roster_csv(seminar.id), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="seminar-{}-roster.csv"'.format(seminar.id)
+        return response
+
+    # GET /api/v1/seminar/{seminar_id}/seats/
+    @action(methods=['GET'], detail=True)
+    def seats(self, request, pk=None):
+        # Served from the seat counters without loading the seminar or its participants.
+        found = get_seats([int(pk)]) if pk.isdigit() else []
+        if not found:
+            return Response({'error': "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(found[0])
+
+    # GET /api/v1/seminar/seats/?ids=1,2,3
+    @action(methods=['GET'], detail=False, url_path='seats', url_name='seats-list')
+    def seats_list(self, request):
+        ids = request.query_params.get('ids', '').split(',')
+        if not all(seminar_id.strip().isdigit() for seminar_id in ids) or len(ids) > SEATS_MAX_IDS:
+            return Response({'error': "'ids' must be at most {} comma-separated seminar ids.".format(SEATS_MAX_IDS)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(get_seats(list(dict.fromkeys(int(seminar_id) for seminar_id in ids))))
+
+    # GET /api/v1/seminar/recommendations/?limit=10
+    @action(methods=['GET'], detail=False)
+    def recommendations(self, request):
+        limit = request.query_params.get('limit', '10')
+        if not limit.isdigit() or not 0 < int(limit) <= RECOMMENDATIONS_MAX_LIMIT:
+            return Response({'error': "'limit' must be between 1 and {}.".format(RECOMMENDATIONS_MAX_LIMIT)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        ranked = recommend(request.user, int(limit))
+        if ranked is None:
+            return Response({'error': "You haven't submitted the survey."}, status=status.HTTP_404_NOT_FOUND)
+
+        seminars = Seminar.objects.in_bulk([seminar_id for seminar_id, score in ranked])
+        return Response([
+            {
+                'id': seminar_id,
+                'name': seminars[seminar_id].name,
+                'time': seminars[seminar_id].time.isoformat(timespec='minutes'),
+                'score': round(score, 4),
+            }
+            for seminar_id, score in ranked if seminar_id in seminars
+        ])
+
+    # GET, DELETE /api/v1/seminar/{seminar_id}/waitlist/
+    @action(methods=['GET', 'DELETE'], detail=True)
+    def waitlist(self, request, pk=None):
+        seminar = self.get_object()
+        entry = Waitlist.objects.filter(seminar=seminar, user=request.user).first()
+        if entry is None:
+            return Response({'error': "You're not on the waitlist of this seminar."},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        if request.method == 'DELETE':
+            entry.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response({
+            'seminar': seminar.id,
+            'position': waitlist_position(entry),
+            'waitlist_count': seminar.waitlist.count(),
+        })
+
+
+class BootstrapView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    # GET /api/v1/bootstrap/
+    def get(self, request):
+        return Response(bootstrap(request))
@@ -0,0 +1,87 @@
+import math
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from rest_framework import status
+
+from seminar.enrollment import EnrollmentError
+
+TICKET_SALT = 'seminar.waiting-room'
+
+
+def _sequence_key(seminar_id):
+    return 'waiting-room:{}:sequence'.format(seminar_id)
+
+
+def _position_key(seminar_id, user_id):
+    return 'waiting-room:{}:user:{}'.format(seminar_id, user_id)
+
+
+def is_active(seminar, now=None):
+    # Enrollments go through the waiting room from its opening until SEMINAR_WAITING_ROOM_WINDOW seconds after.
+    if seminar.open_at is None:
+        return False
+    now = time.time() if now is None else now
+    return now < seminar.open_at.timestamp() + settings.SEMINAR_WAITING_ROOM_WINDOW
+
+
+def admitted_at(open_at, position):
+    # Tickets are admitted in order, SEMINAR_ADMISSION_BURST right at the opening and then SEMINAR_ADMISSION_RATE/s.
+    return open_at + max(0, position - settings.SEMINAR_ADMISSION_BURST) / settings.SEMINAR_ADMISSION_RATE
+
+
+def issue_ticket(user, seminar):
+    """Signed ticket holding the user's place in the seminar's queue; asking again returns the same place."""
+    position = cache.get(_position_key(seminar.id, user.id))
+    if position is None:
+        cache.add(_sequence_key(seminar.id), 0, timeout=settings.SEMINAR_WAITING_ROOM_WINDOW * 2)
+        position = cache.incr(_sequence_key(seminar.id))
+        if not cache.add(_position_key(seminar.id, user.id), position, timeout=settings.SEMINAR_WAITING_ROOM_WINDOW * 2):
+            # A concurrent request of the same user got a place first.
+            position = cache.get(_position_key(seminar.id, user.id), position)
+    return signing.dumps({'u': user.id, 's': seminar.id, 'n': position, 'o': seminar.open_at.timestamp()},
+                         salt=TICKET_SALT)
+
+
+def ticket_status(ticket, user, seminar_id, now=None):
+    """Decode a ticket of the user for the seminar without touching the database.
+
+    Raises EnrollmentError if the ticket is invalid. `wait_seconds` is 0 once admitted and
+    `expires_in` is how long an admitted ticket can still be used to enroll.
+    """
+    try:
+        data = signing.loads(ticket, salt=TICKET_SALT)
+    except signing.BadSignature:
+        raise EnrollmentError("Invalid queue ticket.", status.HTTP_403_FORBIDDEN)
+    if data['u'] != user.id or data['s'] != seminar_id:
+        raise EnrollmentError("Invalid queue ticket.", status.HTTP_403_FORBIDDEN)
+
+    now = time.time() if now is None else now
+    admitted = admitted_at(data['o'], data['n'])
+    return {
+        'seminar': data['s'],
+        'position': data['n'],
+        'admitted': now >= admitted,
+        'wait_seconds': max(0, math.ceil(admitted - now)),
+        'expires_in': max(0, math.floor(admitted + settings.SEMINAR_ADMISSION_TTL - now)),
+    }
+
+
+def admit(ticket, user, seminar):
+    """Let the user enroll in a seminar whose registration is scheduled, or raise EnrollmentError."""
+    now = time.time()
+    if seminar.open_at is not None and now < seminar.open_at.timestamp():
+        raise EnrollmentError("Registration for this seminar opens at {}.".format(seminar.open_at.isoformat()),
+                              status.HTTP_403_FORBIDDEN)
+    if not is_active(seminar, now):
+        return
+    if not ticket:
+        raise EnrollmentError("Get a ticket from the seminar's queue first.", status.HTTP_403_FORBIDDEN)
+
+    ticket = ticket_status(ticket, user, seminar.id, now)
+    if not ticket['admitted']:
+        raise EnrollmentError("Your turn in the queue hasn't come yet.", status.HTTP_429_TOO_MANY_REQUESTS)
+    if not ticket['expires_in']:
+        raise EnrollmentError("Your queue ticket has expired.", status.HTTP_403_FORBIDDEN)
@@ -1,6 +1,8 @@
+from django.core.cache import caches
 from django.core.management.base import BaseCommand
 
 from survey.models import OperatingSystem, SurveyResult
+from survey.serializers import OPERATING_SYSTEMS_CACHE_KEY
 
 
 def download_survey():
@@ -26,6 +28,7 @@ def download_survey():
             SurveyResult.objects.create(timestamp=data[0], os=operating_system, python=int(data[2]), rdb=int(data[3]),
                                         programming=int(data[4]), major=data[5], grade=data[6],
                                         backend_reason=data[7], waffle_reason=data[8], say_something=data[9])
+    caches['tiered'].delete(OPERATING_SYSTEMS_CACHE_KEY)
 
 
 class Command(BaseCommand):
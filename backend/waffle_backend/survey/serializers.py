@@ -1,8 +1,11 @@
+from django.core.cache import caches
 from rest_framework import serializers
 
 from survey.models import OperatingSystem, SurveyResult
 from user.serializers import UserSerializer
 
+OPERATING_SYSTEMS_CACHE_KEY = 'operating-systems'
+
 
 class SurveyResultSerializer(serializers.ModelSerializer):
     os = serializers.SerializerMethodField()
@@ -40,6 +43,8 @@ class SurveyResultSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         os, created = OperatingSystem.objects.get_or_create(name=validated_data.pop('os_name'))
+        if created:
+            caches['tiered'].delete(OPERATING_SYSTEMS_CACHE_KEY)
         validated_data['os'] = os
         validated_data['user'] = self.context['request'].user
         return super(SurveyResultSerializer, self).create(validated_data)
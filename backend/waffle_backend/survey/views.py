@@ -1,8 +1,10 @@
+from django.core.cache import caches
 from rest_framework import status, viewsets
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
-from survey.serializers import OperatingSystemSerializer, SurveyResultSerializer
+from common.idempotency import idempotent
+from survey.serializers import OPERATING_SYSTEMS_CACHE_KEY, OperatingSystemSerializer, SurveyResultSerializer
 from survey.models import OperatingSystem, SurveyResult
 
 
@@ -24,6 +26,7 @@ class SurveyResultViewSet(viewsets.GenericViewSet):
         survey = self.get_object()
         return Response(self.get_serializer(survey).data)
 
+    @idempotent
     def create(self, request):
         data = request.data.copy()
         data.update(os_name=data.get('os'))
@@ -39,7 +42,12 @@ class OperatingSystemViewSet(viewsets.GenericViewSet):
     serializer_class = OperatingSystemSerializer
 
     def list(self, request):
-        return Response(self.get_serializer(self.get_queryset(), many=True).data)
+        cache = caches['tiered']
+        operating_systems = cache.get(OPERATING_SYSTEMS_CACHE_KEY)
+        if operating_systems is None:
+            operating_systems = self.get_serializer(self.get_queryset(), many=True).data
+            cache.set(OPERATING_SYSTEMS_CACHE_KEY, operating_systems, timeout=60 * 10)
+        return Response(operating_systems)
 
     def retrieve(self, request, pk=None):
         os = self.get_object()
@@ -0,0 +1,84 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_pending = {}
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+_flusher = None
+
+
+def record_login(user):
+    """Set user.last_login and queue the write instead of updating the row on every login.
+
+    Queued values are written together once LAST_LOGIN_FLUSH_SIZE logins are pending, by a background thread
+    every LAST_LOGIN_FLUSH_INTERVAL seconds, and when the worker exits. A failed write is logged and retried
+    with the next one instead of failing the login.
+    """
+    _ensure_flusher()
+    user.last_login = timezone.now()
+    with _lock:
+        _pending[user.pk] = user.last_login
+        due = len(_pending) >= settings.LAST_LOGIN_FLUSH_SIZE
+    if due:
+        _try_flush()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is None:
+        with _lock:
+            if _flusher is None:
+                _flusher = threading.Thread(target=_flush_periodically, name='last-login-flusher', daemon=True)
+                _flusher.start()
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(max(_last_flush + settings.LAST_LOGIN_FLUSH_INTERVAL - time.monotonic(), 1))
+        if time.monotonic() - _last_flush < settings.LAST_LOGIN_FLUSH_INTERVAL:
+            continue
+        # Outside the request cycle, which is what closes stale and broken connections.
+        close_old_connections()
+        try:
+            _try_flush()
+        finally:
+            close_old_connections()
+
+
+def _try_flush():
+    try:
+        flush()
+    except Exception:
+        logger.warning("Could not write the pending last_login values.", exc_info=True)
+
+
+def flush():
+    global _pending, _last_flush
+    with _lock:
+        pending, _pending = _pending, {}
+        _last_flush = time.monotonic()
+    if not pending:
+        return
+    try:
+        User.objects.filter(pk__in=pending.keys()).update(last_login=Case(
+            *[When(pk=pk, then=Value(last_login)) for pk, last_login in pending.items()],
+            output_field=DateTimeField(),
+        ))
+    except Exception:
+        # Queue them again for the next flush, behind the logins recorded since.
+        with _lock:
+            _pending = {**pending, **_pending}
+        raise
+
+
+atexit.register(_try_flush)
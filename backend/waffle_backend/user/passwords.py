@@ -0,0 +1,57 @@
+import threading
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    PBKDF2PasswordHasher, check_password, get_hasher, identify_hasher, make_password,
+)
+
+
+class PasswordHashingBusy(Exception):
+    pass
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    # Same algorithm as Django's default, with the cost taken from settings.PASSWORD_HASHER_ITERATIONS.
+    # Stored hashes with another iteration count are upgraded on the next login.
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASHER_ITERATIONS or PBKDF2PasswordHasher.iterations
+
+
+_hashing_slots = None
+_lock = threading.Lock()
+
+
+def _run(func, *args):
+    # Hashes run in the calling thread; the semaphore only limits how many are in flight per process at once,
+    # so that a burst of logins can't take every core. Callers beyond the limit wait at most
+    # PASSWORD_HASHING_TIMEOUT seconds.
+    global _hashing_slots
+    if _hashing_slots is None:
+        with _lock:
+            if _hashing_slots is None:
+                _hashing_slots = threading.BoundedSemaphore(settings.PASSWORD_HASHING_MAX_CONCURRENT)
+    if not _hashing_slots.acquire(timeout=settings.PASSWORD_HASHING_TIMEOUT):
+        raise PasswordHashingBusy()
+    try:
+        return func(*args)
+    finally:
+        _hashing_slots.release()
+
+
+def hash_password(raw_password):
+    return _run(make_password, raw_password)
+
+
+def verify_password(user, raw_password):
+    # user.check_password() within the hashing limit, including its transparent rehash.
+    encoded = user.password
+    if not _run(check_password, raw_password, encoded):
+        return False
+    hasher = identify_hasher(encoded)
+    preferred = get_hasher('default')
+    if hasher.algorithm != preferred.algorithm or preferred.must_update(encoded):
+        user.password = hash_password(raw_password)
+        user.save(update_fields=['password'])
+    return True
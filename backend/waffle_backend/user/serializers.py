@@ -1,11 +1,12 @@
-from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
 from django.db import transaction
+from django.db.models import Prefetch
 from rest_framework import serializers
 from rest_framework.authtoken.models import Token
 
-from seminar.models import Seminar, UserSeminar
+from seminar.models import ArchivedUserSeminar, Seminar, UserSeminar
 from user.models import InstructorProfile, ParticipantProfile
+from user.passwords import hash_password
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -43,9 +44,6 @@ class UserSerializer(serializers.ModelSerializer):
             'accepted',
         )
 
-    def validate_password(self, value):
-        return make_password(value)
-
     def validate_year(self, value):
         try:
             if not value:
@@ -72,24 +70,37 @@ class UserSerializer(serializers.ModelSerializer):
         profile_serializer.is_valid(raise_exception=True)
         return data
 
-    @transaction.atomic
     def create(self, validated_data):
         role = validated_data.pop('role')
         company = validated_data.pop('company', '')
         year = validated_data.pop('year', None)
         university = validated_data.pop('university', '')
         accepted = validated_data.pop('accepted', None)
-
-        user = super(UserSerializer, self).create(validated_data)
-        Token.objects.create(user=user)
-        if role == UserSeminar.INSTRUCTOR:
-            InstructorProfile.objects.create(user=user, company=company, year=year)
-        else:
-            ParticipantProfile.objects.create(user=user, university=university, accepted=accepted)
+        # Hashed only now that every validation has passed, and before the transaction so that it doesn't hold
+        # its locks for the length of the hash.
+        validated_data['password'] = hash_password(validated_data['password'])
+
+        with transaction.atomic():
+            user = super(UserSerializer, self).create(validated_data)
+            Token.objects.create(user=user)
+            if role == UserSeminar.INSTRUCTOR:
+                InstructorProfile.objects.create(user=user, company=company, year=year)
+            else:
+                ParticipantProfile.objects.create(user=user, university=university, accepted=accepted)
         return user
 
-    @transaction.atomic
     def update(self, user, validated_data):
+        self.hash_validated_password(validated_data)
+        with transaction.atomic():
+            return self.update_hashed(user, validated_data)
+
+    def hash_validated_password(self, validated_data):
+        # Hashed before the transaction, as in create(). Callers with their own transaction hash first and then
+        # call update_hashed() in it.
+        if 'password' in validated_data:
+            validated_data['password'] = hash_password(validated_data['password'])
+
+    def update_hashed(self, user, validated_data):
         user = super(UserSerializer, self).update(user, validated_data)
         if hasattr(user, 'instructor'):
             instructor = user.instructor
@@ -126,6 +137,23 @@ class UserSerializer(serializers.ModelSerializer):
         return None
 
 
+class PrefetchedUserSerializer(UserSerializer):
+    # For users loaded with their profiles and instructor charge selected and their live and archived
+    # memberships prefetched (see prefetched_users), so that many of them are serialized without a query per user.
+
+    def get_participant(self, user):
+        if hasattr(user, 'participant'):
+            return PrefetchedParticipantProfileSerializer(user.participant, context=self.context).data
+        return None
+
+
+def prefetched_users(user_ids):
+    return User.objects.filter(id__in=user_ids).select_related('participant', 'instructor__charge').prefetch_related(
+        Prefetch('seminars', queryset=UserSeminar.objects.select_related('seminar')),
+        Prefetch('archived_seminars', queryset=ArchivedUserSeminar.objects.select_related('seminar')),
+    )
+
+
 class InstructorProfileSerializer(serializers.ModelSerializer):
     charge = serializers.SerializerMethodField()
 
@@ -173,30 +201,26 @@ class ParticipantProfileSerializer(serializers.ModelSerializer):
         )
 
     def get_seminars(self, participant):
-        seminars = []
-        participants = UserSeminar.objects.filter(user=participant.user)
-        for participant in participants:
-            seminars.append(participant.seminar)
-        return SeminarsSerializer(seminars, many=True, context=self.context).data
+        # Live and archived enrollments together make up the user's history.
+        user_seminars = list(UserSeminar.objects.filter(user=participant.user).select_related('seminar'))
+        user_seminars += ArchivedUserSeminar.objects.filter(user=participant.user).select_related('seminar')
+        user_seminars.sort(key=lambda user_seminar: user_seminar.created_at)
+        return SeminarsSerializer(user_seminars, many=True, context=self.context).data
 
 
-class SeminarsSerializer(serializers.ModelSerializer):
-    joined_at = serializers.DateTimeField(source='created_at')
-    is_active = serializers.SerializerMethodField()
-    dropped_at = serializers.SerializerMethodField()
+class PrefetchedParticipantProfileSerializer(ParticipantProfileSerializer):
 
-    class Meta:
-        model = Seminar
-        fields = (
-            'id',
-            'name',
-            'joined_at',
-            'is_active',
-            'dropped_at',
-        )
+    def get_seminars(self, participant):
+        user = participant.user
+        user_seminars = sorted(list(user.seminars.all()) + list(user.archived_seminars.all()),
+                               key=lambda user_seminar: user_seminar.created_at)
+        return SeminarsSerializer(user_seminars, many=True, context=self.context).data
 
-    def get_is_active(self, seminar):
-        return seminar.users.last().is_active if seminar else None
 
-    def get_dropped_at(self, seminar):
-        return seminar.users.last().dropped_at if seminar else None
+class SeminarsSerializer(serializers.Serializer):
+    # Serializes UserSeminar and ArchivedUserSeminar rows alike.
+    id = serializers.IntegerField(source='seminar.id')
+    name = serializers.CharField(source='seminar.name')
+    joined_at = serializers.DateTimeField(source='created_at')
+    is_active = serializers.BooleanField()
+    dropped_at = serializers.DateTimeField()
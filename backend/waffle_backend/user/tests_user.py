@@ -1,10 +1,17 @@
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from django.test import Client, TestCase
+from django.db import DatabaseError, connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 import json
 
+from user import last_login
 from user.models import InstructorProfile, ParticipantProfile
+from user.passwords import PasswordHashingBusy
 
 
 class PostUserTestCase(TestCase):
@@ -236,6 +243,8 @@ class PutUserLoginTestCase(TestCase):
             content_type='application/json'
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(response.json()["last_login"])
+        last_login.flush()
         last = User.objects.order_by('last_login').last()
         self.assertEqual(last.username, 'participant1')
 
@@ -387,6 +396,17 @@ class PutUserMeTestCase(TestCase):
         self.assertEqual(instructor_user.email, 'bdv111@naver.com')
 
 
+    def test_put_user_me_busy(self):
+        with mock.patch('user.serializers.hash_password', side_effect=PasswordHashingBusy):
+            response = self.client.put(
+                '/api/v1/user/me/',
+                json.dumps({"password": "5678"}),
+                content_type='application/json',
+                HTTP_AUTHORIZATION=self.participant_token
+            )
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertTrue(User.objects.get(username='part').check_password('password'))
+
 class GetUserIdTestCase(TestCase):
     client = Client()
 
@@ -700,3 +720,194 @@ class PostUserParticipantTestCase(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(ParticipantProfile.objects.count(), 2)
+
+    def test_post_user_participant_busy(self):
+        depth = len(connection.savepoint_ids)
+
+        def hash_password(raw_password):
+            # No transaction of the request is open yet, only the test's own.
+            self.assertEqual(len(connection.savepoint_ids), depth)
+            raise PasswordHashingBusy
+
+        with mock.patch('user.serializers.hash_password', side_effect=hash_password):
+            response = self.client.post(
+                '/api/v1/user/participant/',
+                json.dumps({"password": "5678"}),
+                content_type='application/json',
+                HTTP_AUTHORIZATION=self.instructor1_token
+            )
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(ParticipantProfile.objects.count(), 1)
+
+
+class PasswordHashingTestCase(TestCase):
+    client = Client()
+
+    def test_invalid_signup_skips_hashing(self):
+        with mock.patch('user.serializers.hash_password') as hash_password:
+            response = self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": "participant1",
+                    "password": "1234",
+                    "first_name": "yeonghyeon",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": "participant"
+                }),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        hash_password.assert_not_called()
+
+    def test_signup_hashes_before_the_transaction(self):
+        depth = len(connection.savepoint_ids)
+
+        def hash_password(raw_password):
+            # No transaction of the signup is open yet, only the test's own.
+            self.assertEqual(len(connection.savepoint_ids), depth)
+            return make_password(raw_password)
+
+        with mock.patch('user.serializers.hash_password', side_effect=hash_password) as hashed:
+            response = self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": "participant1",
+                    "password": "1234",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": "participant"
+                }),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        hashed.assert_called_once()
+        self.assertTrue(User.objects.get(username='participant1').check_password('1234'))
+
+    def test_login_rehashes_with_new_cost(self):
+        with override_settings(PASSWORD_HASHER_ITERATIONS=1000):
+            self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": "participant1",
+                    "password": "1234",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": "participant"
+                }),
+                content_type='application/json'
+            )
+        self.assertTrue(User.objects.get(username='participant1').password.startswith('pbkdf2_sha256$1000$'))
+
+        with override_settings(PASSWORD_HASHER_ITERATIONS=2000):
+            response = self.client.put(
+                '/api/v1/user/login/',
+                json.dumps({
+                    "username": "participant1",
+                    "password": "1234"
+                }),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user = User.objects.get(username='participant1')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$2000$'))
+        self.assertTrue(user.check_password('1234'))
+
+
+class TokenOnlyLoginTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        self.client.post(
+            '/api/v1/user/',
+            json.dumps({
+                "username": "participant1",
+                "password": "1234",
+                "email": "newstellar@snu.ac.kr",
+                "role": "participant"
+            }),
+            content_type='application/json'
+        )
+
+    def login(self):
+        return self.client.put(
+            '/api/v1/user/login/',
+            json.dumps({
+                "username": "participant1",
+                "password": "1234"
+            }),
+            content_type='application/json'
+        )
+
+    def test_login_without_session(self):
+        response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('sessionid', response.cookies)
+
+        # last_login reaches the database once the buffer is flushed.
+        last_login.flush()
+        self.assertIsNotNone(User.objects.get(username='participant1').last_login)
+
+        response = self.client.post('/api/v1/user/logout/', HTTP_AUTHORIZATION='Token ' + response.json()["token"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(LAST_LOGIN_FLUSH_SIZE=1)
+    def test_login_when_flush_fails(self):
+        # A failed write doesn't fail the login: the value is kept for the next flush.
+        with mock.patch.object(last_login, 'User') as user_model, self.assertLogs('user.last_login', 'WARNING'):
+            user_model.objects.filter.side_effect = DatabaseError
+            response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(User.objects.get(username='participant1').last_login)
+        self.assertTrue(last_login._flusher.is_alive())
+
+        last_login.flush()
+        self.assertIsNotNone(User.objects.get(username='participant1').last_login)
+
+    @override_settings(AUTH_TOKEN_ONLY=False)
+    def test_login_with_session(self):
+        response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('sessionid', response.cookies)
+
+
+class GetUserMultiTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        for username, role in (('participant1', 'participant'), ('participant2', 'participant'),
+                               ('instructor1', 'instructor'), ('instructor2', 'instructor')):
+            self.client.post(
+                '/api/v1/user/',
+                json.dumps({
+                    "username": username,
+                    "password": "1234",
+                    "email": "newstellar@snu.ac.kr",
+                    "role": role
+                }),
+                content_type='application/json'
+            )
+        self.token = 'Token ' + Token.objects.get(user__username='participant1').key
+        self.ids = {user.username: user.id for user in User.objects.all()}
+        # Caches the token lookup, so that only the multi-gets are counted.
+        self.client.get('/api/v1/user/me/', HTTP_AUTHORIZATION=self.token)
+
+    def get_users(self, *usernames):
+        ids = ','.join(str(self.ids.get(username, 0)) for username in usernames)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/user/?ids={}'.format(ids), HTTP_AUTHORIZATION=self.token)
+        return response, len(queries)
+
+    def test_get_users(self):
+        response, queries = self.get_users('participant1', 'instructor1', 'nobody')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(list(data), [str(self.ids['participant1']), str(self.ids['instructor1']), '0'])
+        self.assertEqual(data[str(self.ids['participant1'])]["participant"]["seminars"], [])
+        self.assertIsNone(data[str(self.ids['instructor1'])]["participant"])
+        self.assertIsNone(data['0'])
+
+        # Same answer as GET /api/v1/user/{user_id}/, with as many queries for four users as for two.
+        single = self.client.get('/api/v1/user/{}/'.format(self.ids['instructor1']), HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(data[str(self.ids['instructor1'])], single.json())
+        self.assertEqual(self.get_users('participant1', 'participant2', 'instructor1', 'instructor2')[1], queries)
+
+        response = self.client.get('/api/v1/user/?ids=1,x', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
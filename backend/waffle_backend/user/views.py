@@ -1,4 +1,5 @@
-from django.contrib.auth import authenticate, login, logout
+from django.conf import settings
+from django.contrib.auth import login, logout
 from django.contrib.auth.models import User
 from django.db import IntegrityError, transaction
 from rest_framework import status, viewsets
@@ -7,14 +8,18 @@ from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
-from user.serializers import UserSerializer
+from common.throttling import TokenBucketThrottleMixin
+from user.serializers import PrefetchedUserSerializer, UserSerializer, prefetched_users
+from user.last_login import record_login
 from user.models import InstructorProfile, ParticipantProfile
+from user.passwords import PasswordHashingBusy, hash_password, verify_password
 
 
-class UserViewSet(viewsets.GenericViewSet):
+class UserViewSet(TokenBucketThrottleMixin, viewsets.GenericViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = (IsAuthenticated(), )
+    throttle_scopes = {'login': 'login'}
 
     def get_permissions(self):
         if self.action in ('create', 'login'):
@@ -22,7 +27,6 @@ class UserViewSet(viewsets.GenericViewSet):
         return self.permission_classes
 
     # POST /api/v1/user/
-    @transaction.atomic
     def create(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -30,8 +34,11 @@ class UserViewSet(viewsets.GenericViewSet):
             user = serializer.save()
         except IntegrityError:
             return Response({"error": "A user with that username already exists."}, status=status.HTTP_400_BAD_REQUEST)
+        except PasswordHashingBusy:
+            return Response({"error": "The server is busy, please try again."},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-        login(request, user)
+        self.login_user(request, user)
         data = serializer.data
         data['token'] = user.auth_token.key
         return Response(data, status=status.HTTP_201_CREATED)
@@ -42,9 +49,13 @@ class UserViewSet(viewsets.GenericViewSet):
         username = request.data.get('username')
         password = request.data.get('password')
 
-        user = authenticate(request, username=username, password=password)
+        try:
+            user = self.authenticate(username, password)
+        except PasswordHashingBusy:
+            return Response({"error": "The server is busy, please try again."},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
         if user:
-            login(request, user)
+            self.login_user(request, user)
 
             data = self.get_serializer(user).data
             token, created = Token.objects.get_or_create(user=user)
@@ -53,12 +64,49 @@ class UserViewSet(viewsets.GenericViewSet):
 
         return Response({"error": "Wrong username or wrong password"}, status=status.HTTP_403_FORBIDDEN)
 
+    def login_user(self, request, user):
+        if settings.AUTH_TOKEN_ONLY:
+            # No session to create, and last_login is written in batches.
+            record_login(user)
+        else:
+            login(request, user)
+
+    def authenticate(self, username, password):
+        # ModelBackend.authenticate with the password hashing within the hashing limit.
+        if username is None or password is None:
+            return None
+        user = User.objects.filter(username=username).first()
+        if user is None:
+            # Hash anyway so that unknown usernames take as long as wrong passwords.
+            hash_password(password)
+            return None
+        if user.is_active and verify_password(user, password):
+            return user
+        return None
+
     # POST /api/v1/user/logout/
     @action(detail=False, methods=['POST'])
     def logout(self, request):
-        logout(request)
+        if hasattr(request, 'session'):
+            logout(request)
         return Response()
 
+    # GET /api/v1/user/?ids=1,2,3
+    def list(self, request):
+        ids = request.query_params.get('ids', '').split(',')
+        if not all(user_id.strip().isdigit() for user_id in ids) or len(ids) > settings.MULTI_GET_MAX_IDS:
+            return Response({'error': "'ids' must be at most {} comma-separated user ids.".format(
+                settings.MULTI_GET_MAX_IDS)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Four queries whatever the number of users; unknown ids map to null.
+        user_ids = list(dict.fromkeys(int(user_id) for user_id in ids))
+        users = {user.id: user for user in prefetched_users(user_ids)}
+        return Response({
+            str(user_id): PrefetchedUserSerializer(users[user_id], context=self.get_serializer_context()).data
+            if user_id in users else None
+            for user_id in user_ids
+        })
+
     # GET /api/v1/user/{user_id}/
     def retrieve(self, request, pk=None):
         user = request.user if pk == 'me' else self.get_object()
@@ -72,7 +120,11 @@ class UserViewSet(viewsets.GenericViewSet):
         user = request.user
         serializer = self.get_serializer(user, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
-        serializer.update(user, serializer.validated_data)
+        try:
+            serializer.update(user, serializer.validated_data)
+        except PasswordHashingBusy:
+            return Response({"error": "The server is busy, please try again."},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
         return Response(serializer.data)
 
     # POST /api/v1/user/participant/
@@ -81,18 +133,27 @@ class UserViewSet(viewsets.GenericViewSet):
         user = request.user
         university = request.data.get('university', '')
         serializer = self.get_serializer(user, data=request.data, partial=True)
+        if not hasattr(user, 'instructor'):
+            return Response({"error": "You cannot apply for a participant instead of himself"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if hasattr(user, 'participant'):
+            return Response({"error": "You've been already registered as a participant"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Validated and hashed before the transaction so that it doesn't hold its locks for the length of the hash.
+        serializer.is_valid(raise_exception=True)
+        try:
+            serializer.hash_validated_password(serializer.validated_data)
+        except PasswordHashingBusy:
+            return Response({"error": "The server is busy, please try again."},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
         with transaction.atomic():
-            if hasattr(user, 'instructor'):
-                participant, created = ParticipantProfile.objects.get_or_create(user=user)
-                if not created:
-                    return Response({"error": "You've been already registered as a participant"},
-                                    status=status.HTTP_400_BAD_REQUEST)
-                participant.university = university
-                participant.save()
-                serializer.is_valid(raise_exception=True)
-                serializer.update(user, serializer.validated_data)
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
-            else:
-                return Response({"error": "You cannot apply for a participant instead of himself"},
+            participant, created = ParticipantProfile.objects.get_or_create(user=user)
+            if not created:  # Registered by a concurrent request.
+                return Response({"error": "You've been already registered as a participant"},
                                 status=status.HTTP_400_BAD_REQUEST)
+            participant.university = university
+            participant.save()
+            serializer.update_hashed(user, serializer.validated_data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
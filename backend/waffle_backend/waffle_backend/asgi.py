@@ -13,4 +13,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'waffle_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from seminar.streams import SEATS_STREAM_PATH, seats_stream  # noqa: E402 (needs the apps loaded)
+
+
+async def application(scope, receive, send):
+    # Long-lived Server-Sent Events streams are served here, everything else by Django.
+    if scope['type'] == 'http' and SEATS_STREAM_PATH.match(scope['path']):
+        return await seats_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -56,6 +56,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework.authtoken',
+    'common.apps.CommonConfig',
     'survey.apps.SurveyConfig',
     'user.apps.UserConfig',
     'seminar.apps.SeminarConfig',
@@ -63,18 +64,28 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'common.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'common.middleware.CsrfViewMiddleware',
+    'common.middleware.AuthenticationMiddleware',
+    'common.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# The API authenticates with TokenAuthentication only: no sessions, CSRF or messages under API_PATH_PREFIX,
+# and last_login is written behind (see user.last_login) instead of on every login.
+AUTH_TOKEN_ONLY = True
+API_PATH_PREFIX = '/api/'
+LAST_LOGIN_FLUSH_SIZE = 500
+LAST_LOGIN_FLUSH_INTERVAL = 30
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
-    )
+        'common.authentication.CachedTokenAuthentication',
+    ),
+    # nginx hands the client address to uWSGI as REMOTE_ADDR (see uwsgi_params); X-Forwarded-For is whatever the
+    # client sent, so throttles must not key on it. Raise this if a load balancer is put in front of nginx.
+    'NUM_PROXIES': 0,
 }
 
 ROOT_URLCONF = 'waffle_backend.urls'
@@ -98,19 +109,89 @@ TEMPLATES = [
 WSGI_APPLICATION = 'waffle_backend.wsgi.application'
 
 # Cache
-SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+# Sessions are written through to the database so that a Redis outage doesn't log everyone out.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 SESSION_CACHE_ALIAS = 'default'
 
+# Both caches stop waiting on Redis after CIRCUIT_FAILURE_THRESHOLD connection errors or timeouts in a row and serve
+# from an in-process fallback for CIRCUIT_RESET_TIMEOUT seconds before trying again (see common.cache).
 CACHES = {
     'default': {
-        'BACKEND': 'django_redis.cache.RedisCache',
+        'BACKEND': 'common.cache.ResilientRedisCache',
         'LOCATION': 'redis://127.0.0.1:6379/1',
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'SOCKET_CONNECT_TIMEOUT': 0.2,
+            'SOCKET_TIMEOUT': 0.2,
+            'CIRCUIT_NAME': 'default',
+            'CIRCUIT_FAILURE_THRESHOLD': 5,
+            'CIRCUIT_RESET_TIMEOUT': 10,
         }
-    }
+    },
+    # Redis fronted by a per-process LRU for hot, rarely changing keys (seminar catalog, OS table, tokens)
+    'tiered': {
+        'BACKEND': 'common.cache.TieredRedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+        'KEY_PREFIX': 'tiered',
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'SOCKET_CONNECT_TIMEOUT': 0.2,
+            'SOCKET_TIMEOUT': 0.2,
+            'CIRCUIT_NAME': 'tiered',
+            'CIRCUIT_FAILURE_THRESHOLD': 5,
+            'CIRCUIT_RESET_TIMEOUT': 10,
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 5,
+        }
+    },
 }
 
+# Responses of POST/PUT/DELETE requests carrying an 'Idempotency-Key' header are replayed for this long (seconds)
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+
+# IDs per multi-get, e.g. GET /api/v1/user/?ids=1,2,3 or GET /api/v1/seminar/?ids=1,2,3
+MULTI_GET_MAX_IDS = 100
+
+# 'list' embeds every participant in seminar details and enrollment responses, 'count' only their number;
+# either can be asked for with ?participants=list|count.
+SEMINAR_DETAIL_PARTICIPANTS = 'list'
+# Participants per page of GET /api/v1/seminar/{seminar_id}/participants/ (?page_size=, up to the maximum)
+SEMINAR_PARTICIPANTS_PAGE_SIZE = 50
+SEMINAR_PARTICIPANTS_MAX_PAGE_SIZE = 500
+
+# Sub-requests per POST /api/v1/batch/
+BATCH_MAX_REQUESTS = 50
+
+# Token buckets per throttle scope (see `throttle_scopes` of the viewsets) and per user, token or client IP
+THROTTLE_TOKEN_BUCKETS = {
+    'login': {'ip': '60/min'},
+    'enroll': {'token': '60/min', 'user': '60/min', 'ip': '600/min'},
+    'queue_status': {'token': '300/min', 'user': '300/min', 'ip': '3000/min'},
+}
+
+# When on, participant enrollments are queued and answered with 202 and a ticket, and `manage.py process_enrollments`
+# applies them in batches (for registration-open spikes).
+SEMINAR_ASYNC_ENROLLMENT = os.getenv('SEMINAR_ASYNC_ENROLLMENT') in ('true', 'True')
+
+# Waiting room of seminars with a scheduled opening (Seminar.open_at): tickets are admitted in order,
+# SEMINAR_ADMISSION_BURST at once and then SEMINAR_ADMISSION_RATE per second, each one valid SEMINAR_ADMISSION_TTL
+# seconds, for SEMINAR_WAITING_ROOM_WINDOW seconds after the opening.
+SEMINAR_ADMISSION_RATE = 20
+SEMINAR_ADMISSION_BURST = 100
+SEMINAR_ADMISSION_TTL = 60 * 5
+SEMINAR_WAITING_ROOM_WINDOW = 60 * 60
+
+# Length of a seminar session starting at Seminar.time; participants can't enroll in seminars whose sessions overlap.
+SEMINAR_SESSION_MINUTES = 60
+
+# Seminar recommendations are computed in each process from the participants' surveys; memberships and surveys
+# changed since are read every SEMINAR_RECOMMENDATION_REFRESH seconds and all of them every ..._REBUILD seconds.
+SEMINAR_RECOMMENDATION_REFRESH = 30
+SEMINAR_RECOMMENDATION_REBUILD = 60 * 60
+
+# Dropped enrollments older than this are moved to the archive table by `manage.py archive_enrollments`
+SEMINAR_ARCHIVE_AFTER_DAYS = 90
+
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
@@ -172,6 +253,22 @@ if SYSTEM_ENV == 'GITHUB_WORKFLOW':
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
+PASSWORD_HASHERS = [
+    'user.passwords.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+# PBKDF2 iterations of new hashes, Django's default when unset
+PASSWORD_HASHER_ITERATIONS = int(os.getenv('PASSWORD_HASHER_ITERATIONS', 0)) or None
+
+# At most this many password hashes run at once per process; requests wait at most PASSWORD_HASHING_TIMEOUT
+# seconds for their turn before being answered 503
+PASSWORD_HASHING_MAX_CONCURRENT = 4
+PASSWORD_HASHING_TIMEOUT = 10
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -18,11 +18,14 @@ from django.conf.urls import url
 from django.contrib import admin
 from django.urls import include, path
 
-from waffle_backend.views import ping
+from common.views import BatchView
+from waffle_backend.views import health, ping
 
 urlpatterns = [
     path('', ping),
+    path('health/', health),
     path('admin/', admin.site.urls),
+    path('api/v1/batch/', BatchView.as_view()),
     path('api/v1/', include('survey.urls')),
     path('api/v1/', include('user.urls')),
     path('api/v1/', include('seminar.urls')),
@@ -1,6 +1,14 @@
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
+
+from common.cache import CIRCUIT_BREAKERS
 
 
 def ping(request):
     return HttpResponse('pong')
 
+
+def health(request):
+    # Circuit breaker states and counters of the Redis caches; 'degraded' while any of them is not closed.
+    breakers = {name: breaker.snapshot() for name, breaker in CIRCUIT_BREAKERS.items()}
+    degraded = any(breaker['state'] != 'closed' for breaker in breakers.values())
+    return JsonResponse({'status': 'degraded' if degraded else 'ok', 'caches': breakers})
@@ -10,6 +10,7 @@
 // GET /api/v1/seminar/
 // POST /api/v1/seminar/{seminar_id}/user/
 // DELETE /api/v1/seminar/{seminar_id}/user/
+// GET /api/v1/bootstrap/
 
 export {
   signup,
@@ -26,4 +27,5 @@ export {
   getSeminars,
   participateInSeminar,
   dropOutOfSeminar,
+  getBootstrap,
 } from './seminarApi.js';
\ No newline at end of file
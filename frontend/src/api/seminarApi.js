@@ -46,3 +46,8 @@ export const dropOutOfSeminar = seminarId => {
     .delete(`/api/v1/seminar/${seminarId}/user/`)
 }
 
+// GET /api/v1/bootstrap/
+export const getBootstrap = () => {
+  return axios
+    .get('/api/v1/bootstrap/')
+}